@@ -1,4 +1,7 @@
 """Package to create printable sheets for print and play games."""
+# Defined before importing modules as the cache uses it in its keys
+__version__ = "v0.1.0b3"
+
 from .measure import A1, A2, A3, A4, A5, LETTER, HALF_LETTER, LEGAL, JUNIOR_LEGAL, TABLOID
 from .measure import MINI_USA, MINI_CHIMERA, MINI_EURO, STANDARD_USA, CHIMERA, EURO,  STANDARD, MAGNUM_COPPER
 from .measure import MAGNUM_SPACE, SMALL_SQUARE,  SQUARE, MAGNUM_SILVER, MAGNUM_GOLD, TAROT
@@ -7,13 +10,11 @@ from .card import Card, CardImage
 from .deck import Deck
 from .sheet import Sheet
 from .output import sheet_output, sheet_pdf_output
-from .filters import MultipleFilter, StraightenFilter, InpaintFilter, CropFilter
-from .processing import inpaint, straighten, crop
+from .filters import MultipleFilter, StraightenFilter, InpaintFilter, BleedFilter, CropFilter
+from .processing import bleed, inpaint, straighten, crop
 from .template import Template, svg_file_to_image, svg_content_to_image
 from .definition import Definition, DefinitionError
-
-
-__version__ = "v0.1.0b3"
+from .cache import Cache
 
 
 __all__ = [
@@ -25,8 +26,9 @@ __all__ = [
     Deck,
     Sheet,
     sheet_output, sheet_pdf_output,
-    MultipleFilter, StraightenFilter, InpaintFilter, CropFilter,
-    inpaint, straighten, crop,
+    MultipleFilter, StraightenFilter, InpaintFilter, BleedFilter, CropFilter,
+    bleed, inpaint, straighten, crop,
     Template, svg_file_to_image, svg_content_to_image,
-    Definition, DefinitionError
+    Definition, DefinitionError,
+    Cache
 ]
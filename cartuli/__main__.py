@@ -2,15 +2,46 @@
 """Main cartuli package."""
 import argparse
 import logging
-import os
 import re
 import sys
+import time
 
 from carpeta import ProcessTracer, ImageHandler, trace_output
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from pathlib import Path
+from typing import Iterable
 
+from .cache import Cache, DEFAULT_CACHE_DIR
+from . import __version__
 from .definition import Definition
+from .executor import Executor, BACKENDS, DEFAULT_BACKEND, DEFAULT_READ_AHEAD
+from .farm import work, DEFAULT_POLL_INTERVAL
+from .index import FileIndex
+from .manifest import Manifest
 from .output import sheet_pdf_output
+from .plan import DefinitionPlan
+from .planner import plan_sheets
+from .progress import Progress, DEFAULT_REPORT_INTERVAL
+from .registry import CardImageRegistry
+from .watch import Watcher, DEFAULT_WATCH_INTERVAL
+
+
+DEFAULT_CONCURRENT_BUILDS = 2
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
+def non_negative_int(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"{value} is not a non negative integer")
+    return number
 
 
 def parse_args(args: list[str] = None) -> argparse.Namespace:
@@ -18,20 +49,163 @@ def parse_args(args: list[str] = None) -> argparse.Namespace:
         args = sys.argv[1:]
 
     parser = argparse.ArgumentParser(description='Create a PDF with a list of images')
-    parser.add_argument('definition_file', type=Path, default=Definition.DEFAULT_CARTULIFILE,
-                        nargs='?', help='Cartulifile to be used')
+    parser.add_argument('definition_files', type=Path, default=[Path(Definition.DEFAULT_CARTULIFILE)],
+                        nargs='*', help="Cartulifiles to be used, directories are searched for Cartulifiles")
     parser.add_argument('-c', '--cards', type=str, nargs='*', default=(),
                         help="Cards to include supporting shell patterns")
+    parser.add_argument('-d', '--deck', type=str, action='append', dest='decks', default=None,
+                        help="Deck to include, it can be used multiple times, all decks by default")
+    parser.add_argument('-o', '--output', type=str, action='append', dest='outputs', default=None,
+                        help="Sheet to create by its file name without extension, it can be used multiple times, "
+                             "all sheets by default")
+    parser.add_argument('-j', '--jobs', type=positive_int, default=None,
+                        help="Number of workers used to process images, all CPUs but one by default")
+    parser.add_argument('-b', '--builds', type=positive_int, default=DEFAULT_CONCURRENT_BUILDS,
+                        help="Number of definition files built at the same time sharing the workers")
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help="Workers backend used to process images")
+    parser.add_argument('--queue-dir', type=Path, default=None,
+                        help="Directory shared with workers started with 'cartuli worker' used by the queue backend, "
+                             "tasks are unpickled from it so it must be writable only by trusted users")
+    parser.add_argument('--read-ahead', type=non_negative_int, default=DEFAULT_READ_AHEAD,
+                        help="Number of images decoded in advance while previous ones are processed")
+    parser.add_argument('-f', '--force', action='store_true', default=False,
+                        help="Create all sheets even if their inputs did not change")
+    parser.add_argument('--plan', action='store_true', default=False,
+                        help="Display the cards, pages, resolution, memory and time estimated for each sheet "
+                             "reading only image headers, without creating them")
+    parser.add_argument('--progress', type=float, nargs='?', const=DEFAULT_REPORT_INTERVAL, default=None,
+                        metavar='SECONDS', help="Report the created card images and the estimated time to create "
+                                                "the pending ones every some seconds")
     parser.add_argument('-v', '--verbose', action='count', default=0,
                         help="Display verbose output")
     parser.add_argument('-T', '--trace-output', type=Path, default=None,
                         help="Output traces of image processing")
+    parser.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR,
+                        help="Directory to cache filtered and rendered images")
+    parser.add_argument('--clear-cache', action='store_true', default=False,
+                        help="Remove all cached images before building")
+    parser.add_argument('--no-cache', action='store_true', default=False,
+                        help="Do not use cached images")
+    parser.add_argument('-w', '--watch', action='store_true', default=False,
+                        help="Keep running and create again the sheets affected by file changes")
+    parser.add_argument('--watch-interval', type=float, default=DEFAULT_WATCH_INTERVAL,
+                        help="Seconds between file changes checks in watch mode")
     return parser.parse_args(args)
 
 
+def parse_worker_args(args: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='cartuli worker',
+                                     description='Process images queued in a directory shared with a build')
+    parser.add_argument('queue_dir', type=Path, help="Queue directory used by the build with the queue backend, "
+                                                     "tasks are unpickled from it so it must be writable only by "
+                                                     "trusted users")
+    parser.add_argument('-j', '--jobs', type=positive_int, default=None,
+                        help="Number of worker processes, all CPUs but one by default")
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Seconds between checks of queued tasks")
+    parser.add_argument('--idle-timeout', type=float, default=None,
+                        help="Stop after the given seconds without queued tasks, never by default")
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help="Display verbose output")
+    return parser.parse_args(args)
+
+
+def worker_main(args: list[str]) -> int:
+    """Execute the tasks queued by builds in a directory until stopped."""
+    args = parse_worker_args(args)
+    logging.basicConfig(stream=sys.stderr, format='%(levelname)s - %(message)s',
+                        level=logging.WARN - args.verbose * 10)
+    logger = logging.getLogger('cartuli')
+
+    with Executor(args.jobs) as executor:
+        try:
+            tasks = sum(executor.map(partial(work, args.queue_dir, poll_interval=args.poll_interval,
+                                             idle_timeout=args.idle_timeout), range(executor.jobs)))
+        except KeyboardInterrupt:
+            return 0
+    logger.info(f"{tasks} tasks executed")
+
+    return 0
+
+
+def find_definition_files(paths: Iterable[Path]) -> list[Path]:
+    """Return the definition files of each path, searching for Cartulifiles in directory trees."""
+    definition_files = []
+    for path in paths:
+        path = Path(path).resolve()
+        if path.is_dir():
+            directory_files = sorted(path.rglob(Definition.DEFAULT_CARTULIFILE))
+            if not directory_files:
+                raise FileNotFoundError(f"No {Definition.DEFAULT_CARTULIFILE} found in {path}")
+            definition_files += directory_files
+        else:
+            definition_files.append(path)
+
+    return list(dict.fromkeys(definition_files))
+
+
+def selected_sheet_groups(definition: Definition, outputs: Iterable[str] = None) -> tuple[tuple[str]]:
+    if outputs is None:
+        return definition.sheet_groups
+    return tuple(definition.sheet_group(output) for output in outputs)
+
+
+def expect_sheets(definition: Definition, progress: Progress, /, outputs: Iterable[str] = None) -> None:
+    """Register the work of the definition sheets estimated from image headers as expected progress."""
+    sheet_groups = selected_sheet_groups(definition, outputs)
+    for deck_names, sheet_plan in zip(sheet_groups, plan_sheets(definition, sheet_groups)):
+        progress.expect((id(definition), deck_names), sheet_plan.megapixels)
+
+
+def build_sheets(definition: Definition, sheet_dir: Path, manifest: Manifest, /, force: bool = False,
+                 keep: bool = False, outputs: Iterable[str] = None, progress: Progress = None,
+                 **parameters) -> list[Path]:
+    """Create the definition sheets whose inputs changed and return the created files.
+
+    Sheets are created one at a time loading only its decks, which are released after creating the
+    sheet unless they are required to be kept in memory.
+    """
+    logger = logging.getLogger('cartuli')
+
+    sheet_groups = selected_sheet_groups(definition, outputs)
+    sheet_files = []
+    try:
+        for deck_names in sheet_groups:
+            sheet_dir.mkdir(exist_ok=True)
+            sheet_file = sheet_dir / f"{definition.sheet_name(deck_names)}.pdf"
+            fingerprint = manifest.fingerprint(definition.sheet_values(deck_names),
+                                               definition.sheet_files(deck_names), version=__version__, **parameters)
+            # Expected work is replaced by the tasks sent to workers
+            if progress is not None:
+                progress.settle((id(definition), deck_names))
+            if not force and manifest.is_up_to_date(sheet_file, fingerprint):
+                logger.info(f'Skipping unchanged sheet {sheet_file}')
+                continue
+            logger.debug(f'Creating sheet {sheet_file}')
+            # Pages are drawn as soon as their cards are created while the following ones are being created
+            sheet_pdf_output(definition.sheet_layout(deck_names), sheet_file,
+                             cards=definition.sheet_cards(deck_names))
+            manifest.update(sheet_file, fingerprint)
+            sheet_files.append(sheet_file)
+            if not keep:
+                definition.release(deck_names)
+    finally:
+        if progress is not None:
+            for deck_names in sheet_groups:
+                progress.settle((id(definition), deck_names))
+
+    return sheet_files
+
+
 def main(args=None):
     """Execute main package command line functionality."""
-    args = parse_args()
+    if args is None:
+        args = sys.argv[1:]
+    if args[:1] == ['worker']:
+        return worker_main(args[1:])
+
+    args = parse_args(args)
 
     tracer = ProcessTracer()
 
@@ -54,34 +228,130 @@ def main(args=None):
         processing_handler.setLevel(logging.DEBUG)
         processing_logger.addHandler(processing_handler)
 
-    # Definition paths are relative to definition file
     logger = logging.getLogger('cartuli')
-    definition_dir = Path(args.definition_file)
-    if not definition_dir.is_dir():
-        definition_dir = definition_dir.parent
-    # TODO: Find a better way to manage definition relative paths
-    os.chdir(definition_dir)
+    definition_files = find_definition_files(args.definition_files)
 
     files_filter = None
     if args.cards is not None:
         files_regex = re.compile(r'^.*(' + '|'.join(args.cards) + r').*$')
         files_filter = lambda x: not files_regex.match(x)   # noqa: E731
 
-    definition = Definition.from_file(args.definition_file, files_filter=files_filter)
-    logger.info(f"Loaded {args.definition_file} with {len(definition.decks)} decks")
-    sheet_dir = definition_dir / 'sheets'
-    for deck_names, sheet in definition.sheets.items():
-        sheet_dir.mkdir(exist_ok=True)
-        sheet_file = sheet_dir / f"{'_'.join(deck_names)}.pdf"
-        logger.debug(f'Creating sheet {sheet_file}')
-        sheet_pdf_output(sheet, sheet_file)
+    cache = None
+    if args.clear_cache:
+        Cache(args.cache_dir).clear()
+    if not args.no_cache:
+        cache = Cache(args.cache_dir)
+
+    executor = Executor(args.jobs, backend=args.backend, read_ahead=args.read_ahead, queue_dir=args.queue_dir)
+    logger.info(f"Using {executor}")
+
+    # Workers, cached images, loaded card images and scanned directories are shared by all definitions
+    registry = CardImageRegistry()
+    file_index = FileIndex()
+
+    progress = None
+    if args.progress is not None:
+        progress = Progress(1 if executor.serial else executor.jobs, interval=args.progress)
+        logging.getLogger('cartuli.progress').setLevel(logging.INFO)
+
+    def load_definition(definition_file: Path) -> Definition:
+        definition = Definition.from_file(definition_file, files_filter=files_filter, cache=cache,
+                                          executor=executor, decks=args.decks, registry=registry,
+                                          file_index=file_index, progress=progress)
+        logger.info(f"Loaded {definition_file} with {len(definition.deck_names)} decks")
+        return definition
+
+    definitions = {}
+
+    def build_definition(definition_file: Path) -> tuple[Definition, Manifest, list[Path]]:
+        definition = definitions.get(definition_file) or load_definition(definition_file)
+        sheet_dir = definition_file.parent / 'sheets'
+        manifest = Manifest(sheet_dir / Manifest.FILE_NAME)
+        sheet_files = build_sheets(definition, sheet_dir, manifest, force=args.force, keep=args.watch,
+                                   outputs=args.outputs, progress=progress, cards=args.cards)
+        return definition, manifest, sheet_files
+
+    failures = 0
+    builds = {}
+    if args.plan:
+        for definition_file in definition_files:
+            try:
+                definition = load_definition(definition_file)
+                if len(definition_files) > 1:
+                    print(definition_file)
+                for sheet_plan in plan_sheets(definition, selected_sheet_groups(definition, args.outputs),
+                                              jobs=executor.jobs):
+                    print(sheet_plan)
+            except Exception as e:
+                failures += 1
+                logger.error(f"{definition_file}: {e}")
+    else:
+        if progress is not None:
+            # The work of all definitions is expected from the start so the ETA covers the whole build
+            for definition_file in definition_files:
+                try:
+                    definitions[definition_file] = load_definition(definition_file)
+                    expect_sheets(definitions[definition_file], progress, outputs=args.outputs)
+                except Exception as e:
+                    # Errors are reported when the definition is built
+                    logger.debug(f"Unable to estimate {definition_file} progress: {e}")
+        with ThreadPoolExecutor(max_workers=args.builds, thread_name_prefix='cartuli-build') as build_pool:
+            futures = {build_pool.submit(build_definition, definition_file): definition_file
+                       for definition_file in definition_files}
+            for future in as_completed(futures):
+                definition_file = futures[future]
+                try:
+                    definition, manifest, sheet_files = future.result()
+                    builds[definition_file] = (definition, manifest)
+                    logger.info(f"{definition_file}: {len(sheet_files)} of "
+                                f"{len(selected_sheet_groups(definition, args.outputs))} sheets created")
+                except Exception as e:
+                    failures += 1
+                    logger.error(f"{definition_file}: {e}")
+
+    if args.watch and builds:
+        # Loaded decks and card images are kept to create again only what changes
+        watchers = {
+            definition_file: Watcher(lambda file=definition_file, definition=definition: [file] + definition.files,
+                                     interval=args.watch_interval)
+            for definition_file, (definition, _) in builds.items()
+        }
+        logger.warning(f"Watching {', '.join(str(f) for f in builds)} changes, press Ctrl+C to stop")
+        try:
+            while True:
+                # Only directories modified since the last poll are scanned again to find added files
+                file_index.refresh()
+                for definition_file, (definition, manifest) in builds.items():
+                    if not (changes := watchers[definition_file].changes()):
+                        continue
+                    logger.info(f"Detected changes in {', '.join(str(c) for c in changes)}")
+                    try:
+                        if definition_file in changes:
+                            definition.update(DefinitionPlan.from_file(definition_file, cache=cache))
+                        definition.invalidate(changes)
+                        for sheet_file in build_sheets(definition, definition_file.parent / 'sheets', manifest,
+                                                       keep=True, outputs=args.outputs, cards=args.cards):
+                            logger.info(f"Updated {sheet_file}")
+                    except Exception as e:
+                        logger.error(f"Unable to create {definition_file} sheets: {e}")
+                time.sleep(args.watch_interval)
+        except KeyboardInterrupt:
+            pass
+
+    executor.close()
+
+    if progress is not None:
+        progress.report(force=True)
+
+    if cache is not None:
+        logger.info(f"Cache {cache}")
 
     if tracer:
         trace_output(tracer, args.trace_output)
 
     tracer.wait_and_stop()
 
-    return 0
+    return 1 if failures else 0
 
 
 if __name__ == "__main__":
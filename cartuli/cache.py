@@ -0,0 +1,251 @@
+"""Persistent artifact cache module."""
+from __future__ import annotations
+
+import cairosvg
+import cv2 as cv
+import hashlib
+import logging
+import numpy as np
+import os
+import PIL
+import shutil
+import tempfile
+import threading
+import time
+
+from collections.abc import Callable
+from pathlib import Path
+from PIL import Image, PngImagePlugin
+from typing import BinaryIO
+
+from . import __version__
+from .card import CardImage
+from .measure import Size
+
+
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'cartuli'
+DEFAULT_CACHE_MAX_SIZE = 2 * 1024**3
+
+# Image modes that can be stored as PNG, images in other modes like CMYK are not cached
+PNG_MODES = ('1', 'L', 'LA', 'I', 'I;16', 'P', 'RGB', 'RGBA')
+
+# Filtered images are keyed by the filter representation, so its algorithms are versioned by the package
+LIBRARIES_VERSIONS = (
+    ('cartuli', __version__),
+    ('pillow', PIL.__version__),
+    ('opencv', cv.__version__),
+    ('numpy', np.__version__),
+    ('cairosvg', cairosvg.__version__)
+)
+
+
+CacheKey = str
+
+
+def file_hash(path: Path) -> str:
+    """Return a hash of the file content."""
+    digest = hashlib.sha256()
+    with path.open('rb') as file:
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def image_hash(image: Image.Image) -> str:
+    """Return a hash of the image content."""
+    digest = hashlib.sha256()
+    digest.update(f'{image.mode}:{image.width}x{image.height}:'.encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class Cache:
+    """Content addressed on-disk cache of generated images with LRU eviction."""
+
+    def __init__(self, directory: Path | str = DEFAULT_CACHE_DIR, /, max_size: int = DEFAULT_CACHE_MAX_SIZE):
+        if isinstance(directory, str):
+            directory = Path(directory)
+        self.__directory = directory.expanduser()
+        self.__max_size = max_size
+        self.__size = None
+
+        self.__hits = 0
+        self.__misses = 0
+        # Size accounting is shared by the builds of different definitions running in threads
+        self.__lock = threading.Lock()
+
+    @property
+    def directory(self) -> Path:
+        return self.__directory
+
+    @property
+    def max_size(self) -> int:
+        return self.__max_size
+
+    @property
+    def hits(self) -> int:
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        return self.__misses
+
+    @property
+    def size(self) -> int:
+        """Return the disk space used by cached files."""
+        if self.__size is None:
+            self.__size = sum(file.stat().st_size for file in self._files())
+        return self.__size
+
+    @staticmethod
+    def key(*values) -> CacheKey:
+        """Return a key that identifies the values and the libraries used to process them."""
+        digest = hashlib.sha256()
+        for value in (CACHE_VERSION, LIBRARIES_VERSIONS) + values:
+            if not isinstance(value, bytes):
+                value = repr(value).encode()
+            digest.update(hashlib.sha256(value).digest())
+        return digest.hexdigest()
+
+    def _path(self, key: CacheKey, /, suffix: str = '.png') -> Path:
+        return self.__directory / key[:2] / f'{key}{suffix}'
+
+    @staticmethod
+    def _touch(path: Path) -> None:
+        # File modification time is used to track the last access for eviction, it is set explicitly
+        # as file systems may update it with a coarser resolution
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def _files(self) -> list[Path]:
+        if not self.__directory.exists():
+            return []
+        return [file for file in self.__directory.glob('*/*') if file.is_file() and file.suffix in ('.png', '.bin')]
+
+    def _write(self, path: Path, write: Callable[[BinaryIO], None]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first so concurrent readers never get partial files
+        file_descriptor, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                write(file)
+
+            with self.__lock:
+                size = self.size
+                if path.is_file():
+                    size -= path.stat().st_size
+                os.replace(temp_path, path)
+                self._touch(path)
+
+                self.__size = size + path.stat().st_size
+                if self.__size > self.__max_size:
+                    self.evict()
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+    def __contains__(self, key: CacheKey) -> bool:
+        return self._path(key).exists()
+
+    def contains(self, key: CacheKey) -> bool:
+        """Return if the key is cached counting a miss if not, for artifacts checked before being created."""
+        if key in self:
+            return True
+
+        self.__misses += 1
+        return False
+
+    def get_image(self, key: CacheKey) -> Image.Image | None:
+        logger = logging.getLogger('cartuli.cache.Cache.get_image')
+
+        path = self._path(key)
+        try:
+            image = Image.open(path)
+            image.load()
+        except (FileNotFoundError, OSError):
+            self.__misses += 1
+            logger.debug(f"Cache miss {key}")
+            return None
+
+        self._touch(path)
+        self.__hits += 1
+        logger.debug(f"Cache hit {key}")
+
+        return image
+
+    def put_image(self, key: CacheKey, image: Image.Image, /, info: dict[str, str] = None) -> None:
+        """Store an image if possible, caching errors never make a build fail."""
+        logger = logging.getLogger('cartuli.cache.Cache.put_image')
+
+        if image.mode not in PNG_MODES:
+            logger.debug(f"Image {key} not cached, {image.mode} images can not be stored")
+            return
+
+        png_info = PngImagePlugin.PngInfo()
+        for name, value in (info or {}).items():
+            png_info.add_text(name, str(value))
+
+        try:
+            self._write(self._path(key), lambda file: image.save(file, format='PNG', pnginfo=png_info))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unable to cache image {key}: {e}")
+
+    def get_data(self, key: CacheKey) -> bytes | None:
+        logger = logging.getLogger('cartuli.cache.Cache.get_data')
+
+        path = self._path(key, suffix='.bin')
+        try:
+            data = path.read_bytes()
+        except OSError:
+            self.__misses += 1
+            logger.debug(f"Cache miss {key}")
+            return None
+
+        self._touch(path)
+        self.__hits += 1
+        logger.debug(f"Cache hit {key}")
+
+        return data
+
+    def put_data(self, key: CacheKey, data: bytes) -> None:
+        logger = logging.getLogger('cartuli.cache.Cache.put_data')
+
+        try:
+            self._write(self._path(key, suffix='.bin'), lambda file: file.write(data))
+        except OSError as e:
+            logger.warning(f"Unable to cache data {key}: {e}")
+
+    def get_card_image(self, key: CacheKey, /, size: Size, name: str = '') -> CardImage | None:
+        image = self.get_image(key)
+        if image is None:
+            return None
+
+        return CardImage(image, size=size, bleed=float(image.info.get('bleed', CardImage.DEFAULT_BLEED)), name=name)
+
+    def put_card_image(self, key: CacheKey, card_image: CardImage) -> None:
+        self.put_image(key, card_image.image, info={'bleed': card_image.bleed})
+
+    def evict(self) -> None:
+        """Remove least recently used files until the cache fits in its maximum size."""
+        logger = logging.getLogger('cartuli.cache.Cache.evict')
+
+        files = sorted(((file.stat(), file) for file in self._files()), key=lambda x: x[0].st_mtime_ns)
+        size = sum(stat.st_size for stat, _ in files)
+        for stat, file in files:
+            if size <= self.__max_size:
+                break
+            file.unlink(missing_ok=True)
+            size -= stat.st_size
+            logger.debug(f"Evicted {file}")
+        self.__size = size
+
+    def clear(self) -> None:
+        if self.__directory.exists():
+            shutil.rmtree(self.__directory)
+        self.__size = 0
+
+    def __str__(self) -> str:
+        return f"{self.__directory} ({self.hits} hits, {self.misses} misses)"
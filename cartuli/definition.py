@@ -1,30 +1,38 @@
 """Definition file module."""
 from __future__ import annotations
 
+import csv
 import logging
+import pickle
+import time
 import yaml
 
-from collections import defaultdict
-from collections.abc import Callable
+from collections import defaultdict, deque
+from collections.abc import Callable, Generator, Hashable, Iterator
 from copy import deepcopy
-from glob import glob
+from dataclasses import dataclass, replace
+from functools import lru_cache
 from itertools import chain, groupby
-from multiprocessing import Pool, cpu_count
 from pathlib import Path
 from PIL import Image
 from typing import Iterable
 
+from .cache import Cache, CacheKey, file_hash
 from .card import CardImage, Card
 from .deck import Deck
+from .executor import Executor
 from .filters import Filter, NullFilter
-from .measure import Size, from_str as measure_from_str
+from .header import ImageHeader
+from .index import FileIndex
+from .measure import Size
+from .plan import DefinitionPlan, TEMPLATE_DATA_SUFFIXES
+from .progress import Progress
+from .registry import CardImageRegistry, FileStamp, RegistryKey
+from .shared import SharedCardImage
 from .sheet import Sheet
 from .template import svg_file_to_image, Template, ParameterKey, ParameterValue
 
 
-_CONCURRENT_PROCESSES = cpu_count() - 1
-
-
 FilesFilter = Callable[[Path], bool]
 
 
@@ -43,6 +51,175 @@ def _load_image(image_file: str | Path) -> Image.Image:
         return Image.open(image_file)
 
 
+@lru_cache(maxsize=16)
+def _load_template(template_file: Path, parameters: tuple[ParameterKey, ...], stamp: FileStamp) -> Template:
+    # Templates are parsed again only if they are modified
+    return Template.from_file(template_file, parameters)
+
+
+@dataclass(frozen=True)
+class _TemplateRow:
+    """Template parameters row rendered by workers, loading its parameter files only when it is rendered."""
+
+    template_file: Path
+    keys: tuple[ParameterKey, ...]
+    parameters: dict[ParameterKey, str | Path]
+    name: str = ''
+
+    @property
+    def template(self) -> Template:
+        return _load_template(self.template_file, self.keys, CardImageRegistry.stamp(self.template_file))
+
+    @property
+    def content_hash(self) -> str:
+        """Return the hash of the template and parameters files and values without rendering it."""
+        values = tuple((parameter, _file_hash(value, CardImageRegistry.stamp(value)) if isinstance(value, Path)
+                        else value) for parameter, value in self.parameters.items())
+        return Cache.key(_file_hash(self.template_file, CardImageRegistry.stamp(self.template_file)),
+                         self.keys, values, self.template.dpi)
+
+    def create_image(self) -> Image.Image:
+        return self.template.create_image(_TemplateParameters._load_row(self.parameters))
+
+
+@dataclass(frozen=True)
+class _CardImageTask:
+    """Card image to be created by workers from an image file, a template row or an already loaded card image."""
+
+    source: Path | _TemplateRow | CardImage
+    image_filter: Filter
+    size: Size = None
+    bleed: float = CardImage.DEFAULT_BLEED
+
+
+def _decode_image(image_file: str | Path) -> Image.Image:
+    image = _load_image(image_file)
+    image.load()
+    return image
+
+
+def _decode_card_image_task(task: _CardImageTask) -> _CardImageTask:
+    if isinstance(task.source, CardImage):
+        return task
+
+    if isinstance(task.source, _TemplateRow):
+        return replace(task, source=CardImage(task.source.create_image(), size=task.size, bleed=task.bleed,
+                                              name=task.source.name))
+
+    return replace(task, source=CardImage(_decode_image(task.source), size=task.size, bleed=task.bleed,
+                                          name=task.source.stem))
+
+
+def _create_card_image(task: _CardImageTask) -> CardImage:
+    # Images are decoded at once so its file is closed even if filters do not read its pixels
+    return task.image_filter.apply(_decode_card_image_task(task).source)
+
+
+def _create_shared_card_image(task: _CardImageTask) -> SharedCardImage:
+    return SharedCardImage.from_card_image(_create_card_image(task))
+
+
+IndexedTask = tuple[int, _CardImageTask]
+TimedResult = tuple[int, CardImage | SharedCardImage, float]
+
+
+def _create_timed_card_image(indexed_task: IndexedTask) -> TimedResult:
+    n, task = indexed_task
+    start = time.perf_counter()
+    card_image = _create_card_image(task)
+    return n, card_image, time.perf_counter() - start
+
+
+def _create_timed_shared_card_image(indexed_task: IndexedTask) -> TimedResult:
+    n, task = indexed_task
+    start = time.perf_counter()
+    shared_card_image = _create_shared_card_image(task)
+    return n, shared_card_image, time.perf_counter() - start
+
+
+def _task_megapixels(task: _CardImageTask) -> float:
+    """Return the task image megapixels reading only its file header."""
+    if isinstance(task.source, CardImage):
+        width, height = task.source.image.size
+    else:
+        file = task.source.template_file if isinstance(task.source, _TemplateRow) else task.source
+        try:
+            width, height = ImageHeader.from_file(file).size
+        except (OSError, ValueError, SyntaxError):
+            # Errors are raised by the worker creating the card image
+            return 0
+    return width * height / 1_000_000
+
+
+def _ordered_card_images(results: Iterator[TimedResult], megapixels: list[float], /, kinds: list[str] = None,
+                         progress: Progress = None, shared: bool = False) -> Iterator[CardImage]:
+    """Yield the card images in task order from results completed in any order.
+
+    None is yielded first to start the generator, see _started.
+    """
+    pending = {}
+    next_index = 0
+    try:
+        yield
+        for n, card_image, seconds in results:
+            if progress is not None:
+                progress.done(megapixels[n], seconds, kind=kinds[n] if kinds else '')
+            pending[n] = card_image
+            while next_index in pending:
+                card_image = pending.pop(next_index)
+                next_index += 1
+                if isinstance(card_image, SharedCardImage):
+                    card_image = card_image.to_card_image()
+                yield card_image
+    finally:
+        # Shared memory of results not consumed is released if the caller stops early
+        if shared:
+            for card_image in chain(pending.values(), (result for _, result, _ in results)):
+                card_image.image.release()
+
+
+def _started(generator: Generator) -> Generator:
+    # Started generators are finalized when closed or garbage collected even if nothing was consumed
+    next(generator)
+    return generator
+
+
+@lru_cache(maxsize=4096)
+def _file_hash(file: Path, stamp: FileStamp) -> str:
+    # Files are hashed again only if they are modified
+    return file_hash(file)
+
+
+@dataclass(frozen=True)
+class _CardImageRequest:
+    """Card image to be created by a task unless it is already registered or cached."""
+
+    task: _CardImageTask
+    registry_key: RegistryKey = None
+    stamp: FileStamp = None
+    content_hash: str = None
+    cached: bool = False
+
+    @property
+    def cache_key(self) -> CacheKey | None:
+        """Return the created card image cache key, hashing the image file only when it is required."""
+        if not self.cached:
+            return None
+
+        content_hash = self.content_hash
+        if content_hash is None and isinstance(self.task.source, _TemplateRow):
+            content_hash = self.task.source.content_hash
+        elif content_hash is None:
+            content_hash = _file_hash(self.task.source, self.stamp)
+        return Cache.key(content_hash, repr(self.task.image_filter), self.task.size, self.task.bleed)
+
+    @property
+    def name(self) -> str:
+        if isinstance(self.task.source, Path):
+            return self.task.source.stem
+        return self.task.source.name
+
+
 def _load_text(text_file: str | Path) -> str:
     text_file = Path(text_file)
 
@@ -53,23 +230,47 @@ def _load_text(text_file: str | Path) -> str:
     return text_file.read_text()
 
 
-# TODO: Implement load template parameters from yml or CSV file
+def _data_file_rows(data_file: Path) -> Iterator[dict]:
+    """Yield the rows of a CSV or YAML data file reading the file as they are consumed."""
+    if data_file.suffix == '.csv':
+        with data_file.open(newline='') as file:
+            yield from csv.DictReader(file)
+    elif data_file.suffix in TEMPLATE_DATA_SUFFIXES:
+        with data_file.open() as file:
+            # Each document of a YAML stream is a row, or a list of rows loaded at once
+            for document in yaml.safe_load_all(file):
+                if isinstance(document, list):
+                    yield from document
+                elif document is not None:
+                    yield document
+    else:
+        raise ValueError(f"Unsupported template parameters data file '{data_file}'")
+
+
 class _TemplateParameters:
     EXTENSION_MAPPINGS = {
-        tuple(Image.registered_extensions()): _load_image,
+        tuple(Image.registered_extensions()): _decode_image,
         tuple(['.txt', '.html', '.md']): _load_text
     }
 
-    def __init__(self, parameters: Iterable[dict[ParameterKey, ParameterValue]]):
+    def __init__(self, parameters: Iterable[dict[ParameterKey, ParameterValue]], /,
+                 keys: list[ParameterKey] = None, executor: Executor = None):
         self.__parameters = parameters
+        if keys is None:
+            keys = list(parameters[0].keys()) if parameters else []
+        self.__keys = keys
+        self.__executor = executor
 
     @property
-    def parameters(self) -> list[dict[ParameterKey, ParameterValue]]:
-        return deepcopy(self.__parameters)
+    def parameters(self) -> Iterable[dict[ParameterKey, ParameterValue]]:
+        """Parameters rows, data files rows are streamed so they can be consumed only once."""
+        if isinstance(self.__parameters, list):
+            return deepcopy(self.__parameters)
+        return self.__parameters
 
     @property
     def keys(self) -> list[ParameterKey]:
-        return list(self.__parameters[0].keys())
+        return list(self.__keys)
 
     @staticmethod
     def _convert_dict_of_lists_to_list_of_dicts(dict_of_lists: dict) -> list:
@@ -97,32 +298,106 @@ class _TemplateParameters:
         raise ValueError(f"Unmanageable extension for '{parameter_file}'")
 
     @classmethod
-    def from_dict(cls, definition: dict | str) -> _TemplateParameters:
-        if isinstance(definition, str):
-            return  # TODO: Implement
+    def _data_file_value(cls, data_file: Path, value: object) -> str | Path:
+        # Values referencing loadable files are paths relative to the data file
+        value = str(value)
+        if Path(value).suffix in chain.from_iterable(cls.EXTENSION_MAPPINGS):
+            return data_file.parent / value
+        return value
+
+    @classmethod
+    def data_file_rows(cls, data_file: Path | str, /, files_filter: FilesFilter = None,
+                       name_parameter: str = None) -> Iterator[dict[ParameterKey, str | Path]]:
+        """Yield the rows of a data file as they are read, with file values as paths."""
+        data_file = Path(data_file)
+        for row in _data_file_rows(data_file):
+            if not isinstance(row, dict):
+                raise ValueError(f"Invalid template parameters row {row} in '{data_file}'")
+            row = {parameter: cls._data_file_value(data_file, value) for parameter, value in row.items()}
+            if files_filter is not None and name_parameter is not None and files_filter(str(row[name_parameter])):
+                continue
+            yield row
 
-        parameter_values = {}
-        for parameter in definition.keys():
-            files = sorted(glob(definition[parameter]))
-            parameter_values |= {
-                parameter: [cls._load_parameter_from_file(file) for file in files]
-            }
+    @classmethod
+    def parameter_files(cls, definition: dict | Path, /, files_filter: FilesFilter = None,
+                        name_parameter: str = None, file_index: FileIndex = None) -> list[dict[ParameterKey, str]]:
+        """Return the files of each parameters row without loading them."""
+        logger = logging.getLogger('cartuli.definition._TemplateParameters.parameter_files')
 
-        return cls(cls._convert_dict_of_lists_to_list_of_dicts(parameter_values))
+        if isinstance(definition, (str, Path)):
+            return list(cls.data_file_rows(definition, files_filter=files_filter, name_parameter=name_parameter))
 
-    def create_images(self, template: Template, name_parameter: str = None) -> list[Image.Image]:
-        images = []
-        for parameters in self.__parameters:
-            image = template.create_image(parameters)
-            if name_parameter:
-                if isinstance(parameters[name_parameter], Image.Image):
-                    image.filename = parameters[name_parameter].filename
-                else:
-                    # TUNE: This does not work as expected for filters as this does not contains the file name
-                    image.filename = parameters[name_parameter]
-            images.append(image)
+        if file_index is None:
+            file_index = FileIndex()
+
+        parameter_files = cls._convert_dict_of_lists_to_list_of_dicts(
+            {parameter: file_index.glob(definition[parameter]) for parameter in definition.keys()})
 
-        return images
+        # Rows are selected by its name parameter file before loading any of its values
+        if files_filter is not None and name_parameter is not None:
+            selected_parameter_files = [
+                row for row in parameter_files if not files_filter(str(row[name_parameter]))
+            ]
+            if len(parameter_files) != len(selected_parameter_files):
+                logger.debug(f"'{definition}' rows filtered from {len(parameter_files)} to "
+                             f"{len(selected_parameter_files)}")
+            parameter_files = selected_parameter_files
+
+        return parameter_files
+
+    @classmethod
+    def from_data_file(cls, data_file: Path | str, /, files_filter: FilesFilter = None,
+                       name_parameter: str = None, executor: Executor = None) -> _TemplateParameters:
+        """Return the parameters of a CSV or YAML data file, whose rows are read as they are rendered."""
+        rows = cls.data_file_rows(data_file, files_filter=files_filter, name_parameter=name_parameter)
+        # Only the first row is read to know the parameters
+        if (first_row := next(rows, None)) is None:
+            return cls([])
+
+        return cls(chain([first_row], rows), keys=list(first_row.keys()), executor=executor)
+
+    @classmethod
+    def from_dict(cls, definition: dict | Path | str, /, files_filter: FilesFilter = None,
+                  name_parameter: str = None, executor: Executor = None,
+                  file_index: FileIndex = None) -> _TemplateParameters:
+        if isinstance(definition, (str, Path)):
+            return cls.from_data_file(definition, files_filter=files_filter, name_parameter=name_parameter,
+                                      executor=executor)
+
+        parameter_files = cls.parameter_files(definition, files_filter=files_filter, name_parameter=name_parameter,
+                                              file_index=file_index)
+
+        # Files are referenced by path and loaded only when its row is rendered
+        return cls([{parameter: Path(file) for parameter, file in row.items()} for row in parameter_files],
+                   keys=list(definition.keys()) if parameter_files else [], executor=executor)
+
+    @classmethod
+    def _load_row(cls, parameters: dict[ParameterKey, ParameterValue]) -> dict[ParameterKey, ParameterValue]:
+        return {parameter: cls._load_parameter_from_file(value) if isinstance(value, Path) else value
+                for parameter, value in parameters.items()}
+
+    @classmethod
+    def _load_indexed_row(cls, parameters: dict[ParameterKey, ParameterValue]) -> tuple[dict, dict]:
+        return parameters, cls._load_row(parameters)
+
+    def create_images(self, template: Template, name_parameter: str = None) -> Iterator[Image.Image]:
+        """Yield the template images of each parameters row as rows are consumed.
+
+        Parameter files are loaded when its row is rendered, and released after it, reading ahead the
+        following rows in background if there is an executor.
+        """
+        if self.__executor is None:
+            rows = map(self._load_indexed_row, self.__parameters)
+        else:
+            rows = self.__executor.read_ahead(self._load_indexed_row, self.__parameters)
+
+        for parameters, loaded_parameters in rows:
+            image = template.create_image(loaded_parameters)
+            del loaded_parameters
+            if name_parameter:
+                # TUNE: This does not work as expected for filters as this does not contains the file name
+                image.filename = str(parameters[name_parameter])
+            yield image
 
 
 class Definition:
@@ -130,14 +405,40 @@ class Definition:
 
     DEFAULT_CARTULIFILE = 'Cartulifile.yml'
 
-    def __init__(self, values: dict, /, files_filter: FilesFilter = None):
-        self.__values = Definition._validate(values)
-        self.__decks = None
-        self.__sheets = None
+    def __init__(self, values: dict | DefinitionPlan, /, files_filter: FilesFilter = None, cache: Cache = None,
+                 executor: Executor = None, decks: Iterable[str] = None, registry: CardImageRegistry = None,
+                 file_index: FileIndex = None, base_dir: Path | str = None, progress: Progress = None):
+        self.__plan = values if isinstance(values, DefinitionPlan) else DefinitionPlan.compile(values)
+        self.__values = self.__plan.values
+        self.__selected_deck_names = None if decks is None else tuple(decks)
+        self.__decks = {}
+        self.__deck_files = {}
+        self.__sheet_groups = None
+        self.__sheets = {}
+        self.__released_deck_names = set()
+        # Last filters fitted to each deck images, by filter, size and bleed
+        self.__fitted_filters = {}
+
+        if registry is None:
+            registry = CardImageRegistry()
+        self.__registry = registry
+
+        if file_index is None:
+            file_index = FileIndex()
+        self.__file_index = file_index
+
+        self.__base_dir = None if base_dir is None else Path(base_dir)
+        self.__progress = progress
 
         if files_filter is None:
             files_filter = lambda x: False   # noqa: E731
         self.__files_filter = files_filter
+        self.__cache = cache
+
+        if executor is None:
+            # Workers are only started by executors owned, and closed, by the caller
+            executor = Executor(backend='serial', read_ahead=0)
+        self.__executor = executor
 
         self.__filters = None
         self.__template_parameters = None
@@ -146,8 +447,15 @@ class Definition:
     def _values(self) -> dict:
         return self.__values
 
+    @property
+    def _plan(self) -> DefinitionPlan:
+        return self.__plan
+
     @classmethod
-    def from_file(cls, path: Path | str = 'Cartulifile.yml', /, files_filter: FilesFilter = None) -> Definition:
+    def from_file(cls, path: Path | str = 'Cartulifile.yml', /, files_filter: FilesFilter = None,
+                  cache: Cache = None, executor: Executor = None, decks: Iterable[str] = None,
+                  registry: CardImageRegistry = None, file_index: FileIndex = None,
+                  progress: Progress = None) -> Definition:
         if isinstance(path, str):
             path = Path(path)
 
@@ -157,38 +465,55 @@ class Definition:
         if path.is_dir():
             path = path / cls.DEFAULT_CARTULIFILE
 
-        with path.open(mode='r') as file:
-            return cls(yaml.safe_load(file), files_filter)
+        # Definition paths are relative to the definition file
+        return cls(DefinitionPlan.from_file(path, cache=cache), files_filter, cache=cache, executor=executor,
+                   decks=decks, registry=registry, file_index=file_index, base_dir=path.parent,
+                   progress=progress)
 
-    def _validate(values: dict) -> dict:
-        # TODO: Implement validation
-        if values is None:
-            raise ValueError("Expected a dictionary, None found")
+    def _files_filter(self, file: Path | str) -> bool:
+        # Files are filtered by their path relative to the definition base directory
+        if self.__base_dir is not None and Path(file).is_relative_to(self.__base_dir):
+            file = Path(file).relative_to(self.__base_dir)
+        return self.__files_filter(str(file))
 
-        return values
+    def _filter_files(self, files: list[str]) -> list[str]:
+        logger = logging.getLogger('cartuli.definition.Definition._filter_files')
 
-    def _load_images(self, definition: dict) -> list[Image.Image]:
-        if 'image' in definition:
-            return [_load_image(definition['image'])]
-        elif 'images' in definition:
-            return [_load_image(i) for i in sorted(glob(definition['images']))]
+        filtered_files = [file for file in files if not self._files_filter(file)]
+        if len(files) != len(filtered_files):
+            logger.debug(f"Files filtered from {len(files)} to {len(filtered_files)}")
+
+        return filtered_files
+
+    def _load_images(self, definition: dict) -> Iterable[Image.Image]:
+        if 'image' in definition or 'images' in definition:
+            return list(self.__executor.read_ahead(_decode_image, self._filter_files(self._image_files(definition))))
         elif 'template' in definition:
             return self._load_template_images(definition['template'])
 
         raise ValueError(f"Invalid image definition {definition}")
 
-    def _load_template_parameters(self, definition: dict) -> _TemplateParameters:
-        if isinstance(definition, str):
+    def _template_parameter_patterns(self, definition: dict | str) -> dict[ParameterKey, str] | Path:
+        """Return the file patterns of each template parameter, or the data file with the parameters rows."""
+        if isinstance(definition, str) and definition in self._template_parameters:
             definition = self._template_parameters[definition]
 
-        return _TemplateParameters.from_dict(definition)
+        if isinstance(definition, str):
+            return self._path(definition)
+
+        return {parameter: str(self._path(pattern)) for parameter, pattern in definition.items()}
+
+    def _load_template_parameters(self, definition: dict, /, name_parameter: str = None) -> _TemplateParameters:
+        definition = self._template_parameter_patterns(definition)
 
-    def _load_template_images(self, definition: dict) -> list[Image.Image]:
+        return _TemplateParameters.from_dict(definition, files_filter=self._files_filter,
+                                             name_parameter=name_parameter, executor=self.__executor,
+                                             file_index=self.__file_index)
+
+    def _load_template_definition(self, definition: dict) -> tuple[Path, _TemplateParameters, str | None]:
         if 'parameters' not in definition:
             raise ValueError(f"Template definition must specify its parameters {definition}")
 
-        template_parameters = self._load_template_parameters(definition['parameters'])
-
         if 'file' not in definition:
             raise ValueError(f"Template definition must specify its file {definition}")
 
@@ -196,114 +521,496 @@ class Definition:
         if 'name_parameter' in definition:
             name_parameter = definition['name_parameter']
 
-        template = Template.from_file(definition['file'], template_parameters.keys)
+        template_parameters = self._load_template_parameters(definition['parameters'], name_parameter=name_parameter)
+
+        return self._path(definition['file']), template_parameters, name_parameter
+
+    def _load_template_images(self, definition: dict) -> Iterator[Image.Image]:
+        template_file, template_parameters, name_parameter = self._load_template_definition(definition)
+        if not template_parameters.keys:
+            return []
+
+        template = Template.from_file(template_file, template_parameters.keys, cache=self.__cache)
 
         return template_parameters.create_images(template, name_parameter)
 
+    def _load_template_rows(self, definition: dict) -> Iterator[_TemplateRow]:
+        template_file, template_parameters, name_parameter = self._load_template_definition(definition)
+        if not template_parameters.keys:
+            return iter(())
+
+        # Template parameters are validated before any row is sent to workers
+        keys = tuple(template_parameters.keys)
+        _load_template(template_file, keys, CardImageRegistry.stamp(template_file))
+
+        return (_TemplateRow(template_file, keys, parameters,
+                             name=Path(str(parameters[name_parameter])).stem if name_parameter else '')
+                for parameters in template_parameters.parameters)
+
     def _load_filter(self, definition: dict) -> Filter:
         if isinstance(definition, str):
             return self._filters[definition]
 
         return Filter.from_dict(definition)
 
-    def _load_card_images(self, definition: dict, size: Size) -> list[CardImage]:
-        logger = logging.getLogger('cartuli.definition.Definition._load_card_images')
-
-        images = self._load_images(definition)
-        filtered_images = [
-            image for image in images if not self.__files_filter(str(image.filename))
-        ]
-        if len(images) != len(filtered_images):
-            logger.debug(f"'{definition}' images filterd from {len(images)} to {len(filtered_images)}")
-
+    def _fit_filter(self, image_filter: Filter, sources: list[Path | _TemplateRow], size: Size,
+                    bleed: float) -> Filter:
+        """Return the filter fitted to the deck images, estimating it only if its images have changed."""
+        logger = logging.getLogger('cartuli.definition.Definition._fit_filter')
+
+        if image_filter.fitted:
+            return image_filter
+
+        # Fitted filters are identified by the images content, hashed only once while they are not modified
+        fit_key = Cache.key('fit', repr(image_filter), size, bleed, tuple(
+            source.content_hash if isinstance(source, _TemplateRow)
+            else _file_hash(source, CardImageRegistry.stamp(source)) for source in sources))
+        filter_key = (repr(image_filter), size, bleed)
+        if filter_key in self.__fitted_filters and self.__fitted_filters[filter_key][0] == fit_key:
+            return self.__fitted_filters[filter_key][1]
+
+        fitted_filter = None
+        if self.__cache is not None and (data := self.__cache.get_data(fit_key)) is not None:
+            fitted_filter = pickle.loads(data)
+            logger.debug(f"{fitted_filter} found in cache")
+        if fitted_filter is None:
+            # Filters estimated from a sample of the deck, like a shared skew, only decode or render the images
+            # they use, the rest are created by workers when they are sent
+            fitted_filter = image_filter.fit(
+                task.source for task in self.__executor.read_ahead(
+                    _decode_card_image_task,
+                    (_CardImageTask(source, image_filter, size, bleed) for source in sources)))
+            if self.__cache is not None:
+                self.__cache.put_data(fit_key, pickle.dumps(fitted_filter))
+
+        self.__fitted_filters[filter_key] = (fit_key, fitted_filter)
+        return fitted_filter
+
+    def _card_image_requests(self, definition: dict, size: Size) -> list[_CardImageRequest]:
         image_filter = NullFilter()
         if 'filter' in definition:
             image_filter = self._load_filter(definition['filter'])
-
-        with Pool(processes=_CONCURRENT_PROCESSES) as pool:
-            card_images = pool.map(
-                image_filter.apply,
-                (CardImage(
-                    image,
-                    size=size,
-                    bleed=measure_from_str(definition.get('bleed', str(CardImage.DEFAULT_BLEED))),
-                    name=Path(image.filename).stem
-                ) for image in filtered_images)
-            )
-
-        return tuple(card_images)
-
-    def _load_cards(self, definition: dict, size: Size) -> list[Card]:
+        bleed = self.__plan.measure(definition.get('bleed', CardImage.DEFAULT_BLEED))
+        use_cache = self.__cache is not None and not isinstance(image_filter, NullFilter)
+
+        if 'template' in definition:
+            sources = list(self._load_template_rows(definition['template']))
+        else:
+            sources = self._filter_files(self._image_files(definition))
+
+        image_filter = self._fit_filter(image_filter, sources, size, bleed)
+
+        # TUNE: Template images are not shared, but they are cached even without filters as rendering is costly
+        if 'template' in definition:
+            return [_CardImageRequest(_CardImageTask(row, image_filter, size, bleed), cached=self.__cache is not None)
+                    for row in sources]
+
+        files = sources
+
+        # Card images from the same unmodified file, filter, bleed and size are created once and shared, files
+        # are hashed for its cache key only if its card image is not registered
+        requests = []
+        for file in files:
+            requests.append(_CardImageRequest(
+                _CardImageTask(file, image_filter, size, bleed),
+                registry_key=CardImageRegistry.key(file, image_filter, bleed, size),
+                stamp=CardImageRegistry.stamp(file),
+                cached=use_cache
+            ))
+
+        return requests
+
+    def _execute_card_image_tasks(self, tasks: list[_CardImageTask]) -> Iterator[CardImage]:
+        if not tasks:
+            return iter(())
+
+        megapixels = [_task_megapixels(task) for task in tasks]
+        kinds = [repr(task.image_filter) for task in tasks]
+        if self.__progress is not None:
+            for task_megapixels, kind in zip(megapixels, kinds):
+                self.__progress.add(task_megapixels, kind=kind)
+
+        if self.__executor.serial:
+            # Following images are decoded in background while the current one is filtered
+            indexed_tasks = self.__executor.read_ahead(lambda t: (t[0], _decode_card_image_task(t[1])),
+                                                       enumerate(tasks))
+            return _started(_ordered_card_images(map(_create_timed_card_image, indexed_tasks), megapixels,
+                                                 kinds=kinds, progress=self.__progress))
+
+        # Largest images are created first so a huge one at the end does not keep the rest of the workers
+        # idle, the stable sort keeps the order of images of the same size to yield them as soon as possible
+        order = sorted(range(len(tasks)), key=lambda n: megapixels[n], reverse=True)
+        indexed_tasks = [(n, tasks[n]) for n in order]
+        if self.__executor.backend == 'process':
+            # Process workers return pixels through shared memory instead of pickling them
+            results = self.__executor.imap_unordered(_create_timed_shared_card_image, indexed_tasks)
+            return _started(_ordered_card_images(results, megapixels, kinds=kinds, progress=self.__progress,
+                                                 shared=True))
+
+        results = self.__executor.imap_unordered(_create_timed_card_image, indexed_tasks)
+        return _started(_ordered_card_images(results, megapixels, kinds=kinds, progress=self.__progress))
+
+    def _create_card_images(self, requests: Iterable[_CardImageRequest], /, user: Hashable = None
+                            ) -> Iterator[CardImage]:
+        """Send the missing card images to workers and return an iterator yielding all in order.
+
+        Missing card images are sent when this is called, not when the first one is consumed, so card
+        images of several decks can be created at the same time while callers process the previous ones.
+        """
+        logger = logging.getLogger('cartuli.definition.Definition._create_card_images')
+
+        requests = list(requests)
+        card_images = [None] * len(requests)
+        cache_keys = [None] * len(requests)
+        creators = {}
+        missing = []
+        for n, request in enumerate(requests):
+            if request.registry_key is not None:
+                card_images[n] = self.__registry.get(request.registry_key, request.stamp, user=user)
+                if card_images[n] is not None or request.registry_key in creators:
+                    continue
+                if not self.__registry.claim(request.registry_key, request.stamp):
+                    # Created for a deck sent before by this or other definition sharing the registry
+                    continue
+                creators[request.registry_key] = n
+            cache_keys[n] = request.cache_key
+            if cache_keys[n] is not None and self.__cache.contains(cache_keys[n]):
+                continue
+            missing.append(n)
+
+        logger.debug(f"{len(missing)} of {len(requests)} card images will be created")
+        created_card_images = self._execute_card_image_tasks([requests[n].task for n in missing])
+
+        return self._yield_card_images(requests, card_images, cache_keys, creators, set(missing),
+                                       created_card_images, user=user)
+
+    def _yield_card_images(self, requests: list[_CardImageRequest], card_images: list[CardImage | None],
+                           cache_keys: list[CacheKey | None], creators: dict[RegistryKey, int], missing: set[int],
+                           created_card_images: Iterator[CardImage], /, user: Hashable = None
+                           ) -> Iterator[CardImage]:
+        try:
+            yield from self._yield_created_card_images(requests, card_images, cache_keys, creators, missing,
+                                                       created_card_images, user=user)
+        finally:
+            # Card images not created because the caller stopped early are created again if needed
+            for registry_key, n in creators.items():
+                self.__registry.abandon(registry_key, requests[n].stamp)
+
+    def _yield_created_card_images(self, requests: list[_CardImageRequest], card_images: list[CardImage | None],
+                                   cache_keys: list[CacheKey | None], creators: dict[RegistryKey, int],
+                                   missing: set[int], created_card_images: Iterator[CardImage], /,
+                                   user: Hashable = None) -> Iterator[CardImage]:
+        for n, (request, card_image, cache_key) in enumerate(zip(requests, card_images, cache_keys)):
+            if card_image is None:
+                if request.registry_key is not None and creators.get(request.registry_key) != n:
+                    card_image = self.__registry.wait(request.registry_key, request.stamp, user=user)
+                    if card_image is None:
+                        # Its creator stopped before creating it
+                        card_image = next(self._execute_card_image_tasks([request.task]))
+                elif n in missing:
+                    card_image = next(created_card_images)
+                    if cache_key is not None:
+                        self.__cache.put_card_image(cache_key, card_image)
+                else:
+                    card_image = self.__cache.get_card_image(cache_key, size=request.task.size, name=request.name)
+                    if card_image is None:
+                        # Evicted since it was found in the cache
+                        card_image = next(self._execute_card_image_tasks([request.task]))
+                        self.__cache.put_card_image(cache_key, card_image)
+                if request.registry_key is not None and creators.get(request.registry_key) == n:
+                    self.__registry.put(request.registry_key, request.stamp, card_image, user=user)
+            yield card_image
+
+    def _load_cards(self, definition: dict, size: Size, /, deck_name: str = '') -> Iterator[Card]:
         if 'front' not in definition:
             raise ValueError("Cards definition must have a front image")
-        front_images = self._load_card_images(definition['front'], size)
+        front_requests = self._card_image_requests(definition['front'], size)
+        user = (id(self), deck_name)
 
-        back_images = None
-        if 'back' in definition:
-            back_images = self._load_card_images(definition['back'], size)
-            if len(front_images) != len(back_images):
-                raise ValueError(f"The number of front ({len(front_images)}) and back ({len(back_images)}) images "
-                                 f"must be the same in cards definition")
-            return [Card(front_image, back_image, size=size)
-                    for front_image, back_image in zip(front_images, back_images)]
+        if 'back' not in definition:
+            return (Card(image, size=size) for image in self._create_card_images(front_requests, user=user))
 
-        return [Card(image, size=size) for image in front_images]
+        back_requests = self._card_image_requests(definition['back'], size)
+        if len(front_requests) != len(back_requests):
+            raise ValueError(f"The number of front ({len(front_requests)}) and back ({len(back_requests)}) images "
+                             f"must be the same in cards definition")
 
-    def _load_deck(self, definition: dict, /, name: str = '') -> Deck:
+        # Front and back images are created interleaved so each card is available as soon as possible
+        card_images = self._create_card_images(chain.from_iterable(zip(front_requests, back_requests)), user=user)
+        return (Card(front_image, back_image, size=size) for front_image, back_image in zip(card_images, card_images))
+
+    def _load_deck(self, definition: dict, /, name: str = '') -> Iterator[Card]:
+        """Send the deck card images to workers and return an iterator yielding its cards as soon as they are
+        created, the deck is stored once all are added."""
         if 'size' not in definition:
             raise ValueError("No size defined for deck")
-        size = Size.from_str(definition['size'])
-        cards = self._load_cards(definition, size)
-
-        cards = cards * definition.get('copies', 1)
+        size = self.__plan.size(definition['size'])
 
-        default_back = None
+        default_back_images = iter(())
         if 'default_back' in definition:
-            if default_back_images := self._load_card_images(definition['default_back'], size):
-                default_back = default_back_images[0]
+            default_back_images = self._create_card_images(
+                self._card_image_requests(definition['default_back'], size), user=(id(self), name))
+
+        return self._add_deck_cards(definition, name, size, default_back_images,
+                                    self._load_cards(definition, size, deck_name=name))
+
+    def _add_deck_cards(self, definition: dict, name: str, size: Size, default_back_images: Iterator[CardImage],
+                        cards: Iterator[Card]) -> Iterator[Card]:
+        default_back = next(default_back_images, None)
+        deque(default_back_images, maxlen=0)
+
+        deck = Deck(name=name, size=size, default_back=default_back)
+        loaded_cards = []
+        for card in cards:
+            deck.add(card)
+            loaded_cards.append(card)
+            yield card
+        for _ in range(definition.get('copies', 1) - 1):
+            for card in loaded_cards:
+                deck.add(card)
+                yield card
+
+        self.__decks[name] = deck
+
+    @property
+    def deck_names(self) -> tuple[str]:
+        """Return the names of the selected decks, all the defined ones if no selection was made."""
+        deck_names = tuple(self.__values.get('decks', {}).keys())
+        if self.__selected_deck_names is None:
+            return deck_names
+
+        if unknown_deck_names := set(self.__selected_deck_names) - set(deck_names):
+            raise DefinitionError(f"Unknown decks {', '.join(sorted(unknown_deck_names))}")
+        return tuple(name for name in deck_names if name in self.__selected_deck_names)
+
+    def deck_cards(self, name: str) -> Iterator[Card]:
+        """Return an iterator of the deck cards, sending them to workers if the deck is not loaded."""
+        logger = logging.getLogger('cartuli.definition.Definition.deck_cards')
+        if name in self.__decks:
+            return iter(self.__decks[name].cards)
+
+        definition = self.__values['decks'][name]
+        logger.debug(f"Deck '{name}' definition {definition}")
+        self.__deck_files[name] = set(self.deck_files(name))
+        return self._load_deck(definition, name)
+
+    def deck(self, name: str) -> Deck:
+        if name not in self.__decks:
+            deque(self.deck_cards(name), maxlen=0)
+
+        return self.__decks[name]
+
+    def _drop_deck(self, name: str) -> None:
+        self.__decks.pop(name, None)
+        self.__deck_files.pop(name, None)
+        for deck_names in tuple(self.__sheets):
+            if name in deck_names:
+                del self.__sheets[deck_names]
+
+    def release(self, deck_names: Iterable[str]) -> None:
+        """Free loaded decks, their sheets and card images so they are loaded again when needed."""
+        logger = logging.getLogger('cartuli.definition.Definition.release')
+
+        for name in deck_names:
+            self._drop_deck(name)
+            self.__released_deck_names.add(name)
+            logger.debug(f"Released deck '{name}'")
+
+        # Card images are kept while any deck not yet loaded uses them
+        pending_files = {
+            file.resolve() for name in self.deck_names
+            if name not in self.__decks and name not in self.__released_deck_names
+            for file in self.deck_files(name)
+        }
+        for name in deck_names:
+            self.__registry.release((id(self), name), keep=lambda file: file in pending_files)
+
+    def update(self, values: dict | DefinitionPlan) -> None:
+        """Replace definition values keeping loaded decks whose definition did not change."""
+        previous_deck_values = {name: self._deck_values(name) for name in self.__decks}
+        previous_sheet_definition = self._sheet_definition
+
+        self.__plan = values if isinstance(values, DefinitionPlan) else DefinitionPlan.compile(values)
+        self.__values = self.__plan.values
+        self.__filters = None
+        self.__sheet_groups = None
+
+        for name, deck_values in previous_deck_values.items():
+            if name not in self.deck_names or self._deck_values(name) != deck_values:
+                self._drop_deck(name)
+        if self._sheet_definition != previous_sheet_definition:
+            self.__sheets = {}
 
-        return Deck(cards, name=name, size=size, default_back=default_back)
+    def invalidate(self, files: Iterable[Path]) -> None:
+        """Discard loaded decks that use or could use any of the files."""
+        self.__file_index.refresh()
+
+        files = {Path(file).resolve() for file in files}
+        for name in tuple(self.__decks):
+            deck_files = {file.resolve() for file in self.__deck_files[name] | set(self.deck_files(name))}
+            if files & deck_files:
+                self._drop_deck(name)
 
     @property
     def decks(self) -> list[Deck]:
         logger = logging.getLogger('cartuli.definition.Definition.decks')
-        if self.__decks is None:
-            self.__decks = []
-            for name, definition in self.__values.get('decks', {}).items():
-                logger.debug(f"Deck '{name}' definition {definition}")
-                self.__decks.append(self._load_deck(definition, name))
-            if not self.__decks:
-                logger.warning('No decks loaded in definition')
+        decks = [self.deck(name) for name in self.deck_names]
+        if not decks:
+            logger.warning('No decks loaded in definition')
 
-        return self.__decks
+        return decks
 
     @property
-    def sheets(self) -> dict[tuple[str], Sheet]:
-        # TODO: Replace sheets with generic outputs
-        if self.__sheets is None:
-            self.__sheets = {}
+    def _sheet_definition(self) -> dict:
+        return self.__values.get('outputs', {}).get('sheet', {})
+
+    @property
+    def sheet_groups(self) -> tuple[tuple[str]]:
+        """Return the names of the decks included in each sheet without loading them."""
+        if self.__sheet_groups is None:
+            self.__sheet_groups = ()
             if 'sheet' in self.__values['outputs']:
-                sheet_definition = self.__values['outputs']['sheet']
-                if sheet_definition.get('share', True):
-                    group_function = lambda x: x.size   # noqa: E731
+                deck_definitions = self.__values.get('decks', {})
+                if self._sheet_definition.get('share', True):
+                    group_function = lambda x: self.__plan.size(deck_definitions[x]['size'])   # noqa: E731
                 else:
-                    group_function = lambda x: x.name   # noqa: E731
-                groups = groupby(sorted(self.decks, key=group_function), key=group_function)
-                for _, decks in groups:
-                    decks = tuple(decks)  # itertools.groypby object can only be readed once
-                    deck_names = tuple(deck.name for deck in decks)
-                    cards = chain.from_iterable(deck.cards for deck in decks)
-                    self.__sheets[deck_names] = Sheet(
-                        cards,
-                        size=Size.from_str(sheet_definition.get('size', str(Sheet.DEFAULT_SIZE))),
-                        print_margin=measure_from_str(
-                            sheet_definition.get('print_margin', str(Sheet.DEFAULT_PRINT_MARGIN))),
-                        padding=measure_from_str(sheet_definition.get('padding', str(Sheet.DEFAULT_PADDING))),
-                        crop_marks_padding=measure_from_str(
-                            sheet_definition.get('crop_marks_padding', str(Sheet.DEFAULT_CROP_MARKS_PADDING)))
-                    )
-
-        return self.__sheets
+                    group_function = lambda x: x   # noqa: E731
+                groups = groupby(sorted(self.deck_names, key=group_function), key=group_function)
+                self.__sheet_groups = tuple(tuple(deck_names) for _, deck_names in groups)
+
+        return self.__sheet_groups
+
+    @staticmethod
+    def sheet_name(deck_names: tuple[str]) -> str:
+        return '_'.join(deck_names)
+
+    def sheet_group(self, name: str) -> tuple[str]:
+        """Return the names of the decks included in a sheet from the sheet name."""
+        for deck_names in self.sheet_groups:
+            if self.sheet_name(deck_names) == name:
+                return deck_names
+
+        raise DefinitionError(f"Unknown sheet '{name}', available sheets are "
+                              f"{', '.join(self.sheet_name(deck_names) for deck_names in self.sheet_groups)}")
+
+    def _sheet_parameters(self) -> dict:
+        sheet_definition = self._sheet_definition
+        return {
+            'size': self.__plan.size(sheet_definition.get('size', Sheet.DEFAULT_SIZE)),
+            'print_margin': self.__plan.measure(sheet_definition.get('print_margin', Sheet.DEFAULT_PRINT_MARGIN)),
+            'padding': self.__plan.measure(sheet_definition.get('padding', Sheet.DEFAULT_PADDING)),
+            'crop_marks_padding': self.__plan.measure(
+                sheet_definition.get('crop_marks_padding', Sheet.DEFAULT_CROP_MARKS_PADDING))
+        }
+
+    def sheet(self, deck_names: tuple[str]) -> Sheet:
+        """Return the sheet of a group of decks loading only those decks."""
+        if deck_names not in self.__sheets:
+            cards = chain.from_iterable(self.deck(name).cards for name in deck_names)
+            self.__sheets[deck_names] = Sheet(cards, **self._sheet_parameters())
+
+        return self.__sheets[deck_names]
+
+    def sheet_cards(self, deck_names: tuple[str]) -> Iterator[Card]:
+        """Yield the cards of a sheet as soon as they are created, loading only its decks.
+
+        Card images of all decks are sent to workers before yielding the first card, so workers are not
+        idle waiting for a deck to be consumed before the next one is sent.
+        """
+        for cards in [self.deck_cards(name) for name in deck_names]:
+            yield from cards
+
+    def sheet_layout(self, deck_names: tuple[str]) -> Sheet:
+        """Return an empty sheet with the layout of a group of decks without loading them."""
+        card_size = self.__plan.size(self.__values['decks'][deck_names[0]]['size'])
+        return Sheet(card_size=card_size, **self._sheet_parameters())
+
+    @property
+    def sheets(self) -> dict[tuple[str], Sheet]:
+        # TODO: Replace sheets with generic outputs
+        return {deck_names: self.sheet(deck_names) for deck_names in self.sheet_groups}
+
+    def _path(self, path: Path | str) -> Path:
+        """Return a definition path relative to the definition base directory."""
+        if self.__base_dir is None:
+            return Path(path)
+        return self.__base_dir / path
+
+    def _image_files(self, definition: dict) -> list[Path]:
+        if 'image' in definition:
+            return [self._path(definition['image'])]
+        elif 'images' in definition:
+            return [Path(f) for f in self.__file_index.glob(self._path(definition['images']))]
+        elif 'template' in definition:
+            files = [self._path(definition['template']['file'])] if 'file' in definition['template'] else []
+            parameters = self._template_parameter_patterns(definition['template'].get('parameters', {}))
+            if isinstance(parameters, Path):
+                files.append(parameters)
+                for row in _TemplateParameters.data_file_rows(parameters):
+                    files += [value for value in row.values() if isinstance(value, Path)]
+                return files
+            for parameter in parameters.values():
+                files += [Path(f) for f in self.__file_index.glob(parameter)]
+            return files
+
+        raise ValueError(f"Invalid image definition {definition}")
+
+    def image_sources(self, definition: dict) -> list[Path]:
+        """Return the file each image of an image definition is created from without loading them."""
+        if 'template' in definition:
+            template_definition = definition['template']
+            rows = _TemplateParameters.parameter_files(
+                self._template_parameter_patterns(template_definition['parameters']),
+                files_filter=self._files_filter, name_parameter=template_definition.get('name_parameter'),
+                file_index=self.__file_index)
+            return [self._path(template_definition['file'])] * len(rows)
+
+        return self._filter_files(self._image_files(definition))
+
+    def deck_files(self, name: str) -> list[Path]:
+        """Return the source files used to create a deck."""
+        files = []
+        definition = self.__values['decks'][name]
+        for side in ('front', 'back', 'default_back'):
+            if side in definition:
+                files += self._image_files(definition[side])
+
+        return files
+
+    @property
+    def files(self) -> list[Path]:
+        """Return the source files used by all decks."""
+        return list(chain.from_iterable(self.deck_files(name) for name in self.deck_names))
+
+    def sheet_files(self, deck_names: tuple[str]) -> list[Path]:
+        """Return the source files used to create a sheet."""
+        return list(chain.from_iterable(self.deck_files(name) for name in deck_names))
+
+    def _deck_values(self, name: str) -> dict:
+        definition = self.__values['decks'][name]
+        values = {'decks': {name: definition}}
+
+        # Named filters and template parameters referenced by the deck
+        for side in ('front', 'back', 'default_back'):
+            side_definition = definition.get(side, {})
+            if isinstance(side_definition.get('filter'), str):
+                values.setdefault('filters', {})[side_definition['filter']] = \
+                    self._values.get('filters', {}).get(side_definition['filter'])
+            template_parameters = side_definition.get('template', {}).get('parameters')
+            if isinstance(template_parameters, str):
+                values.setdefault('template_parameters', {})[template_parameters] = \
+                    self._template_parameters.get(template_parameters)
+
+        return values
+
+    def sheet_values(self, deck_names: tuple[str]) -> dict:
+        """Return the definition subtree used to create a sheet."""
+        values = {'outputs': {'sheet': self._sheet_definition}}
+        for name in deck_names:
+            for key, value in self._deck_values(name).items():
+                values.setdefault(key, {}).update(value)
+
+        return values
 
     @property
     def _template_parameters(self) -> dict[str, dict]:
@@ -0,0 +1,153 @@
+"""Build workers executor module."""
+from __future__ import annotations
+
+import logging
+import threading
+
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+from .farm import DirectoryQueue
+
+
+BACKENDS = ('process', 'thread', 'serial', 'queue')
+DEFAULT_BACKEND = 'process'
+DEFAULT_READ_AHEAD = 8
+
+
+def default_jobs() -> int:
+    """Return the default number of workers leaving one CPU to the main process."""
+    return max(1, cpu_count() - 1)
+
+
+def _initialize_worker() -> None:
+    # Heavy libraries are imported once when the worker starts instead of in its first task
+    import cv2          # noqa: F401
+    import cairosvg     # noqa: F401
+
+
+class Executor:
+    """Worker pool shared by all the tasks of a build."""
+
+    def __init__(self, jobs: int = None, /, backend: str = DEFAULT_BACKEND, read_ahead: int = DEFAULT_READ_AHEAD,
+                 queue_dir: Path | str = None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Invalid backend '{backend}', valid values are {', '.join(BACKENDS)}")
+        if backend == 'queue' and queue_dir is None:
+            raise ValueError("A queue directory is required by the queue backend")
+        if jobs is None:
+            jobs = default_jobs()
+        if jobs < 1:
+            raise ValueError(f"At least one job is required, {jobs} found")
+        if read_ahead < 0:
+            raise ValueError(f"Read ahead depth can not be negative, {read_ahead} found")
+
+        self.__jobs = jobs
+        self.__backend = backend
+        self.__read_ahead = read_ahead
+        self.__queue_dir = None if queue_dir is None else Path(queue_dir)
+        self.__pool = None
+        self.__read_ahead_pool = None
+        # Builds of different definitions may share the executor from several threads
+        self.__lock = threading.Lock()
+
+    @property
+    def jobs(self) -> int:
+        return self.__jobs
+
+    @property
+    def backend(self) -> str:
+        return self.__backend
+
+    @property
+    def read_ahead_depth(self) -> int:
+        return self.__read_ahead
+
+    @property
+    def serial(self) -> bool:
+        """Return if tasks are executed in the calling thread."""
+        # Queued tasks are executed by workers in other processes or machines whatever the jobs are
+        return self.__backend == 'serial' or (self.__jobs == 1 and self.__backend != 'queue')
+
+    @property
+    def _pool(self) -> Pool | ThreadPool | DirectoryQueue:
+        logger = logging.getLogger('cartuli.executor.Executor')
+        with self.__lock:
+            if self.__pool is None:
+                logger.debug(f"Starting {self.__jobs} {self.__backend} workers")
+                if self.__backend == 'process':
+                    self.__pool = Pool(processes=self.__jobs, initializer=_initialize_worker)
+                elif self.__backend == 'queue':
+                    self.__pool = DirectoryQueue(self.__queue_dir)
+                else:
+                    self.__pool = ThreadPool(processes=self.__jobs)
+
+        return self.__pool
+
+    def map(self, function: Callable, iterable: Iterable) -> list:
+        if self.serial:
+            return list(map(function, iterable))
+        return self._pool.map(function, iterable)
+
+    def imap(self, function: Callable, iterable: Iterable) -> Iterator:
+        if self.serial:
+            return map(function, iterable)
+        return self._pool.imap(function, iterable)
+
+    def imap_unordered(self, function: Callable, iterable: Iterable) -> Iterator:
+        if self.serial:
+            return map(function, iterable)
+        return self._pool.imap_unordered(function, iterable)
+
+    def read_ahead(self, function: Callable, iterable: Iterable) -> Iterator:
+        """Return function results in order computing the following ones in background threads.
+
+        Intended for I/O bound functions like image decoding, which releases the GIL, so its results are
+        available as soon as possible while the caller processes the previous ones. No more than the read
+        ahead depth results are computed in advance.
+        """
+        if not self.__read_ahead:
+            yield from map(function, iterable)
+            return
+
+        with self.__lock:
+            if self.__read_ahead_pool is None:
+                self.__read_ahead_pool = ThreadPoolExecutor(max_workers=self.__read_ahead,
+                                                            thread_name_prefix='cartuli-read-ahead')
+
+        futures = deque()
+        try:
+            for item in iterable:
+                futures.append(self.__read_ahead_pool.submit(function, item))
+                if len(futures) > self.__read_ahead:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def close(self) -> None:
+        if self.__pool is not None:
+            self.__pool.close()
+            if not isinstance(self.__pool, DirectoryQueue):
+                self.__pool.join()
+            self.__pool = None
+        if self.__read_ahead_pool is not None:
+            self.__read_ahead_pool.shutdown()
+            self.__read_ahead_pool = None
+
+    def __enter__(self) -> Executor:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __str__(self) -> str:
+        if self.__backend == 'queue':
+            return f"{self.__queue_dir} queue workers"
+        return f"{self.__jobs} {self.__backend} workers"
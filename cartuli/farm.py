@@ -0,0 +1,285 @@
+"""Shared directory tasks queue module."""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import pickle
+import socket
+import threading
+import time
+
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+
+DEFAULT_POLL_INTERVAL = 0.1
+# TUNE: Running tasks not renewed by its worker in this time are queued again
+DEFAULT_LEASE = 60
+# TUNE: Seconds waiting for a result between warnings about workers not running
+DEFAULT_WAIT_WARNING = 60
+
+TASK_SUFFIX = '.task'
+RESULT_SUFFIX = '.result'
+
+
+class DirectoryQueue:
+    """Tasks queue in a directory shared with workers running in this or other machines.
+
+    Tasks are pickled functions and arguments stored in files named by their content hash, which
+    workers claim renaming them, so each task is executed once, and whose results are stored by the
+    same hash to be fetched by the coordinator. Tasks are claimed in the order they are submitted.
+    Files referenced by tasks must be available in the same path to all workers.
+
+    Workers renew the lease of the tasks they are running touching its files, tasks whose lease
+    expires because its worker died are queued again by the coordinator or any other worker.
+
+    Tasks and results are unpickled, so running any code, by workers and the coordinator, the
+    directory must be trusted and writable only by the user running the build and its workers.
+    """
+
+    def __init__(self, path: Path | str, /, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 lease: float = DEFAULT_LEASE, timeout: float = None, wait_warning: float = DEFAULT_WAIT_WARNING):
+        if lease <= 0:
+            raise ValueError(f"Lease must be positive, {lease} found")
+        if timeout is not None and timeout <= 0:
+            raise ValueError(f"Timeout must be positive, {timeout} found")
+
+        self.__path = Path(path)
+        self.__poll_interval = poll_interval
+        self.__lease = lease
+        self.__timeout = timeout
+        self.__wait_warning = wait_warning
+        # Tasks submitted by this coordinator waiting for its results to be fetched
+        self.__pending = Counter()
+        self.__task_files = {}
+        # Builds of different definitions may submit tasks from several threads
+        self.__lock = threading.Lock()
+
+        for directory in (self.tasks_dir, self.running_dir, self.results_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def path(self) -> Path:
+        return self.__path
+
+    @property
+    def tasks_dir(self) -> Path:
+        return self.__path / 'tasks'
+
+    @property
+    def running_dir(self) -> Path:
+        return self.__path / 'running'
+
+    @property
+    def results_dir(self) -> Path:
+        return self.__path / 'results'
+
+    @property
+    def lease(self) -> float:
+        return self.__lease
+
+    def _result_file(self, key: str) -> Path:
+        return self.results_dir / f"{key}{RESULT_SUFFIX}"
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        # Files are written with a name ignored by workers and renamed to be read only when complete
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+
+    def submit(self, function: Callable, item: Any) -> str:
+        """Queue a function call and return the hash to fetch its result."""
+        data = pickle.dumps((function, item), protocol=pickle.HIGHEST_PROTOCOL)
+        key = hashlib.sha256(data).hexdigest()
+
+        # Equal tasks are executed once and share the result
+        with self.__lock:
+            if not self.__pending[key]:
+                task_file = self.tasks_dir / f"{time.time_ns():020d}-{key}{TASK_SUFFIX}"
+                self._write(task_file, data)
+                self.__task_files[key] = task_file
+            self.__pending[key] += 1
+
+        return key
+
+    def ready(self, key: str) -> bool:
+        return self._result_file(key).exists()
+
+    def result(self, key: str) -> Any:
+        """Wait for the result of a submitted task and return it, raising the exception the task raised.
+
+        TimeoutError is raised if the result is not available after the queue timeout, if any.
+        """
+        logger = logging.getLogger('cartuli.farm.DirectoryQueue.result')
+
+        result_file = self._result_file(key)
+        start = last_warning = time.monotonic()
+        while not result_file.exists():
+            self.requeue_expired()
+            time.sleep(self.__poll_interval)
+            now = time.monotonic()
+            if self.__timeout is not None and now - start > self.__timeout:
+                self._release(key)
+                raise TimeoutError(f"Task {key} result not available in {self.__path} after {self.__timeout}s")
+            if now - last_warning > self.__wait_warning:
+                # Nothing is created if no worker is started with 'cartuli worker' in the queue directory
+                logger.warning(f"Waiting for workers of {self.__path} for {now - start:.0f}s, "
+                               f"{len(list(self.running_dir.glob('*' + TASK_SUFFIX)))} tasks running")
+                last_warning = now
+
+        failed, value = pickle.loads(result_file.read_bytes())
+        self._release(key)
+        if failed:
+            raise value
+        return value
+
+    def _release(self, key: str, /, all_users: bool = False) -> None:
+        with self.__lock:
+            self.__pending[key] = 0 if all_users else self.__pending[key] - 1
+            if not self.__pending[key]:
+                del self.__pending[key]
+                self.__task_files.pop(key).unlink(missing_ok=True)
+                self._result_file(key).unlink(missing_ok=True)
+
+    def imap(self, function: Callable, iterable: Iterable) -> Iterator:
+        # Tasks are submitted when called, as pools do, not when its results are consumed
+        return self._results([self.submit(function, item) for item in iterable])
+
+    def _results(self, keys: list[str]) -> Iterator:
+        fetched = 0
+        try:
+            for key in keys:
+                fetched += 1
+                yield self.result(key)
+        finally:
+            # Results not fetched are discarded if the caller stops early
+            for key in keys[fetched:]:
+                self._release(key)
+
+    def imap_unordered(self, function: Callable, iterable: Iterable) -> Iterator:
+        return self._unordered_results(Counter(self.submit(function, item) for item in iterable))
+
+    def _unordered_results(self, pending: Counter) -> Iterator:
+        try:
+            while pending:
+                ready = [key for key in pending if self.ready(key)]
+                if not ready:
+                    self.requeue_expired()
+                    time.sleep(self.__poll_interval)
+                for key in ready:
+                    while pending[key]:
+                        pending[key] -= 1
+                        yield self.result(key)
+                    del pending[key]
+        finally:
+            # Results not fetched are discarded if the caller stops early
+            for key, count in pending.items():
+                for _ in range(count):
+                    self._release(key)
+
+    def map(self, function: Callable, iterable: Iterable) -> list:
+        return list(self.imap(function, iterable))
+
+    def close(self) -> None:
+        """Discard the tasks whose results were not fetched."""
+        for key in tuple(self.__pending):
+            self._release(key, all_users=True)
+
+    def requeue_expired(self) -> int:
+        """Queue again the running tasks whose lease expired and return how many were queued."""
+        logger = logging.getLogger('cartuli.farm.DirectoryQueue.requeue_expired')
+
+        requeued = 0
+        now = time.time()
+        for running_file in self.running_dir.glob('*' + TASK_SUFFIX):
+            try:
+                if now - running_file.stat().st_mtime < self.__lease:
+                    continue
+                # The original name keeps the task position in the queue
+                sequence, key, worker = running_file.name[:-len(TASK_SUFFIX)].split('-', 2)
+                os.rename(running_file, self.tasks_dir / f"{sequence}-{key}{TASK_SUFFIX}")
+            except (FileNotFoundError, ValueError):
+                # Completed or queued again by other worker
+                continue
+            logger.warning(f"Task {key} lease of worker {worker} expired, queued again")
+            requeued += 1
+
+        return requeued
+
+    def claim(self) -> Path | None:
+        """Claim the oldest queued task for this worker and return its running file."""
+        self.requeue_expired()
+        worker = f"{socket.gethostname()}-{os.getpid()}"
+        for task_name in sorted(name for name in os.listdir(self.tasks_dir) if name.endswith(TASK_SUFFIX)):
+            running_file = self.running_dir / f"{task_name[:-len(TASK_SUFFIX)]}-{worker}{TASK_SUFFIX}"
+            try:
+                os.rename(self.tasks_dir / task_name, running_file)
+            except FileNotFoundError:
+                # Claimed by other worker or discarded by the coordinator
+                continue
+            # The lease starts when the task is claimed, not when it was queued
+            os.utime(running_file)
+            return running_file
+
+        return None
+
+    def _renew_lease(self, running_file: Path, done: threading.Event) -> None:
+        while not done.wait(self.__lease / 3):
+            try:
+                os.utime(running_file)
+            except FileNotFoundError:
+                return
+
+    def run(self, running_file: Path) -> None:
+        """Execute a claimed task and store its result."""
+        logger = logging.getLogger('cartuli.farm.DirectoryQueue.run')
+
+        data = running_file.read_bytes()
+        key = hashlib.sha256(data).hexdigest()
+        done = threading.Event()
+        lease = threading.Thread(target=self._renew_lease, args=(running_file, done), daemon=True)
+        lease.start()
+        try:
+            function, item = pickle.loads(data)
+            result = (False, function(item))
+        except Exception as e:
+            logger.warning(f"Task {key} failed: {e}")
+            result = (True, e)
+        finally:
+            done.set()
+            lease.join()
+
+        try:
+            result_data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            result_data = pickle.dumps((True, RuntimeError(f"Unable to return task {key} result: {e}")))
+        self._write(self._result_file(key), result_data)
+        running_file.unlink(missing_ok=True)
+        logger.debug(f"Task {key} completed")
+
+    def work(self, /, idle_timeout: float = None) -> int:
+        """Execute queued tasks until no task is queued for the idle timeout and return the executed ones."""
+        tasks = 0
+        idle_since = time.monotonic()
+        while idle_timeout is None or time.monotonic() - idle_since < idle_timeout:
+            if (running_file := self.claim()) is None:
+                time.sleep(self.__poll_interval)
+                continue
+            self.run(running_file)
+            tasks += 1
+            idle_since = time.monotonic()
+
+        return tasks
+
+
+def work(path: Path | str, worker: int = 0, /, poll_interval: float = DEFAULT_POLL_INTERVAL,
+         idle_timeout: float = None, lease: float = DEFAULT_LEASE) -> int:
+    """Execute the tasks of a queue directory and return the number of executed tasks."""
+    logger = logging.getLogger('cartuli.farm.work')
+
+    logger.info(f"Worker {worker} waiting for tasks in {path}")
+    return DirectoryQueue(path, poll_interval=poll_interval, lease=lease).work(idle_timeout=idle_timeout)
@@ -2,13 +2,17 @@ from __future__ import annotations
 
 import logging
 
+import numpy as np
+
 from abc import ABC, abstractmethod
 from carpeta import Traceable, extract_id
-from dataclasses import dataclass
+from collections.abc import Iterable
+from dataclasses import dataclass, fields, replace
+from itertools import islice, tee
 
 from .card import CardImage
 from .measure import mm, from_str
-from .processing import inpaint, straighten, crop
+from .processing import bleed, inpaint, skew_angle, straighten, crop, _inliers, BLEED_MODES, SKEW_METHODS
 
 
 class Filter(ABC):
@@ -16,6 +20,15 @@ class Filter(ABC):
     def apply(self, card_image: CardImage) -> CardImage:
         pass    # pragma: no cover
 
+    def fit(self, card_images: Iterable[CardImage]) -> Filter:
+        """Return the filter to apply to a batch of card images, that may be estimated from some of them."""
+        return self
+
+    @property
+    def fitted(self) -> bool:
+        """Return if the filter can be applied without fitting it to a batch of card images."""
+        return True
+
     @classmethod
     def from_dict(cls, filter_dict: dict) -> Filter:
         if not filter_dict:
@@ -25,13 +38,20 @@ class Filter(ABC):
             filter_class = globals()[snake_to_class(filter_name) + 'Filter']
             filter_args = {}
             if filter_dict[filter_name] is not None:
-                filter_args = {k: from_str(v) for k, v in filter_dict[filter_name].items()}
+                measures = cls.measure_arguments(filter_name)
+                filter_args = {k: from_str(v) if k in measures else v for k, v in filter_dict[filter_name].items()}
             return filter_class(**filter_args)
         else:
             return MultipleFilter(
                 *(cls.from_dict({i[0]: i[1]}) for i in filter_dict.items())
             )
 
+    @staticmethod
+    def measure_arguments(filter_name: str) -> tuple[str, ...]:
+        """Return the arguments of a filter that are measures, which can be expressions like 2*mm."""
+        filter_class = globals()[snake_to_class(filter_name) + 'Filter']
+        return tuple(field.name for field in fields(filter_class) if field.type == 'float')
+
 
 @dataclass(frozen=True)
 class NullFilter(Filter):
@@ -49,9 +69,20 @@ class MultipleFilter(Filter):
 
         return card_image
 
+    def fit(self, card_images: Iterable[CardImage]) -> Filter:
+        # TUNE: Filters are fitted with the original card images, not the ones applied the previous filters
+        return MultipleFilter(*(f.fit(i) for f, i in zip(self._filters, tee(card_images, len(self._filters)))))
+
+    @property
+    def fitted(self) -> bool:
+        return all(f.fitted for f in self._filters)
+
     def __eq__(self, other) -> bool:
         return self._filters == other._filters
 
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({', '.join(repr(f) for f in self._filters)})"
+
 
 @dataclass(frozen=True)
 class InpaintFilter(Filter):
@@ -59,6 +90,12 @@ class InpaintFilter(Filter):
     image_crop: float = 0.8*mm
     corner_radius: float = 3*mm
     inpaint_radius: float = 1*mm
+    # TUNE: Lower scales trade inpainting quality for speed in high resolution images
+    scale: float = 1
+
+    def __post_init__(self):
+        if not 0 < self.scale <= 1:
+            raise ValueError(f"Scale must be between 0 and 1, {self.scale} found")
 
     def apply(self, card_image: CardImage) -> CardImage:
         logger = logging.getLogger('InpaintFilter')
@@ -70,7 +107,37 @@ class InpaintFilter(Filter):
                 inpaint_size=card_image.resolution * self.inpaint_size,
                 image_crop=card_image.resolution * self.image_crop,
                 corner_radius=card_image.resolution * self.corner_radius,
-                inpaint_radius=max(card_image.resolution) * self.inpaint_radius
+                inpaint_radius=max(card_image.resolution) * self.inpaint_radius,
+                scale=self.scale
+            ),
+            size=card_image.size,
+            bleed=card_image.bleed + self.inpaint_size,
+            name=card_image.name
+        )
+
+
+@dataclass(frozen=True)
+class BleedFilter(Filter):
+    inpaint_size: float = 3*mm
+    image_crop: float = 0.8*mm
+    corner_radius: float = 3*mm
+    mode: str = 'replicate'
+
+    def __post_init__(self):
+        if self.mode not in BLEED_MODES:
+            raise ValueError(f"Invalid bleed mode '{self.mode}', valid values are {', '.join(BLEED_MODES)}")
+
+    def apply(self, card_image: CardImage) -> CardImage:
+        logger = logging.getLogger('BleedFilter')
+        logger.debug(f'Applying to {card_image}')
+
+        return CardImage(
+            bleed(
+                Traceable(card_image.image, extract_id(card_image)),
+                bleed_size=card_image.resolution * self.inpaint_size,
+                image_crop=card_image.resolution * self.image_crop,
+                corner_radius=card_image.resolution * self.corner_radius,
+                mode=self.mode
             ),
             size=card_image.size,
             bleed=card_image.bleed + self.inpaint_size,
@@ -81,16 +148,80 @@ class InpaintFilter(Filter):
 @dataclass(frozen=True)
 class StraightenFilter(Filter):
     outliers_iqr_scale: float = 0.01
+    min_line_length: float = 8.5*mm
+    max_line_gap: float = 8.5*mm
+    # TUNE: Outer band where card borders are looked for, the whole image if 0
+    border_band: float = 0
+    scale: float = 1
+    method: str = 'hough'
+    # Cards of a batch share the skew estimated in a sample of this size, 0 to estimate each card alone
+    sample_size: int = 0
+    # TUNE: Degrees a card quick estimate may differ from the shared skew to use it, and the scale of that estimate
+    outlier_tolerance: float = 0.5
+    check_scale: float = 0.25
+    angle: float | None = None
+
+    def __post_init__(self):
+        if not 0 < self.scale <= 1:
+            raise ValueError(f"Scale must be between 0 and 1, {self.scale} found")
+        if not 0 < self.check_scale <= 1:
+            raise ValueError(f"Check scale must be between 0 and 1, {self.check_scale} found")
+        if self.method not in SKEW_METHODS:
+            raise ValueError(f"Invalid method '{self.method}', valid values are {', '.join(SKEW_METHODS)}")
+
+    def _skew_angle(self, card_image: CardImage, /, scale: float = None) -> float | None:
+        return skew_angle(
+            Traceable(card_image.image, extract_id(card_image)),
+            self.outliers_iqr_scale,
+            min_line_length=max(card_image.resolution) * self.min_line_length,
+            max_line_gap=max(card_image.resolution) * self.max_line_gap,
+            border_band=card_image.resolution * self.border_band,
+            scale=self.scale if scale is None else scale,
+            method=self.method
+        )
+
+    def fit(self, card_images: Iterable[CardImage]) -> Filter:
+        """Return the filter with the robust mean skew of a sample of the card images, when batch is enabled."""
+        logger = logging.getLogger('StraightenFilter')
+
+        if not self.sample_size or self.angle is not None:
+            return self
+
+        angles = np.array([angle for angle in map(self._skew_angle, islice(card_images, self.sample_size))
+                           if angle is not None])
+        if not len(angles):
+            # Cards are estimated alone if no skew is detected in the sample
+            return self
+
+        angle = float(np.mean(angles[_inliers(angles)]))
+        logger.debug(f'Shared skew {angle:.3f} estimated from {len(angles)} card images')
+        return replace(self, angle=angle)
+
+    @property
+    def fitted(self) -> bool:
+        return not self.sample_size or self.angle is not None
 
     def apply(self, card_image: CardImage) -> CardImage:
         logger = logging.getLogger('StraightenFilter')
         logger.debug(f'Applying to {card_image}')
 
+        angle = None
+        if self.angle is not None:
+            # Cards whose quick estimate differs from the shared skew, or is not detected, are estimated alone
+            card_angle = self._skew_angle(card_image, scale=min(self.scale, self.check_scale))
+            if card_angle is not None and abs(card_angle - self.angle) <= self.outlier_tolerance:
+                angle = self.angle
+        if angle is None:
+            angle = self._skew_angle(card_image)
+        if angle is None:
+            logger.debug(f'No skew detected in {card_image}, it is not rotated')
+            angle = 0.0
+
         return CardImage(
             straighten(
                 Traceable(card_image.image, extract_id(card_image)),
-                self.outliers_iqr_scale
-            ),
+                angle=angle
+            ).value,    # Traceable values are returned as traceable in straighten as in crop
             size=card_image.size,
             bleed=card_image.bleed,
             name=card_image.name
@@ -0,0 +1,71 @@
+"""Image headers module."""
+from __future__ import annotations
+
+import re
+
+from dataclasses import dataclass
+from lxml import etree
+from pathlib import Path
+from PIL import Image
+
+from .template import DEFAULT_SVG_DPI
+
+
+SVG_UNITS_PER_INCH = {'': 96, 'px': 96, 'pt': 72, 'pc': 6, 'mm': 25.4, 'cm': 2.54, 'in': 1}
+SVG_LENGTH_REGEX = re.compile(r'^\s*([0-9.eE+-]+)\s*([a-z]*)\s*$')
+
+
+def _svg_length_to_inches(length: str | None) -> float | None:
+    if length is None or not (match := SVG_LENGTH_REGEX.match(length)):
+        return None
+    number, unit = match.groups()
+    if unit not in SVG_UNITS_PER_INCH:
+        return None
+    return float(number) / SVG_UNITS_PER_INCH[unit]
+
+
+@dataclass(frozen=True)
+class ImageHeader:
+    """Image dimensions read without decoding its pixels."""
+
+    size: tuple[int, int]
+    mode: str
+    dpi: tuple[float, float] = None
+
+    @property
+    def megapixels(self) -> float:
+        return self.size[0] * self.size[1] / 1e6
+
+    @property
+    def memory(self) -> int:
+        """Return the bytes used by the image once decoded."""
+        return self.size[0] * self.size[1] * Image.getmodebands(self.mode)
+
+    @property
+    def aspect_ratio(self) -> float:
+        return self.size[0] / self.size[1]
+
+    @classmethod
+    def _from_svg_file(cls, file: Path, /, dpi: int = DEFAULT_SVG_DPI) -> ImageHeader:
+        # Only the root element is parsed, SVG images are rendered in RGBA
+        _, root = next(etree.iterparse(str(file), events=('start', )))
+        width = _svg_length_to_inches(root.get('width'))
+        height = _svg_length_to_inches(root.get('height'))
+        if (width is None or height is None) and root.get('viewBox'):
+            view_box = [float(value) for value in re.split(r'[\s,]+', root.get('viewBox').strip())]
+            width = view_box[2] / SVG_UNITS_PER_INCH['px']
+            height = view_box[3] / SVG_UNITS_PER_INCH['px']
+        if width is None or height is None:
+            raise ValueError(f"Unable to obtain {file} size")
+
+        return cls((round(width * dpi), round(height * dpi)), 'RGBA', (dpi, dpi))
+
+    @classmethod
+    def from_file(cls, file: Path | str) -> ImageHeader:
+        file = Path(file)
+        if file.suffix == '.svg':
+            return cls._from_svg_file(file)
+
+        # Pillow reads only the header until the image is loaded
+        with Image.open(file) as image:
+            return cls(image.size, image.mode, image.info.get('dpi'))
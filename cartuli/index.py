@@ -0,0 +1,123 @@
+"""Directory contents index module."""
+from __future__ import annotations
+
+import fnmatch
+import logging
+import os
+import re
+
+from pathlib import Path
+
+
+DirectoryEntries = dict[str, bool]
+
+_MAGIC_CHECK = re.compile('[*?[]')
+
+
+def _has_magic(pattern: str) -> bool:
+    # Same check glob does, whose has_magic is not part of its public API
+    return _MAGIC_CHECK.search(pattern) is not None
+
+
+class FileIndex:
+    """In-memory index of directory contents to expand glob patterns scanning each directory only once."""
+
+    def __init__(self):
+        self.__directories = {}
+        self.__scans = 0
+
+    @property
+    def scans(self) -> int:
+        return self.__scans
+
+    @staticmethod
+    def _modification_time(directory: str) -> int | None:
+        try:
+            return os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+
+    def _entries(self, directory: str) -> DirectoryEntries:
+        """Return if each directory entry is a directory by its name."""
+        logger = logging.getLogger('cartuli.index.FileIndex._entries')
+
+        key = os.path.abspath(directory or os.curdir)
+        if key not in self.__directories:
+            entries = {}
+            modification_time = self._modification_time(key)
+            try:
+                with os.scandir(key) as directory_entries:
+                    for entry in directory_entries:
+                        try:
+                            entries[entry.name] = entry.is_dir()
+                        except OSError:
+                            entries[entry.name] = False
+            except OSError:
+                # Missing directories are indexed as empty until they are refreshed
+                modification_time = None
+            self.__directories[key] = (modification_time, entries)
+            self.__scans += 1
+            logger.debug(f"Scanned {key} with {len(entries)} entries")
+
+        return self.__directories[key][1]
+
+    def exists(self, path: Path | str) -> bool:
+        directory, name = os.path.split(os.fspath(path))
+        if name in ('', os.curdir, os.pardir):
+            return os.path.exists(path)
+
+        return name in self._entries(directory)
+
+    def is_dir(self, path: Path | str) -> bool:
+        directory, name = os.path.split(os.fspath(path))
+        if name in ('', os.curdir, os.pardir):
+            return os.path.isdir(path)
+
+        return self._entries(directory).get(name, False)
+
+    def _glob(self, pattern: str) -> list[str]:
+        if not _has_magic(pattern):
+            return [pattern] if self.exists(pattern) else []
+
+        directory, name = os.path.split(pattern)
+        if _has_magic(directory):
+            directories = [match for match in self._glob(directory) if self.is_dir(match)]
+        else:
+            directories = [directory]
+
+        if not name:
+            return [os.path.join(match, name) for match in directories]
+
+        matches = []
+        for directory in directories:
+            entries = self._entries(directory)
+            if _has_magic(name):
+                # Hidden files are only matched by patterns starting with a dot as glob does
+                names = [entry for entry in entries if name.startswith('.') or not entry.startswith('.')]
+                names = fnmatch.filter(names, name)
+            else:
+                names = [name] if name in entries else []
+            matches += [os.path.join(directory, entry) for entry in names]
+
+        return matches
+
+    def glob(self, pattern: Path | str) -> list[str]:
+        """Return the sorted paths matching a glob pattern as sorted(glob.glob(pattern)) does."""
+        return sorted(self._glob(os.fspath(pattern)))
+
+    def refresh(self) -> set[Path]:
+        """Discard the index of directories modified since they were scanned and return them."""
+        refreshed = set()
+        for key, (modification_time, _) in tuple(self.__directories.items()):
+            if self._modification_time(key) != modification_time:
+                # Directories may be scanned again by other threads at the same time
+                self.__directories.pop(key, None)
+                refreshed.add(Path(key))
+
+        return refreshed
+
+    def clear(self) -> None:
+        self.__directories = {}
+
+    def __len__(self) -> int:
+        return len(self.__directories)
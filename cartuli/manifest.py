@@ -0,0 +1,95 @@
+"""Build manifest module."""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from pathlib import Path
+from typing import Iterable
+
+from .cache import file_hash
+
+
+Fingerprint = dict
+
+
+def _values_hash(values) -> str:
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class Manifest:
+    """Record of the inputs used to create each output to skip unchanged outputs."""
+
+    FILE_NAME = '.cartuli-manifest.json'
+
+    def __init__(self, path: Path | str):
+        if isinstance(path, str):
+            path = Path(path)
+        if path.is_dir():
+            path = path / self.FILE_NAME
+        self.__path = path
+
+        self.__outputs = {}
+        if self.__path.exists():
+            try:
+                self.__outputs = json.loads(self.__path.read_text())
+            except (json.JSONDecodeError, OSError) as e:
+                logging.getLogger('cartuli.manifest.Manifest').warning(f"Ignoring invalid manifest {path}: {e}")
+
+        # Known file hashes by path, modification time and size to avoid reading unchanged files
+        self.__file_hashes = {}
+        for fingerprint in self.__outputs.values():
+            for file, file_fingerprint in fingerprint.get('files', {}).items():
+                self.__file_hashes[file, file_fingerprint['mtime'], file_fingerprint['size']] = \
+                    file_fingerprint['hash']
+
+    @property
+    def path(self) -> Path:
+        return self.__path
+
+    def _file_fingerprint(self, path: Path) -> dict:
+        stat = path.stat()
+        key = (str(path), stat.st_mtime_ns, stat.st_size)
+        if key not in self.__file_hashes:
+            self.__file_hashes[key] = file_hash(path)
+
+        return {
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'hash': self.__file_hashes[key]
+        }
+
+    def fingerprint(self, values: dict, files: Iterable[Path], /, **parameters) -> Fingerprint:
+        """Return the fingerprint of an output created from definition values, files and other parameters."""
+        return {
+            'values': _values_hash(values),
+            'parameters': _values_hash(parameters),
+            'files': {str(file): self._file_fingerprint(file) for file in files}
+        }
+
+    @staticmethod
+    def _contents(fingerprint: Fingerprint) -> tuple:
+        # Modification times and sizes are only used to avoid hashing, content is what matters
+        return (fingerprint['values'], fingerprint['parameters'],
+                {file: file_fingerprint['hash'] for file, file_fingerprint in fingerprint['files'].items()})
+
+    def is_up_to_date(self, output: Path | str, fingerprint: Fingerprint) -> bool:
+        """Return if the output exists and was created from the same inputs."""
+        output = Path(output)
+        if not output.exists() or output.name not in self.__outputs:
+            return False
+
+        return self._contents(self.__outputs[output.name]) == self._contents(fingerprint)
+
+    def update(self, output: Path | str, fingerprint: Fingerprint) -> None:
+        """Record the output fingerprint and save the manifest."""
+        self.__outputs[Path(output).name] = fingerprint
+
+        self.__path.parent.mkdir(parents=True, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.__path.parent, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'w') as file:
+            json.dump(self.__outputs, file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.__path)
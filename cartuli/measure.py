@@ -1,8 +1,11 @@
 """Measures package."""
 from __future__ import annotations
 
+import ast
+import operator
+
 from dataclasses import dataclass
-from functools import partial
+from functools import lru_cache, partial
 from math import isclose, sin, cos
 from reportlab.lib import pagesizes
 from reportlab.lib.units import mm, cm, inch
@@ -22,9 +25,69 @@ __all__ = [
 measure_is_close = partial(isclose, abs_tol=0.001*mm)
 
 
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow
+}
+_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg
+}
+_MAX_EXPONENT = 100
+# Integer powers are computed exactly, so chained powers are bounded by its result size too
+_MAX_POWER_BITS = 1024
+
+
+def _evaluate_node(node: ast.AST, names: dict[str, object]) -> object:
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.Name) and node.id in names:
+        return names[node.id]
+    if isinstance(node, ast.Tuple):
+        return tuple(_evaluate_node(element, names) for element in node.elts)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_evaluate_node(node.operand, names))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left = _evaluate_node(node.left, names)
+        right = _evaluate_node(node.right, names)
+        if isinstance(node.op, ast.Pow) and abs(right) > _MAX_EXPONENT:
+            raise ValueError(f"Exponent {right} is too big")
+        if isinstance(node.op, ast.Pow) and isinstance(left, int) and left.bit_length() * abs(right) > _MAX_POWER_BITS:
+            raise ValueError(f"Power '{ast.unparse(node)}' is too big")
+        return _BINARY_OPERATORS[type(node.op)](left, right)
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in ('Size', 'Point')
+            and not node.keywords):
+        return globals()[node.func.id](*(_evaluate_node(argument, names) for argument in node.args))
+
+    raise ValueError(f"Unsupported expression '{ast.unparse(node)}'")
+
+
+@lru_cache(maxsize=None)
+def _names() -> dict[str, float | Size]:
+    # Units and sizes defined in this module
+    return {name: value for name, value in globals().items()
+            if not name.startswith('_') and type(value) in (int, float, Size)}
+
+
+@lru_cache(maxsize=1024)
+def evaluate(expression: str) -> object:
+    """Evaluate measure expressions with numbers, units, sizes and arithmetic operators without using eval."""
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+        return _evaluate_node(tree.body, _names())
+    # Deeply nested expressions exceed the parser stack or the evaluation recursion limit
+    except (SyntaxError, TypeError, ZeroDivisionError, OverflowError, RecursionError, MemoryError) as e:
+        raise ValueError(f"Invalid measure expression '{expression}': {e}") from e
+
+
 def from_str(measure: str | int | float) -> float:
     if isinstance(measure, str):
-        return eval(measure)
+        return evaluate(measure)
     return measure
 
 
@@ -44,7 +107,7 @@ class Size:
     @staticmethod
     def from_str(s: str) -> Size:
         try:
-            size = eval(s)
+            size = evaluate(s)
             if isinstance(size, Size):
                 return size
             if isinstance(size, tuple) and len(size) == 2:
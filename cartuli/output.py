@@ -2,13 +2,16 @@
 import logging
 import reportlab.graphics.shapes as shapes
 
+from collections.abc import Iterable, Iterator
 from functools import lru_cache, partial
+from itertools import islice
 from math import radians
 from pathlib import Path
 from reportlab.lib.colors import transparent, white
 from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 
+from .card import Card
 from .measure import Line, Point, mm
 from .sheet import Sheet
 
@@ -96,17 +99,36 @@ def _draw_marks(c: canvas.Canvas, sheet: Sheet, registration_size: float = DEFAU
     draw_register(Point(to_border, sheet.size.height - to_border))
 
 
-def sheet_pdf_output(sheet: Sheet, output_path: Path | str) -> None:
-    """Create a PDF document containing all sheet content."""
+def _pages_cards(cards: Iterable[Card], cards_per_page: int) -> Iterator[tuple[Card]]:
+    cards = iter(cards)
+    while page_cards := tuple(islice(cards, cards_per_page)):
+        yield page_cards
+
+
+def sheet_pdf_output(sheet: Sheet, output_path: Path | str, /, cards: Iterable[Card] = None) -> None:
+    """Create a PDF document containing all sheet content.
+
+    Cards can be provided apart from the sheet, which is then used only for its layout, to draw each page
+    as soon as its cards are available while the following ones are still being created.
+    """
     logger = logging.getLogger('cartuli.output.sheet_pdf_output')
     # TODO: Add title to PDF document
     c = canvas.Canvas(str(output_path), pagesize=tuple(sheet.size))
 
-    for page in range(1, sheet.pages + 1):
+    if cards is None:
+        pages_cards = (sheet.page_cards(page) for page in range(1, sheet.pages + 1))
+    else:
+        pages_cards = _pages_cards(cards, sheet.num_cards_per_page)
+
+    two_sided = None
+    for page, page_cards in enumerate(pages_cards, 1):
+        if two_sided is None:
+            two_sided = page_cards[0].two_sided
+
         # Front
         _draw_marks(c, sheet)
 
-        for i, card in enumerate(sheet.page_cards(page)):
+        for i, card in enumerate(page_cards):
             num_card = i + 1
             card_image = card.front.image
             card_coordinates = sheet.card_coordinates(num_card)
@@ -117,9 +139,9 @@ def sheet_pdf_output(sheet: Sheet, output_path: Path | str) -> None:
                         card.front.image_size.width, card.front.image_size.height)
 
         # Back
-        if sheet.two_sided:
+        if two_sided:
             c.showPage()
-            for i, card in enumerate(sheet.page_cards(page)):
+            for i, card in enumerate(page_cards):
                 num_card = i + 1
                 card_image = card.back.image
                 card_coordinates = sheet.card_coordinates(num_card, back=True)
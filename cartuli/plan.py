@@ -0,0 +1,191 @@
+"""Compiled definition plan module."""
+from __future__ import annotations
+
+import logging
+import marshal
+import yaml
+
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .cache import Cache, file_hash
+from .filters import Filter
+from .measure import Size, from_str as measure_from_str
+
+
+PLAN_VERSION = 1
+
+IMAGE_SOURCES = ('image', 'images', 'template')
+DECK_SIDES = ('front', 'back', 'default_back')
+TEMPLATE_DATA_SUFFIXES = ('.csv', '.yml', '.yaml')
+SHEET_MEASURES = ('print_margin', 'padding', 'crop_marks_padding')
+
+
+@dataclass(frozen=True)
+class DefinitionPlan:
+    """Validated definition values with all their measure expressions resolved."""
+
+    values: dict
+    measures: dict[str, float] = field(default_factory=dict)
+    sizes: dict[str, Size] = field(default_factory=dict)
+
+    def measure(self, expression: str | int | float) -> float:
+        if isinstance(expression, str) and expression in self.measures:
+            return self.measures[expression]
+        return measure_from_str(expression)
+
+    def size(self, expression: str | Size) -> Size:
+        if isinstance(expression, Size):
+            return expression
+        if expression in self.sizes:
+            return self.sizes[expression]
+        return Size.from_str(expression)
+
+    @staticmethod
+    def _check(condition: bool, message: str) -> None:
+        if not condition:
+            raise ValueError(message)
+
+    @classmethod
+    def compile(cls, values: dict) -> DefinitionPlan:
+        """Return the plan of definition values, validating them and resolving their measures."""
+        cls._check(isinstance(values, dict),
+                   f"Expected a dictionary, {'None' if values is None else type(values).__name__} found")
+        measures = {}
+        sizes = {}
+
+        def resolve_measure(expression: str | int | float, location: str) -> None:
+            try:
+                measure = measure_from_str(expression)
+            except ValueError as e:
+                raise ValueError(f"Invalid measure in {location}: {e}") from e
+            cls._check(type(measure) in (int, float), f"Invalid measure '{expression}' in {location}")
+            if isinstance(expression, str):
+                measures[expression] = measure
+
+        def resolve_size(expression: str, location: str) -> None:
+            cls._check(isinstance(expression, str), f"Invalid size '{expression}' in {location}")
+            sizes[expression] = Size.from_str(expression)
+
+        filters = values.get('filters') or {}
+        cls._check(isinstance(filters, dict), "Filters must be a dictionary")
+        for name, filter_definition in filters.items():
+            cls._compile_filter(filter_definition, f"filters.{name}", resolve_measure)
+
+        template_parameters = values.get('template_parameters') or {}
+        cls._check(isinstance(template_parameters, dict), "Template parameters must be a dictionary")
+        for name, parameters in template_parameters.items():
+            cls._check(isinstance(parameters, dict) or cls._is_data_file(parameters),
+                       f"Template parameters template_parameters.{name} must be a dictionary or a data file")
+
+        decks = values.get('decks') or {}
+        cls._check(isinstance(decks, dict), "Decks must be a dictionary")
+        for name, deck in decks.items():
+            location = f"decks.{name}"
+            cls._check(isinstance(deck, dict), f"Deck {location} must be a dictionary")
+            cls._check('size' in deck, f"No size defined for deck {location}")
+            resolve_size(deck['size'], f"{location}.size")
+            cls._check('front' in deck, f"Cards definition {location} must have a front image")
+            cls._check(isinstance(deck.get('copies', 1), int) and deck.get('copies', 1) > 0,
+                       f"Invalid copies in {location}")
+            for side in DECK_SIDES:
+                if side in deck:
+                    cls._compile_side(deck[side], f"{location}.{side}", filters, template_parameters,
+                                      resolve_measure)
+
+        outputs = values.get('outputs') or {}
+        cls._check(isinstance(outputs, dict), "Outputs must be a dictionary")
+        if 'sheet' in outputs:
+            sheet = outputs['sheet'] or {}
+            cls._check(isinstance(sheet, dict), "Sheet output must be a dictionary")
+            if 'size' in sheet:
+                resolve_size(sheet['size'], "outputs.sheet.size")
+            for measure in SHEET_MEASURES:
+                if measure in sheet:
+                    resolve_measure(sheet[measure], f"outputs.sheet.{measure}")
+
+        return cls(values, measures, sizes)
+
+    @classmethod
+    def _compile_side(cls, side: dict, location: str, filters: dict, template_parameters: dict,
+                      resolve_measure) -> None:
+        cls._check(isinstance(side, dict), f"Image definition {location} must be a dictionary")
+        cls._check(sum(source in side for source in IMAGE_SOURCES) == 1,
+                   f"Image definition {location} must have one of {', '.join(IMAGE_SOURCES)}")
+        if 'template' in side:
+            template = side['template']
+            cls._check(isinstance(template, dict) and 'file' in template,
+                       f"Template definition {location}.template must specify its file")
+            cls._check('parameters' in template,
+                       f"Template definition {location}.template must specify its parameters")
+            if isinstance(template['parameters'], str):
+                cls._check(template['parameters'] in template_parameters or cls._is_data_file(template['parameters']),
+                           f"Unknown template parameters '{template['parameters']}' in {location}")
+        if 'bleed' in side:
+            resolve_measure(side['bleed'], f"{location}.bleed")
+        if 'filter' in side:
+            if isinstance(side['filter'], str):
+                cls._check(side['filter'] in filters, f"Unknown filter '{side['filter']}' in {location}")
+            else:
+                cls._compile_filter(side['filter'], f"{location}.filter", resolve_measure)
+
+    @staticmethod
+    def _is_data_file(value: object) -> bool:
+        return isinstance(value, str) and Path(value).suffix in TEMPLATE_DATA_SUFFIXES
+
+    @classmethod
+    def _compile_filter(cls, filter_definition: dict, location: str, resolve_measure) -> None:
+        cls._check(filter_definition is None or isinstance(filter_definition, dict),
+                   f"Filter {location} must be a dictionary")
+        for name, arguments in (filter_definition or {}).items():
+            try:
+                measures = Filter.measure_arguments(name)
+            except KeyError as e:
+                raise ValueError(f"Invalid filter {location}: {e}") from e
+            # Only measure arguments are resolved, others like modes are plain values
+            for argument, value in (arguments or {}).items():
+                if argument in measures:
+                    resolve_measure(value, f"{location}.{name}.{argument}")
+        try:
+            Filter.from_dict(filter_definition)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid filter {location}: {e}") from e
+
+    def dumps(self) -> bytes:
+        return marshal.dumps((PLAN_VERSION, self.values, self.measures,
+                              {expression: tuple(size) for expression, size in self.sizes.items()}))
+
+    @classmethod
+    def loads(cls, data: bytes) -> DefinitionPlan:
+        version, values, measures, sizes = marshal.loads(data)
+        if version != PLAN_VERSION:
+            raise ValueError(f"Unsupported plan version {version}")
+
+        return cls(values, measures, {expression: Size(*size) for expression, size in sizes.items()})
+
+    @classmethod
+    def from_file(cls, path: Path | str, /, cache: Cache = None) -> DefinitionPlan:
+        """Return the plan of a definition file, reusing the cached plan if the file did not change."""
+        logger = logging.getLogger('cartuli.plan.DefinitionPlan.from_file')
+
+        path = Path(path)
+        key = None
+        if cache is not None:
+            key = Cache.key('definition', PLAN_VERSION, marshal.version, file_hash(path))
+            if (data := cache.get_data(key)) is not None:
+                try:
+                    return cls.loads(data)
+                except (ValueError, EOFError, TypeError) as e:
+                    logger.warning(f"Ignoring invalid cached plan of {path}: {e}")
+
+        with path.open(mode='r') as file:
+            plan = cls.compile(yaml.safe_load(file))
+
+        if key is not None:
+            try:
+                cache.put_data(key, plan.dumps())
+            except ValueError as e:
+                # Values with types that can not be serialized, like dates, are compiled every time
+                logger.debug(f"Unable to cache plan of {path}: {e}")
+
+        return plan
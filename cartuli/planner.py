@@ -0,0 +1,184 @@
+"""Dry run planning module."""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from lxml import etree
+from math import ceil
+from pathlib import Path
+
+from .card import CardImage
+from .definition import Definition
+from .filters import Filter, NullFilter
+from .header import ImageHeader
+from .measure import Size, inch, mm
+
+
+DEFAULT_MIN_DPI = 300
+ASPECT_RATIO_TOLERANCE = 0.02
+
+# TUNE: Rough single core processing times, they depend a lot on the hardware
+LOAD_SECONDS_PER_MEGAPIXEL = 0.02
+FILTER_SECONDS_PER_MEGAPIXEL = {
+    'InpaintFilter': 0.4,
+    'StraightenFilter': 0.2,
+    'CropFilter': 0.01
+}
+
+
+def _filter_seconds_per_megapixel(image_filter: Filter) -> float:
+    filters = getattr(image_filter, '_filters', (image_filter, ))
+    return sum(FILTER_SECONDS_PER_MEGAPIXEL.get(type(f).__name__, 0) for f in filters)
+
+
+@dataclass(frozen=True)
+class DeckPlan:
+    """Estimation of the work needed to create a deck."""
+
+    name: str
+    size: Size
+    cards: int
+    two_sided: bool
+    dpi: float = None
+    memory: int = 0
+    seconds: float = 0
+    issues: tuple[str] = field(default_factory=tuple)
+    # Megapixels to be created by each filter representation
+    megapixels: dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def from_definition(cls, definition: Definition, name: str, /, headers: dict[Path, ImageHeader] = None,
+                        min_dpi: float = DEFAULT_MIN_DPI) -> DeckPlan:
+        if headers is None:
+            headers = {}
+
+        deck_definition = definition._values['decks'][name]
+        size = definition._plan.size(deck_definition['size'])
+        issues = []
+
+        sides = {}
+        for side in ('front', 'back', 'default_back'):
+            if side in deck_definition:
+                sides[side] = definition.image_sources(deck_definition[side])
+        if 'back' in sides and len(sides['back']) != len(sides['front']):
+            issues.append(f"The number of front ({len(sides['front'])}) and back ({len(sides['back'])}) images "
+                          f"must be the same")
+
+        dpi = None
+        memory = 0
+        seconds = 0
+        megapixels = {}
+        missing_files = 0
+        distinct_aspect_ratio_files = 0
+        for side, sources in sides.items():
+            side_definition = deck_definition[side]
+            bleed = definition._plan.measure(side_definition.get('bleed', CardImage.DEFAULT_BLEED))
+            image_filter = NullFilter()
+            if 'filter' in side_definition:
+                image_filter = definition._load_filter(side_definition['filter'])
+            seconds_per_megapixel = LOAD_SECONDS_PER_MEGAPIXEL + _filter_seconds_per_megapixel(image_filter)
+            image_size = Size(size.width + 2*bleed, size.height + 2*bleed)
+
+            # Each template row is rendered while files are loaded once
+            if 'template' not in side_definition:
+                sources = sorted(set(sources))
+            for source in sources:
+                if source not in headers:
+                    try:
+                        headers[source] = ImageHeader.from_file(source)
+                    except (OSError, ValueError, etree.XMLSyntaxError):
+                        headers[source] = None
+                if (header := headers[source]) is None:
+                    missing_files += 1
+                    continue
+
+                image_dpi = min(header.size[0] / (image_size.width / inch), header.size[1] / (image_size.height / inch))
+                dpi = image_dpi if dpi is None else min(dpi, image_dpi)
+                memory += header.memory
+                seconds += header.megapixels * seconds_per_megapixel
+                megapixels[repr(image_filter)] = megapixels.get(repr(image_filter), 0) + header.megapixels
+                if abs(header.aspect_ratio / (image_size.width / image_size.height) - 1) > ASPECT_RATIO_TOLERANCE:
+                    distinct_aspect_ratio_files += 1
+
+        if missing_files:
+            issues.append(f"{missing_files} images can not be read")
+        if distinct_aspect_ratio_files:
+            issues.append(f"{distinct_aspect_ratio_files} images aspect ratio differs from the card size")
+        if dpi is not None and round(dpi) < min_dpi:
+            issues.append(f"Resolution {dpi:.0f} DPI is lower than {min_dpi} DPI")
+
+        two_sided = 'back' in sides or bool(sides.get('default_back'))
+        return cls(name, size, len(sides['front']) * deck_definition.get('copies', 1), two_sided, dpi=dpi,
+                   memory=memory, seconds=seconds, issues=tuple(issues), megapixels=megapixels)
+
+    def __str__(self) -> str:
+        dpi = f"{self.dpi:.0f} DPI" if self.dpi is not None else "unknown DPI"
+        lines = [f"{self.name}: {self.cards} cards of {self.size.width/mm:.1f}x{self.size.height/mm:.1f} mm, "
+                 f"{dpi}, {_format_memory(self.memory)}, {self.seconds:.0f} s"]
+        lines += [f"  ! {issue}" for issue in self.issues]
+        return '\n'.join(lines)
+
+
+@dataclass(frozen=True)
+class SheetPlan:
+    """Estimation of the work needed to create a sheet."""
+
+    name: str
+    decks: tuple[DeckPlan]
+    cards_per_page: Size
+    pages: int
+    two_sided: bool
+    memory: int
+    seconds: float
+
+    @property
+    def cards(self) -> int:
+        return sum(deck.cards for deck in self.decks)
+
+    @property
+    def issues(self) -> tuple[str]:
+        return tuple(f"{deck.name}: {issue}" for deck in self.decks for issue in deck.issues)
+
+    @property
+    def megapixels(self) -> dict[str, float]:
+        megapixels = {}
+        for deck in self.decks:
+            for kind, deck_megapixels in deck.megapixels.items():
+                megapixels[kind] = megapixels.get(kind, 0) + deck_megapixels
+        return megapixels
+
+    @classmethod
+    def from_definition(cls, definition: Definition, deck_names: tuple[str], /, jobs: int = 1,
+                        headers: dict[Path, ImageHeader] = None, min_dpi: float = DEFAULT_MIN_DPI) -> SheetPlan:
+        decks = tuple(DeckPlan.from_definition(definition, name, headers=headers, min_dpi=min_dpi)
+                      for name in deck_names)
+        layout = definition.sheet_layout(deck_names)
+        cards = sum(deck.cards for deck in decks)
+
+        # Decks of a sheet are loaded at the same time and released once the sheet is created
+        return cls(definition.sheet_name(deck_names), decks, layout.cards_per_page,
+                   ceil(cards / layout.num_cards_per_page) if layout.num_cards_per_page else 0,
+                   any(deck.two_sided for deck in decks), sum(deck.memory for deck in decks),
+                   sum(deck.seconds for deck in decks) / jobs)
+
+    def __str__(self) -> str:
+        sides = "two sided" if self.two_sided else "one sided"
+        lines = [f"{self.name}: {self.cards} cards, {self.cards_per_page.width}x{self.cards_per_page.height} "
+                 f"cards per page, {self.pages} {sides} pages, {_format_memory(self.memory)} peak memory, "
+                 f"{self.seconds:.0f} s estimated"]
+        lines += ['  ' + line for deck in self.decks for line in str(deck).splitlines()]
+        return '\n'.join(lines)
+
+
+def plan_sheets(definition: Definition, sheet_groups: tuple[tuple[str]] = None, /, jobs: int = 1,
+                min_dpi: float = DEFAULT_MIN_DPI) -> list[SheetPlan]:
+    """Return the estimation of each sheet reading only image headers."""
+    if sheet_groups is None:
+        sheet_groups = definition.sheet_groups
+
+    headers = {}
+    return [SheetPlan.from_definition(definition, deck_names, jobs=jobs, headers=headers, min_dpi=min_dpi)
+            for deck_names in sheet_groups]
+
+
+def _format_memory(memory: int) -> str:
+    return f"{memory / 1024**2:.0f} MiB"
@@ -1,9 +1,11 @@
 import cv2 as cv
 import logging
+import math
 import numpy as np
 
 from carpeta import extract_id
-from PIL import Image, ImageOps, ImageDraw
+from functools import lru_cache
+from PIL import Image, ImageDraw
 
 from .measure import Size
 
@@ -23,11 +25,86 @@ def _to_size(value: Size | float | int) -> Size:
 # def scale(image: Image.Image, /, ...) -> Image.Image:
 
 
+def _color_pixels(image: Image.Image) -> tuple[np.ndarray, np.ndarray | None]:
+    """Return the gray or RGB pixels of an image and its alpha channel if it has one."""
+    if image.mode in ('L', 'RGB'):
+        return np.asarray(image), None
+    if image.mode == 'LA' or image.mode == 'PA' or image.mode == 'RGBA' or \
+            (image.mode == 'P' and 'transparency' in image.info):
+        pixels = np.asarray(image.convert('RGBA'))
+        return np.ascontiguousarray(pixels[..., :3]), np.ascontiguousarray(pixels[..., 3])
+
+    # Palette, CMYK or high depth images are processed as RGB
+    return np.asarray(image.convert('RGB')), None
+
+
+@lru_cache(maxsize=32)
+def _inpaint_mask(size: tuple[int, int], inpaint_size: tuple[int, int], image_crop: tuple[int, int],
+                  corner_radius: int) -> np.ndarray:
+    """Return the read only mask of the border to inpaint, shared by all the images of a deck."""
+    mask_image = Image.new('L', size, color='white')
+    mask_image_draw = ImageDraw.Draw(mask_image)
+    mask_image_draw.rounded_rectangle(
+        (inpaint_size[0] + image_crop[0], inpaint_size[1] + image_crop[1],
+         size[0] - inpaint_size[0] - image_crop[0],
+         size[1] - inpaint_size[1] - image_crop[1]),
+        fill='black', width=0, radius=corner_radius)
+    # TUNE: Find a way to round with different vertical and horizontal values
+    mask = np.array(mask_image)
+    mask.flags.writeable = False
+
+    return mask
+
+
+@lru_cache(maxsize=32)
+def _scaled_inpaint_mask(size: tuple[int, int], inpaint_size: tuple[int, int], image_crop: tuple[int, int],
+                         corner_radius: int, scale: float) -> np.ndarray:
+    """Return the read only mask of the border to inpaint in a scaled image."""
+    mask = _inpaint_mask(size, inpaint_size, image_crop, corner_radius)
+    scaled_size = (max(round(size[0] * scale), 1), max(round(size[1] * scale), 1))
+    # Scaled pixels partially masked are masked so no pixel of the white expanded border is used
+    scaled_mask = np.where(cv.resize(mask, scaled_size, interpolation=cv.INTER_AREA) > 0, 255, 0).astype(np.uint8)
+    scaled_mask.flags.writeable = False
+
+    return scaled_mask
+
+
+def _inpaint_border(image: np.ndarray, mask: np.ndarray, border: Size, inpaint_radius: int) -> None:
+    """Inpaint in place the masked border of an image processing only the strips that contain it."""
+    height, width = mask.shape
+    # TUNE: Known pixels around the border strips used to inpaint them
+    margin = 2 * inpaint_radius + 1
+    top, left = border.height + margin, border.width + margin
+    if 2 * top >= height or 2 * left >= width:
+        image[:] = cv.inpaint(image, mask, inpaint_radius, cv.INPAINT_NS)
+        return
+
+    # Top and bottom strips contain the corners, which are used as known pixels by the side strips
+    for rows in (slice(0, top), slice(height - top, height)):
+        image[rows] = cv.inpaint(np.ascontiguousarray(image[rows]), np.ascontiguousarray(mask[rows]),
+                                 inpaint_radius, cv.INPAINT_NS)
+    side_mask = mask.copy()
+    side_mask[:border.height] = 0
+    side_mask[height - border.height:] = 0
+    for columns in (slice(0, left), slice(width - left, width)):
+        image[:, columns] = cv.inpaint(np.ascontiguousarray(image[:, columns]),
+                                       np.ascontiguousarray(side_mask[:, columns]),
+                                       inpaint_radius, cv.INPAINT_NS)
+
+
 def inpaint(image: Image.Image, /, inpaint_size: Size | float | int,
             image_crop: Size | float | int = 0, corner_radius: Size | float | int = 0,
-            inpaint_radius: float | int = 12) -> Image.Image:
+            inpaint_radius: float | int = 12, scale: float = 1) -> Image.Image:
+    """Inpaint the border of an expanded image.
+
+    With a scale lower than 1 the border is inpainted in a scaled image, much faster for high resolution
+    images, and the result is upsampled and used only for the masked pixels of the full resolution image.
+    """
     logger = logging.getLogger('cartuli.processing')
 
+    if not 0 < scale <= 1:
+        raise ValueError(f"Scale must be between 0 and 1, {scale} found")
+
     trace_id = extract_id(image)
 
     logger.debug(f"Start image {image} inpaint", extra={'trace': image, 'trace_id': trace_id})
@@ -36,98 +113,280 @@ def inpaint(image: Image.Image, /, inpaint_size: Size | float | int,
     image_crop = _to_size(image_crop)
     corner_radius = _to_size(corner_radius)
 
-    expand_size = max(inpaint_size)
-    expand_crop = Size(expand_size - inpaint_size.width, expand_size - inpaint_size.height)
-    expanded_image = ImageOps \
-        .expand(image, border=expand_size, fill='white') \
-        .crop((expand_crop.width, expand_crop.height,
-               image.size[0] + expand_size*2 - expand_crop.width,
-               image.size[1] + expand_size*2 - expand_crop.height))
-    logger.debug(f"Expand {image} image", extra={'trace': expanded_image, 'trace_id': trace_id})
-
-    mask_image = Image.new('L', (image.size[0] + inpaint_size.width*2,
-                                 image.size[1] + inpaint_size.height*2), color='white')
-    mask_image_draw = ImageDraw.Draw(mask_image)
-    mask_image_draw.rounded_rectangle(
-        (inpaint_size.width + image_crop.width, inpaint_size.height + image_crop.height,
-         mask_image.size[0] - inpaint_size.width - image_crop.width,
-         mask_image.size[1] - inpaint_size.height - image_crop.height),
-        fill='black', width=0, radius=max(corner_radius))
-    # TUNE: Find a way to round with different vertical and horizontal values
-    logger.debug(f"Mask {image} image for inpainting", extra={'trace': mask_image, 'trace_id': trace_id})
-
-    inpaint_image_cv = cv.inpaint(
-        cv.cvtColor(np.array(expanded_image), cv.COLOR_RGB2BGR),
-        np.array(mask_image), int(inpaint_radius), cv.INPAINT_NS)
-    inpainted_image = Image.fromarray(cv.cvtColor(inpaint_image_cv, cv.COLOR_BGR2RGB))
+    # Image is expanded with a white border, inpainting works the same with RGB and BGR channels
+    pixels, alpha = _color_pixels(image)
+    expanded_pixels = np.full((pixels.shape[0] + inpaint_size.height*2, pixels.shape[1] + inpaint_size.width*2,
+                               *pixels.shape[2:]), 255, dtype=pixels.dtype)
+    expanded_pixels[inpaint_size.height:inpaint_size.height + pixels.shape[0],
+                    inpaint_size.width:inpaint_size.width + pixels.shape[1]] = pixels
+
+    mask = _inpaint_mask((expanded_pixels.shape[1], expanded_pixels.shape[0]), tuple(inpaint_size),
+                         tuple(image_crop), max(corner_radius))
+    logger.debug(f"Mask {image} image for inpainting", extra={'trace': Image.fromarray(mask), 'trace_id': trace_id})
+
+    # Masked border includes the rounded corners
+    border = Size(inpaint_size.width + image_crop.width + max(corner_radius) + 1,
+                  inpaint_size.height + image_crop.height + max(corner_radius) + 1)
+    if scale == 1:
+        _inpaint_border(expanded_pixels, mask, border, int(inpaint_radius))
+    else:
+        scaled_mask = _scaled_inpaint_mask((expanded_pixels.shape[1], expanded_pixels.shape[0]), tuple(inpaint_size),
+                                           tuple(image_crop), max(corner_radius), scale)
+        scaled_pixels = cv.resize(expanded_pixels, (scaled_mask.shape[1], scaled_mask.shape[0]),
+                                  interpolation=cv.INTER_AREA)
+        _inpaint_border(scaled_pixels, scaled_mask, Size(math.ceil(border.width * scale) + 1,
+                                                         math.ceil(border.height * scale) + 1),
+                        max(round(inpaint_radius * scale), 1))
+        upscaled_pixels = cv.resize(scaled_pixels, (expanded_pixels.shape[1], expanded_pixels.shape[0]),
+                                    interpolation=cv.INTER_LINEAR)
+        masked = mask > 0 if expanded_pixels.ndim == 2 else (mask > 0)[..., None]
+        np.copyto(expanded_pixels, upscaled_pixels, where=masked)
+    if alpha is not None:
+        # Inpainted border is opaque
+        expanded_alpha = np.full(mask.shape, 255, dtype=np.uint8)
+        expanded_alpha[inpaint_size.height:inpaint_size.height + alpha.shape[0],
+                       inpaint_size.width:inpaint_size.width + alpha.shape[1]] = alpha
+        expanded_alpha[mask > 0] = 255
+        expanded_pixels = np.dstack((expanded_pixels, expanded_alpha))
+    inpainted_image = Image.fromarray(expanded_pixels)
     logger.debug(f"Inpaint {image} image", extra={'trace': inpainted_image, 'trace_id': trace_id})
 
     return inpainted_image
 
 
-def _get_rotation_angle(line):
-    slope = (line[3] - line[1], line[2] - line[0])
-    angle = np.degrees(np.arctan2(*slope))
-
-    # TUNE: There should be some mathematical something to implement this better
-    if angle > 90.0:
-        angle = angle - 180
-    if angle < -90.0:
-        angle = angle + 180
-    if angle > 45.0:
-        return 90 - angle
-    if angle < -45.0:
-        return -90 - angle
-    return angle
+BLEED_MODES = ('replicate', 'reflect', 'stretch')
+BLEED_IMAGE_MODES = ('L', 'LA', 'RGB', 'RGBA', 'CMYK')
+SKEW_METHODS = ('hough', 'contour')
+
+
+def _bleed_indices(length: int, size: int, mode: str) -> np.ndarray:
+    """Return the source pixel of each pixel of an axis expanded with size pixels of bleed on both sides."""
+    indices = np.arange(-size, length + size)
+    if mode == 'replicate':
+        return np.clip(indices, 0, length - 1)
+    if mode == 'reflect':
+        indices = np.abs(indices)
+        indices = np.where(indices >= length, 2 * (length - 1) - indices, indices)
+        return np.clip(indices, 0, length - 1)
+    if mode == 'stretch':
+        # TUNE: Outer band as wide as the bleed, stretched to cover both
+        band = min(size, (length - 1) // 2)
+        start = np.arange(size + band) * band // max(size + band, 1)
+        return np.concatenate((start, np.arange(band, length - band), length - 1 - start[::-1]))
+
+    raise ValueError(f"Invalid bleed mode '{mode}', valid values are {', '.join(BLEED_MODES)}")
 
 
-def _discard_outliers(data: np.ndarray | list, iqr_scale: float = 1.5) -> np.ndarray:
-    if not isinstance(data, np.ndarray):
-        data = np.array(data)
-    upper_quartile = np.percentile(data, 75)
-    lower_quartile = np.percentile(data, 25)
-    iqr = upper_quartile - lower_quartile
-    scaled_iqr = iqr * iqr_scale
-    quartile_set = (lower_quartile - scaled_iqr, upper_quartile + scaled_iqr)
-    result_data = []
-    for value in data:
-        if value >= quartile_set[0] and value <= quartile_set[1]:
-            result_data.append(value)
-    return result_data
+def _bleed_inner_range(indices: np.ndarray, size: int) -> tuple[int, int]:
+    # Range of an expanded axis whose pixels are the source pixels without changes
+    inner = np.flatnonzero(indices == np.arange(len(indices)) - size)
+    return inner[0], inner[-1] + 1
 
 
-def straighten(image: Image.Image, /, outliers_iqr_scale: float = 0.01) -> Image.Image:
+def bleed(image: Image.Image, /, bleed_size: Size | float | int,
+          image_crop: Size | float | int = 0, corner_radius: Size | float | int = 0,
+          mode: str = 'replicate') -> Image.Image:
+    """Add bleed to an image extending its outer pixels, a fast alternative to inpaint for clean images."""
     logger = logging.getLogger('cartuli.processing')
 
     trace_id = extract_id(image)
 
-    logger.debug(f"Start {image} image straighten", extra={'trace': image, 'trace_id': trace_id})
+    logger.debug(f"Start image {image} bleed", extra={'trace': image, 'trace_id': trace_id})
+
+    bleed_size = _to_size(bleed_size)
+    image_crop = _to_size(image_crop)
+    radius = max(_to_size(corner_radius))
+
+    # Pixels are copied as they are, palette indices and other modes without an array layout are converted
+    if image.mode in ('P', 'PA'):
+        image = image.convert('RGBA' if image.mode == 'PA' or 'transparency' in image.info else 'RGB')
+    elif image.mode not in BLEED_IMAGE_MODES:
+        image = image.convert('RGB')
+    image_mode = image.mode
+    pixels = np.asarray(image)
+    pixels = pixels[image_crop.height:pixels.shape[0] - image_crop.height,
+                    image_crop.width:pixels.shape[1] - image_crop.width]
+    height, width = pixels.shape[:2]
+    rows = _bleed_indices(height, bleed_size.height + image_crop.height, mode)
+    columns = _bleed_indices(width, bleed_size.width + image_crop.width, mode)
+
+    # Inner pixels are copied as they are and only the bleed strips are gathered
+    top, bottom = _bleed_inner_range(rows, bleed_size.height + image_crop.height)
+    left, right = _bleed_inner_range(columns, bleed_size.width + image_crop.width)
+    bleed_pixels = np.empty((len(rows), len(columns), *pixels.shape[2:]), dtype=pixels.dtype)
+    inner_rows = pixels[rows[top]:rows[bottom - 1] + 1]
+    bleed_pixels[top:bottom, left:right] = inner_rows[:, columns[left]:columns[right - 1] + 1]
+    bleed_pixels[top:bottom, :left] = inner_rows.take(columns[:left], axis=1)
+    bleed_pixels[top:bottom, right:] = inner_rows.take(columns[right:], axis=1)
+    bleed_pixels[:top] = pixels.take(rows[:top], axis=0).take(columns, axis=1)
+    bleed_pixels[bottom:] = pixels.take(rows[bottom:], axis=0).take(columns, axis=1)
+
+    # Pixels taken from outside the rounded corners are taken from the corner arc in the same direction
+    if radius > 1:
+        for center_row, row_sign in ((radius, -1), (height - 1 - radius, 1)):
+            for center_column, column_sign in ((radius, -1), (width - 1 - radius, 1)):
+                corner_rows = np.flatnonzero((rows - center_row) * row_sign > 0)
+                corner_columns = np.flatnonzero((columns - center_column) * column_sign > 0)
+                delta_rows = rows[corner_rows][:, None] - center_row
+                delta_columns = columns[corner_columns][None, :] - center_column
+                distance = np.hypot(delta_rows, delta_columns)
+                scale = np.where(distance > radius - 1, (radius - 1) / np.maximum(distance, 1), 1)
+                source_rows = np.clip(np.rint(center_row + delta_rows * scale).astype(int), 0, height - 1)
+                source_columns = np.clip(np.rint(center_column + delta_columns * scale).astype(int), 0, width - 1)
+                bleed_pixels[np.ix_(corner_rows, corner_columns)] = pixels[source_rows, source_columns]
+
+    bleed_image = Image.frombytes(image_mode, (bleed_pixels.shape[1], bleed_pixels.shape[0]), bleed_pixels.tobytes())
+    logger.debug(f"Bleed {image} image", extra={'trace': bleed_image, 'trace_id': trace_id})
+
+    return bleed_image
+
+
+def _get_rotation_angles(lines: np.ndarray) -> np.ndarray:
+    """Return the angle each line, as x1, y1, x2, y2 rows, is rotated from the nearest axis."""
+    lines = np.asarray(lines, dtype=float).reshape(-1, 4)
+    angles = np.degrees(np.arctan2(lines[:, 3] - lines[:, 1], lines[:, 2] - lines[:, 0]))
+
+    # Angles are folded to [-90, 90] and then to the nearest of the horizontal and vertical axes, vertical
+    # lines are rotated in the same direction than horizontal ones
+    angles = np.where(angles > 90.0, angles - 180, angles)
+    angles = np.where(angles < -90.0, angles + 180, angles)
+    angles = np.where(angles > 45.0, angles - 90, angles)
+    return np.where(angles < -45.0, angles + 90, angles)
+
+
+def _get_rotation_angle(line):
+    return float(_get_rotation_angles(line)[0])
+
+
+def _inliers(data: np.ndarray | list, iqr_scale: float = 1.5) -> np.ndarray:
+    """Return which values are inside the interquartile range scaled by iqr_scale."""
+    data = np.asarray(data)
+    lower_quartile, upper_quartile = np.percentile(data, (25, 75))
+    scaled_iqr = (upper_quartile - lower_quartile) * iqr_scale
+    return (data >= lower_quartile - scaled_iqr) & (data <= upper_quartile + scaled_iqr)
+
+
+def _discard_outliers(data: np.ndarray | list, iqr_scale: float = 1.5) -> list:
+    data = np.asarray(data)
+    return data[_inliers(data, iqr_scale)].tolist()
+
+
+def _border_edges(gray_image: np.ndarray, border_band: Size) -> np.ndarray:
+    """Return the Canny edges of an image, only in the outer band where the card borders are if given."""
+    if not border_band.width or not border_band.height or \
+            2 * border_band.height >= gray_image.shape[0] or 2 * border_band.width >= gray_image.shape[1]:
+        return cv.Canny(gray_image, threshold1=50, threshold2=150)
+
+    edges_image = np.zeros_like(gray_image)
+    for strip in ((slice(0, border_band.height), slice(None)), (slice(-border_band.height, None), slice(None)),
+                  (slice(None), slice(0, border_band.width)), (slice(None), slice(-border_band.width, None))):
+        edges_image[strip] = cv.Canny(np.ascontiguousarray(gray_image[strip]), threshold1=50, threshold2=150)
+
+    return edges_image
+
+
+def _contour_skew_angle(gray_image: np.ndarray) -> float | None:
+    """Return the angle the minimum area rectangle of the largest contour is rotated from the axes."""
+    # TUNE: Cards are expected to be darker than the scan background
+    _, binary_image = cv.threshold(gray_image, 0, 255, cv.THRESH_BINARY_INV | cv.THRESH_OTSU)
+    contours, _ = cv.findContours(binary_image, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+
+    _, _, angle = cv.minAreaRect(max(contours, key=cv.contourArea))
+    # Rectangle angle range changed between OpenCV versions, it is folded to the nearest axis
+    return float((angle + 45) % 90 - 45)
+
+
+def _hough_skew_angle(image: Image.Image, gray_image: np.ndarray, /, outliers_iqr_scale: float,
+                      min_line_length: float | int, max_line_gap: float | int, border_band: Size,
+                      scale: float) -> float | None:
+    """Return the average angle the lines of an image are rotated from the axes."""
+    logger = logging.getLogger('cartuli.processing')
+
+    trace_id = extract_id(image)
 
     # Apply Canny edge detection an detect linkes using Hought Line Transform
-    gray_image = cv.cvtColor(np.array(image), cv.COLOR_RGB2GRAY)
-    logger.debug(f"Covnert {image} image to gray", extra={'trace': gray_image})
-    edges_image = cv.Canny(gray_image, threshold1=50, threshold2=150)
+    edges_image = _border_edges(gray_image, border_band)
     logger.debug(f"Obtain {image} image edges", extra={'trace': edges_image})
-    lines = cv.HoughLinesP(edges_image, 1, np.pi/180, threshold=100, minLineLength=100, maxLineGap=100)
+    min_line_length = max(round(min_line_length * scale), 1)
+    lines = cv.HoughLinesP(edges_image, 1, np.pi/180, threshold=min_line_length, minLineLength=min_line_length,
+                           maxLineGap=max(round(max_line_gap * scale), 1))
+    if lines is None:
+        return None
 
     # Discard outliers
-    line_angles = {tuple(line[0]): _get_rotation_angle(line[0]) for line in lines}
-    angles = _discard_outliers(list(line_angles.values()), outliers_iqr_scale)
+    line_angles = _get_rotation_angles(lines)
+    inliers = _inliers(line_angles, outliers_iqr_scale)
+    lines = lines.reshape(-1, 4)
+    line_lengths = np.hypot(lines[:, 2] - lines[:, 0], lines[:, 3] - lines[:, 1])
 
     # Generate debug image
-    image_lines = image.copy()
-    image_lines_draw = ImageDraw.Draw(image_lines)
-    for line in lines:
-        line = tuple(line[0])
-        color = "green"
-        if line_angles[line] not in angles:
-            color = "red"
-        image_lines_draw.line((line[0:2], line[2:4]), fill=color, width=2)
-    logger.debug(f"Calculate {image} image lines", extra={'trace': image_lines, 'trace_id': trace_id})
-
-    # Calculate the average angle of the detected lines and rotate image
-    rotation_angle = -np.mean(angles)
-    rotated_image = image.rotate(rotation_angle, expand=False)
+    if logger.isEnabledFor(logging.DEBUG):
+        image_lines = image.copy()
+        image_lines_draw = ImageDraw.Draw(image_lines)
+        for line, inlier in zip(lines / scale, inliers):
+            image_lines_draw.line((tuple(line[0:2]), tuple(line[2:4])), fill="green" if inlier else "red", width=2)
+        logger.debug(f"Calculate {image} image lines", extra={'trace': image_lines, 'trace_id': trace_id})
+
+    # Calculate the average angle of the detected lines, longer lines are more reliable
+    return float(np.average(line_angles[inliers], weights=line_lengths[inliers]))
+
+
+def skew_angle(image: Image.Image, /, outliers_iqr_scale: float = 0.01, min_line_length: float | int = 100,
+               max_line_gap: float | int = 100, border_band: Size | float | int = 0,
+               scale: float = 1, method: str = 'hough') -> float | None:
+    """Return the angle in degrees the content of an image is rotated from the axes, None if not detected.
+
+    The hough method averages the angles of the lines detected in the image, only in its outer border
+    band if given, and the contour method takes the angle of the rectangle around the largest contour,
+    the card, much faster but requiring the card to be darker than the scan background. Both methods
+    work with a copy of the image downscaled by scale. Lengths are in pixels of the original image.
+    """
+    logger = logging.getLogger('cartuli.processing')
+
+    if not 0 < scale <= 1:
+        raise ValueError(f"Scale must be between 0 and 1, {scale} found")
+    if method not in SKEW_METHODS:
+        raise ValueError(f"Invalid skew method '{method}', valid values are {', '.join(SKEW_METHODS)}")
+
+    gray_image = cv.cvtColor(np.asarray(image), cv.COLOR_RGB2GRAY)
+    if scale < 1:
+        gray_image = cv.resize(gray_image, (max(round(gray_image.shape[1] * scale), 1),
+                                            max(round(gray_image.shape[0] * scale), 1)), interpolation=cv.INTER_AREA)
+    logger.debug(f"Covnert {image} image to gray", extra={'trace': gray_image})
+
+    if method == 'contour':
+        angle = _contour_skew_angle(gray_image)
+    else:
+        angle = _hough_skew_angle(image, gray_image, outliers_iqr_scale, min_line_length, max_line_gap,
+                                  _to_size(_to_size(border_band) * scale), scale)
+    if angle is None:
+        # Clean images may not have borders to detect
+        logger.info(f"No skew detected in {image} image")
+
+    return angle
+
+
+def straighten(image: Image.Image, /, outliers_iqr_scale: float = 0.01, min_line_length: float | int = 100,
+               max_line_gap: float | int = 100, border_band: Size | float | int = 0,
+               scale: float = 1, method: str = 'hough', angle: float = None) -> Image.Image:
+    """Rotate an image to align its content with the axes, by its skew angle if it is already known."""
+    logger = logging.getLogger('cartuli.processing')
+
+    trace_id = extract_id(image)
+
+    logger.debug(f"Start {image} image straighten", extra={'trace': image, 'trace_id': trace_id})
+
+    # Image y axis points down, so a positive skew is a clockwise rotation undone rotating counterclockwise
+    rotation_angle = angle
+    if rotation_angle is None:
+        rotation_angle = skew_angle(image, outliers_iqr_scale, min_line_length=min_line_length,
+                                    max_line_gap=max_line_gap, border_band=border_band, scale=scale, method=method)
+    if rotation_angle is None:
+        return image
+    # Traceable images methods do not accept keyword arguments, rotation does not expand the image by default
+    rotated_image = image.rotate(rotation_angle)
     logger.debug(f"Rotate {image} image", extra={'trace': rotated_image, 'trace_id': trace_id})
 
     # TUNE: Maybe new content generated after rotation should be inpainted
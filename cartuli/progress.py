@@ -0,0 +1,136 @@
+"""Build progress module."""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from collections.abc import Hashable
+
+
+DEFAULT_REPORT_INTERVAL = 10
+# TUNE: Weight of the last measured cost in the learned seconds per megapixel
+DEFAULT_SMOOTHING = 0.3
+
+
+class Progress:
+    """Card images created by workers with an estimated time to create the pending ones.
+
+    The cost of each kind of task, usually its filter, is learned in seconds per megapixel from the
+    measured time of completed tasks, so the estimation improves as the build advances. Work expected
+    to be sent to workers later, like the sheets not created yet, is included until it is settled.
+    """
+
+    def __init__(self, jobs: int = 1, /, interval: float = DEFAULT_REPORT_INTERVAL,
+                 smoothing: float = DEFAULT_SMOOTHING):
+        if jobs < 1:
+            raise ValueError(f"At least one job is required, {jobs} found")
+        if not 0 < smoothing <= 1:
+            raise ValueError(f"Smoothing must be between 0 and 1, {smoothing} found")
+
+        self.__jobs = jobs
+        self.__interval = interval
+        self.__smoothing = smoothing
+        self.__tasks = 0
+        self.__completed_tasks = 0
+        self.__megapixels = 0.0
+        self.__completed_megapixels = 0.0
+        self.__pending = {}
+        self.__expected = {}
+        self.__costs = {}
+        self.__last_report = time.monotonic()
+        self.__lock = threading.Lock()
+
+    @property
+    def tasks(self) -> int:
+        return self.__tasks
+
+    @property
+    def completed_tasks(self) -> int:
+        return self.__completed_tasks
+
+    @property
+    def megapixels(self) -> float:
+        return self.__megapixels
+
+    @property
+    def completed_megapixels(self) -> float:
+        return self.__completed_megapixels
+
+    @property
+    def expected_megapixels(self) -> float:
+        return sum(sum(megapixels.values()) for megapixels in tuple(self.__expected.values()))
+
+    def expect(self, token: Hashable, megapixels: dict[str, float]) -> None:
+        """Register the megapixels of each kind of task expected to be sent to workers later."""
+        with self.__lock:
+            self.__expected[token] = dict(megapixels)
+
+    def settle(self, token: Hashable) -> None:
+        """Discard expected work, once its tasks are about to be sent or they are not needed anymore."""
+        with self.__lock:
+            self.__expected.pop(token, None)
+
+    def add(self, megapixels: float, /, kind: str = '') -> None:
+        """Register a task sent to workers."""
+        with self.__lock:
+            self.__tasks += 1
+            self.__megapixels += megapixels
+            self.__pending[kind] = self.__pending.get(kind, 0) + megapixels
+
+    def done(self, megapixels: float, seconds: float, /, kind: str = '') -> None:
+        """Register a completed task and the seconds it took."""
+        with self.__lock:
+            self.__completed_tasks += 1
+            self.__completed_megapixels += megapixels
+            self.__pending[kind] = max(self.__pending.get(kind, 0) - megapixels, 0)
+            if megapixels > 0:
+                cost = seconds / megapixels
+                if kind in self.__costs:
+                    cost = self.__smoothing * cost + (1 - self.__smoothing) * self.__costs[kind]
+                self.__costs[kind] = cost
+
+        self.report()
+
+    def seconds_per_megapixel(self, kind: str = '') -> float | None:
+        """Return the learned cost of a kind of task, the average of all kinds if it was never measured."""
+        if kind in self.__costs:
+            return self.__costs[kind]
+        if self.__costs:
+            return sum(self.__costs.values()) / len(self.__costs)
+        return None
+
+    @property
+    def eta(self) -> float | None:
+        """Estimated seconds to complete the pending and expected tasks, None until a task is completed."""
+        if not self.__costs:
+            return None
+
+        with self.__lock:
+            pending = tuple(self.__pending.items())
+            pending += tuple(item for megapixels in self.__expected.values() for item in megapixels.items())
+        return sum(megapixels * self.seconds_per_megapixel(kind) for kind, megapixels in pending) / self.__jobs
+
+    def report(self, /, force: bool = False) -> None:
+        """Log the progress if the report interval passed since the last report."""
+        logger = logging.getLogger('cartuli.progress.Progress.report')
+
+        now = time.monotonic()
+        if not force and now - self.__last_report < self.__interval:
+            return
+        self.__last_report = now
+        logger.info(str(self))
+
+    def __str__(self) -> str:
+        megapixels = self.__megapixels + self.expected_megapixels
+        percentage = 100 * self.__completed_megapixels / megapixels if megapixels else 100
+        eta = f"ETA {_format_seconds(eta)}" if (eta := self.eta) is not None else "ETA unknown"
+        return (f"{self.__completed_tasks} of {self.__tasks} card images created, {percentage:.0f}% of "
+                f"{megapixels:.1f} megapixels, {eta}")
+
+
+def _format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    if minutes:
+        return f"{minutes}m {seconds:02d}s"
+    return f"{seconds}s"
@@ -0,0 +1,106 @@
+"""Card images registry module."""
+from __future__ import annotations
+
+import logging
+import threading
+
+from collections.abc import Callable, Hashable
+from pathlib import Path
+
+from .card import CardImage
+from .filters import Filter
+from .measure import Size
+
+
+RegistryKey = tuple[Path, str, float, Size]
+FileStamp = tuple[int, int]
+
+# TUNE: Seconds waiting for a card image created by other build before creating it again
+DEFAULT_WAIT_TIMEOUT = 60
+
+
+class CardImageRegistry:
+    """Card images created from files, shared by every card that uses the same file, filter, bleed and size."""
+
+    def __init__(self):
+        self.__entries = {}
+        # Stamps of the card images being created by a build and not registered yet
+        self.__creating = {}
+        self.__condition = threading.Condition()
+
+    @staticmethod
+    def key(file: Path, image_filter: Filter, bleed: float, size: Size) -> RegistryKey:
+        return (Path(file).resolve(), repr(image_filter), bleed, size)
+
+    @staticmethod
+    def stamp(file: Path) -> FileStamp:
+        stat = Path(file).stat()
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _registered(self, key: RegistryKey, stamp: FileStamp) -> bool:
+        return key in self.__entries and self.__entries[key][0] == stamp
+
+    def get(self, key: RegistryKey, stamp: FileStamp, /, user: Hashable = None) -> CardImage | None:
+        """Return the registered card image if its file did not change since it was created."""
+        with self.__condition:
+            if key not in self.__entries:
+                return None
+
+            entry_stamp, card_image, users = self.__entries[key]
+            if entry_stamp != stamp:
+                return None
+
+            users.add(user)
+            return card_image
+
+    def put(self, key: RegistryKey, stamp: FileStamp, card_image: CardImage, /, user: Hashable = None) -> None:
+        with self.__condition:
+            # Users of the card image replaced keep using it
+            users = self.__entries[key][2] if key in self.__entries else set()
+            users.add(user)
+            self.__entries[key] = (stamp, card_image, users)
+            if self.__creating.get(key) == stamp:
+                del self.__creating[key]
+            self.__condition.notify_all()
+
+    def claim(self, key: RegistryKey, stamp: FileStamp) -> bool:
+        """Return if the caller must create the card image, which is not registered or being created by other."""
+        with self.__condition:
+            if self._registered(key, stamp) or self.__creating.get(key) == stamp:
+                return False
+
+            self.__creating[key] = stamp
+            return True
+
+    def abandon(self, key: RegistryKey, stamp: FileStamp) -> None:
+        """Release the claim of a card image that will not be created, if it is not registered yet."""
+        with self.__condition:
+            if self.__creating.get(key) == stamp:
+                del self.__creating[key]
+                self.__condition.notify_all()
+
+    def wait(self, key: RegistryKey, stamp: FileStamp, /, user: Hashable = None,
+             timeout: float = DEFAULT_WAIT_TIMEOUT) -> CardImage | None:
+        """Return the card image once its creator registers it, None if it is abandoned or not created in time."""
+        with self.__condition:
+            self.__condition.wait_for(lambda: self._registered(key, stamp) or self.__creating.get(key) != stamp,
+                                      timeout=timeout)
+            return self.get(key, stamp, user=user)
+
+    def release(self, user: Hashable, /, keep: Callable[[Path], bool] = None) -> None:
+        """Remove the user from all card images, freeing the ones without users unless its file must be kept."""
+        logger = logging.getLogger('cartuli.registry.CardImageRegistry.release')
+
+        with self.__condition:
+            for key in tuple(self.__entries):
+                _, _, users = self.__entries[key]
+                users.discard(user)
+                if not users and (keep is None or not keep(key[0])):
+                    logger.debug(f"Released {key[0]} card image")
+                    del self.__entries[key]
+
+    def __contains__(self, key: RegistryKey) -> bool:
+        return key in self.__entries
+
+    def __len__(self) -> int:
+        return len(self.__entries)
@@ -0,0 +1,91 @@
+"""Shared memory image transfer between processes module."""
+from __future__ import annotations
+
+import mmap
+import os
+import tempfile
+
+from dataclasses import dataclass
+from PIL import Image
+
+from .card import CardImage
+from .measure import Size
+
+
+# POSIX shared memory is mounted as a file system in Linux, other systems use regular temporary files
+SHARED_MEMORY_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+@dataclass(frozen=True)
+class SharedImage:
+    """Reference to image pixels written to shared memory by another process."""
+
+    path: str
+    mode: str
+    size: tuple[int, int]
+    filename: str = None
+    # Palette mode and colours of P and PA images, whose pixels are palette indices
+    palette: tuple[str, list[int]] = None
+    info: dict = None
+
+    @classmethod
+    def from_image(cls, image: Image.Image) -> SharedImage:
+        file_descriptor, path = tempfile.mkstemp(prefix='cartuli-', dir=SHARED_MEMORY_DIR)
+        with os.fdopen(file_descriptor, 'wb') as file:
+            file.write(image.tobytes())
+
+        palette = None
+        if image.mode in ('P', 'PA') and image.palette is not None:
+            palette = (image.palette.mode, image.getpalette(image.palette.mode))
+        filename = getattr(image, 'filename', None)
+        return cls(path, image.mode, image.size, str(filename) if filename else None, palette=palette,
+                   info=dict(image.info) or None)
+
+    def to_image(self) -> Image.Image:
+        """Return an image using the shared memory pixels, it can be called only once."""
+        with open(self.path, 'rb') as file:
+            try:
+                # Pillow maps the memory without copying it for modes like L, RGBA or CMYK and keeps the mapping
+                # while the image exists, after removing the file the memory is released with the image
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                os.unlink(self.path)
+            except (ValueError, OSError):
+                # Empty images can not be mapped and mapped files can not be removed in some systems
+                buffer = file.read()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        image = Image.frombuffer(self.mode, self.size, buffer, 'raw', self.mode, 0, 1)
+        if self.palette is not None:
+            palette_mode, palette = self.palette
+            image.putpalette(palette, palette_mode)
+        if self.info:
+            image.info.update(self.info)
+        if self.filename:
+            image.filename = self.filename
+
+        return image
+
+    def release(self) -> None:
+        """Remove the shared memory of an image that will not be used."""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+@dataclass(frozen=True)
+class SharedCardImage:
+    """Card image whose pixels are in shared memory."""
+
+    image: SharedImage
+    size: Size
+    bleed: float
+    name: str
+
+    @classmethod
+    def from_card_image(cls, card_image: CardImage) -> SharedCardImage:
+        return cls(SharedImage.from_image(card_image.image), card_image.size, card_image.bleed, card_image.name)
+
+    def to_card_image(self) -> CardImage:
+        return CardImage(self.image.to_image(), size=self.size, bleed=self.bleed, name=self.name)
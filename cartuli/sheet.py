@@ -16,9 +16,9 @@ class Sheet(object):
 
     def __init__(self, cards: Card | Iterable[Card] = None, /, size: Size = DEFAULT_SIZE,
                  print_margin: float = DEFAULT_PRINT_MARGIN, padding: float = DEFAULT_PADDING,
-                 crop_marks_padding=DEFAULT_CROP_MARKS_PADDING):
+                 crop_marks_padding=DEFAULT_CROP_MARKS_PADDING, card_size: Size = None):
         """Create Sheet object."""
-        self.__card_size = None
+        self.__card_size = card_size
         self.__cards = []
         if cards is not None:
             self.add(cards)
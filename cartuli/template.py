@@ -10,6 +10,8 @@ from pathlib import Path
 from PIL import Image
 from typing import Iterable
 
+from .cache import Cache
+
 
 DEFAULT_SVG_DPI = 300
 
@@ -86,7 +88,7 @@ def _is_image_element(element: etree._Element) -> bool:
 
 class Template:
     def __init__(self, template: TemplateContent | etree._Element, parameters: Iterable[ParameterKey],
-                 dpi: int = DEFAULT_SVG_DPI):
+                 dpi: int = DEFAULT_SVG_DPI, cache: Cache = None):
         if not parameters:
             raise ValueError("A template withoyt parameters does not make any sense")
 
@@ -111,6 +113,7 @@ class Template:
 
         self.__parameters = tuple(parameters)
         self.__dpi = dpi
+        self.__cache = cache
 
     @staticmethod
     def from_dict(definition: dict) -> Template:
@@ -129,11 +132,12 @@ class Template:
         return self.__dpi
 
     @classmethod
-    def from_file(cls, template_file: str | Path, parameters: Iterable[ParameterKey]) -> Template:
+    def from_file(cls, template_file: str | Path, parameters: Iterable[ParameterKey],
+                  cache: Cache = None) -> Template:
         if isinstance(template_file, str):
             template_file = Path(template_file)
 
-        return cls(etree.parse(template_file), parameters)
+        return cls(etree.parse(template_file), parameters, cache=cache)
 
     def apply_parameters(self, parameters: dict[ParameterKey, ParameterValue]) -> TemplateContent:
         # TUNE: Think if an error should be raised if not all parameters are specified
@@ -162,7 +166,16 @@ class Template:
     def create_image(self, parameters: dict[ParameterKey, ParameterValue]) -> Image.Image:
         svg_content = self.apply_parameters(parameters)
 
-        return svg_content_to_image(svg_content, dpi=self.__dpi)
+        if self.__cache is None:
+            return svg_content_to_image(svg_content, dpi=self.__dpi)
+
+        cache_key = Cache.key(svg_content, self.__dpi)
+        image = self.__cache.get_image(cache_key)
+        if image is None:
+            image = svg_content_to_image(svg_content, dpi=self.__dpi)
+            self.__cache.put_image(cache_key, image)
+
+        return image
 
     def get_values(self, content: TemplateContent | etree._Element,
                    parameters: tuple(ParameterKey) = None) -> dict[ParameterKey, ParameterValue]:
@@ -0,0 +1,66 @@
+"""File changes watch module."""
+from __future__ import annotations
+
+import logging
+import time
+
+from collections.abc import Callable
+from pathlib import Path
+from typing import Iterable
+
+
+DEFAULT_WATCH_INTERVAL = 1.0
+
+
+FileStamp = tuple[int, int]
+
+
+class Watcher:
+    """Poll a changing set of files for modifications, additions and removals."""
+
+    def __init__(self, files: Callable[[], Iterable[Path]], /, interval: float = DEFAULT_WATCH_INTERVAL):
+        self.__files = files
+        self.__interval = interval
+        # Stamps are kept if files can not be obtained, even the first time
+        self.__stamps = {}
+        self.__stamps = self._stamps()
+
+    @property
+    def interval(self) -> float:
+        return self.__interval
+
+    def _stamps(self) -> dict[Path, FileStamp]:
+        logger = logging.getLogger('cartuli.watch.Watcher')
+
+        stamps = {}
+        try:
+            files = set(Path(file).resolve() for file in self.__files())
+        except Exception as e:
+            # Files may not be resolvable while they are being edited
+            logger.warning(f"Unable to obtain files to watch: {e}")
+            return self.__stamps
+
+        for file in files:
+            try:
+                stat = file.stat()
+                stamps[file] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                pass
+
+        return stamps
+
+    def changes(self) -> set[Path]:
+        """Return the files modified, added or removed since the last call."""
+        stamps = self._stamps()
+        changes = {file for file in stamps.keys() | self.__stamps.keys()
+                   if stamps.get(file) != self.__stamps.get(file)}
+        self.__stamps = stamps
+
+        return changes
+
+    def wait(self) -> set[Path]:
+        """Block until any file changes and return the changed files."""
+        while not (changes := self.changes()):
+            time.sleep(self.__interval)
+
+        return changes
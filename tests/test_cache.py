@@ -0,0 +1,73 @@
+from cartuli.cache import Cache, image_hash
+from cartuli.card import CardImage
+from cartuli.measure import Size, STANDARD, mm
+
+
+def test_cache_key(random_image):
+    image = random_image()
+    assert Cache.key(image_hash(image), 'filter') == Cache.key(image_hash(image.copy()), 'filter')
+    assert Cache.key(image_hash(image), 'filter') != Cache.key(image_hash(image), 'other_filter')
+
+
+def test_cache_image(tmp_path, random_image):
+    cache = Cache(tmp_path)
+    image = random_image()
+    key = Cache.key(image_hash(image))
+
+    assert cache.get_image(key) is None
+    assert cache.misses == 1
+    cache.put_image(key, image)
+    assert image_hash(cache.get_image(key)) == image_hash(image)
+    assert cache.hits == 1
+
+    card_image = CardImage(image, size=STANDARD, bleed=2*mm)
+    cache.put_card_image(key, card_image)
+    cached_card_image = cache.get_card_image(key, size=STANDARD, name='card')
+    assert cached_card_image.bleed == 2*mm
+    assert cached_card_image.name == 'card'
+
+    cache.clear()
+    assert cache.get_image(key) is None
+    assert cache.size == 0
+
+
+def test_cache_image_not_stored(tmp_path, random_image):
+    cache = Cache(tmp_path)
+    image = random_image().convert('CMYK')
+    key = Cache.key(image_hash(image))
+    cache.put_image(key, image)
+    assert cache.get_image(key) is None
+
+    # Write errors are logged and ignored
+    (tmp_path / key[:2]).mkdir()
+    (tmp_path / key[:2] / f"{key}.png").mkdir()
+    cache.put_image(key, random_image())
+    assert cache.get_image(key) is None
+    assert not list((tmp_path / key[:2]).glob('*.tmp'))
+
+
+def test_cache_data(tmp_path):
+    cache = Cache(tmp_path)
+    key = Cache.key('data')
+
+    assert cache.get_data(key) is None
+    cache.put_data(key, b'data')
+    assert cache.get_data(key) == b'data'
+    assert cache.size == len(b'data')
+
+
+def test_cache_eviction(tmp_path, random_image):
+    images = [random_image(Size(300, 200)) for _ in range(3)]
+    keys = [Cache.key(n) for n in range(len(images))]
+
+    cache = Cache(tmp_path)
+    cache.put_image(keys[0], images[0])
+    cache = Cache(tmp_path, max_size=2.5 * cache.size)
+    cache.put_image(keys[1], images[1])
+    cache.get_image(keys[0])
+    cache.put_image(keys[2], images[2])
+
+    assert cache.size <= cache.max_size
+    assert cache.get_image(keys[0]) is not None
+    assert cache.get_image(keys[1]) is None
+    assert cache.get_image(keys[2]) is not None
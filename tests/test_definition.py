@@ -1,8 +1,17 @@
 import pytest
 
-from cartuli.definition import Definition, _TemplateParameters
-from cartuli.filters import NullFilter, InpaintFilter
+from copy import deepcopy
+from pathlib import Path
+from PIL import Image, ImageOps
+
+from cartuli.cache import Cache
+from cartuli.definition import Definition, DefinitionError, _TemplateParameters, _TemplateRow, _CardImageTask, \
+    _create_card_image
+from cartuli.executor import Executor
+from cartuli.filters import NullFilter, InpaintFilter, StraightenFilter
 from cartuli.measure import Size, STANDARD, A4, mm
+from cartuli.progress import Progress
+from cartuli.registry import CardImageRegistry
 
 
 def test_defintion_invalid_file():
@@ -10,6 +19,8 @@ def test_defintion_invalid_file():
         Definition.from_file("non_exitent_file")
     with pytest.raises(FileNotFoundError):
         Definition.from_file("..")
+    with pytest.raises(ValueError, match="Expected a dictionary, None found"):
+        Definition(None)
 
 
 def test_file(fixture_file):
@@ -138,6 +149,536 @@ def test_template_parameters_convert_dict_of_lists_to_list_of_dicts():
     ]
 
 
-# TODO: Test load template parameters from yml or CSV file
-def test_template_parameters_load_parameter_from_file():
-    pass
+def test_template_parameters_load_parameter_from_file(tmp_path, random_image_file):
+    image_file = random_image_file("parameters")
+    text_file = image_file.parent / "text.txt"
+    text_file.write_text("Text from file")
+    csv_file = image_file.parent / "parameters.csv"
+    csv_file.write_text(f"image,text\n{image_file.name},First\n{image_file.name},{text_file.name}\n")
+
+    template_parameters = _TemplateParameters.from_dict(csv_file)
+    assert template_parameters.keys == ['image', 'text']
+    rows = list(template_parameters.parameters)
+    assert rows == [
+        {'image': image_file, 'text': "First"},
+        {'image': image_file, 'text': text_file}
+    ]
+    row = _TemplateParameters._load_row(rows[1])
+    assert isinstance(row['image'], Image.Image)
+    assert row['text'] == "Text from file"
+
+    yaml_file = tmp_path / "parameters.yml"
+    yaml_file.write_text("- text: First\n  number: 1\n---\ntext: Second\nnumber: 2\n")
+    template_parameters = _TemplateParameters.from_dict(str(yaml_file), files_filter=lambda x: x != "Second",
+                                                        name_parameter='text')
+    assert template_parameters.keys == ['text', 'number']
+    assert list(template_parameters.parameters) == [{'text': "Second", 'number': "2"}]
+
+    empty_file = tmp_path / "empty.csv"
+    empty_file.write_text("")
+    assert _TemplateParameters.from_dict(empty_file).keys == []
+
+
+def test_template_parameters_data_file_streamed(tmp_path):
+    csv_file = tmp_path / "parameters.csv"
+    csv_file.write_text("text\n" + "\n".join(f"Row {n}" for n in range(3)) + "\n")
+
+    class RowsTemplate:
+        def __init__(self):
+            self.rows = []
+
+        def create_image(self, parameters):
+            self.rows.append(parameters['text'])
+            return Image.new('RGB', (1, 1))
+
+    template = RowsTemplate()
+    images = _TemplateParameters.from_data_file(csv_file).create_images(template, name_parameter='text')
+    assert template.rows == []
+    assert next(images).filename == "Row 0"
+    assert template.rows == ["Row 0"]
+    assert [image.filename for image in images] == ["Row 1", "Row 2"]
+
+
+def test_template_parameters_lazy_images(random_image_file, monkeypatch):
+    import cartuli.definition
+
+    image_dir = random_image_file("lazy").parent
+    for _ in range(0, 2):
+        random_image_file("lazy")
+    image_files = sorted(image_dir.glob("*.png"))
+
+    loaded_files = []
+
+    def load_image(image_file):
+        loaded_files.append(Path(image_file))
+        return Image.open(image_file)
+
+    monkeypatch.setattr(cartuli.definition, '_load_image', load_image)
+
+    class ImagesTemplate:
+        def create_image(self, parameters):
+            assert isinstance(parameters['image'], Image.Image)
+            return Image.new('RGB', (1, 1))
+
+    for executor in (None, Executor(read_ahead=0)):
+        loaded_files.clear()
+        template_parameters = _TemplateParameters.from_dict({'image': str(image_dir / "*.png")},
+                                                            name_parameter='image', executor=executor)
+        assert template_parameters.keys == ['image']
+        assert loaded_files == []
+        images = template_parameters.create_images(ImagesTemplate(), name_parameter='image')
+        assert next(images).filename == str(image_files[0])
+        assert loaded_files == image_files[:1]
+        assert len(list(images)) == 2
+        assert loaded_files == image_files
+
+
+def test_definition_template_data_file(tmp_path, fixture_file, random_image_file):
+    image_file = random_image_file("data")
+    data_file = image_file.parent / "cards.csv"
+    data_file.write_text(f"image,text\n{image_file.name},One\n{image_file.name},Two\n")
+
+    definition = Definition({
+        'template_parameters': {
+            'cards': str(data_file)
+        },
+        'decks': {
+            'cards': {
+                'size': 'STANDARD',
+                'front': {
+                    'template': {
+                        'file': str(fixture_file('template.svg')),
+                        'parameters': 'cards'
+                    }
+                }
+            }
+        }
+    })
+    assert definition.deck_files('cards') == [fixture_file('template.svg'), data_file, image_file, image_file]
+    assert definition.image_sources(definition._values['decks']['cards']['front']) == \
+        [fixture_file('template.svg')] * 2
+
+    with pytest.raises(ValueError, match="Unknown template parameters"):
+        Definition({'decks': {'cards': {'size': 'STANDARD', 'front': {
+            'template': {'file': 'template.svg', 'parameters': 'cards.json'}}}}})
+    with pytest.raises(ValueError, match="must be a dictionary or a data file"):
+        Definition({'template_parameters': {'cards': 'cards.json'}})
+
+
+def test_definition_template_requests(tmp_path, fixture_file, random_image_file, monkeypatch):
+    image_file = random_image_file("data")
+    data_file = image_file.parent / "cards.csv"
+    data_file.write_text(f"image,text\n{image_file.name},One\n{image_file.name},Two\n")
+
+    definition = Definition({
+        'decks': {
+            'cards': {
+                'size': 'STANDARD',
+                'front': {
+                    'template': {
+                        'file': str(fixture_file('template.svg')),
+                        'parameters': str(data_file),
+                        'name_parameter': 'text'
+                    }
+                }
+            }
+        }
+    }, cache=Cache(tmp_path / "cache"))
+
+    # Rows are rendered by workers when its card images are created, not when the deck is loaded
+    monkeypatch.setattr(_TemplateRow, 'create_image', lambda self: pytest.fail("Template row rendered"))
+    requests = definition._card_image_requests(definition._values['decks']['cards']['front'], STANDARD)
+    assert [request.task.source for request in requests] == [
+        _TemplateRow(fixture_file('template.svg'), ('image', 'text'), {'image': image_file, 'text': "One"}, "One"),
+        _TemplateRow(fixture_file('template.svg'), ('image', 'text'), {'image': image_file, 'text': "Two"}, "Two")
+    ]
+    assert [request.name for request in requests] == ["One", "Two"]
+    assert requests[0].cache_key != requests[1].cache_key
+
+    cache_key = requests[0].cache_key
+    Image.new('RGB', (10, 10)).save(image_file)
+    requests = definition._card_image_requests(definition._values['decks']['cards']['front'], STANDARD)
+    assert requests[0].cache_key != cache_key
+
+
+def test_definition_filter_fit(tmp_path, fixture_file, monkeypatch):
+    image = ImageOps.expand(Image.open(fixture_file('card.png')).convert('RGB'), border=60, fill='white')
+    for n, angle in enumerate((2, 2, 2, -3)):
+        image.rotate(angle, fillcolor='white').save(tmp_path / f"card{n}.png")
+
+    definition_dict = {
+        'decks': {
+            'cards': {
+                'size': 'STANDARD',
+                'front': {
+                    'images': str(tmp_path / "card*.png"),
+                    'filter': {'straighten': {'method': 'contour', 'sample_size': 2}}
+                }
+            }
+        }
+    }
+    cache = Cache(tmp_path / "cache")
+    definition = Definition(definition_dict, cache=cache)
+    requests = definition._card_image_requests(definition._values['decks']['cards']['front'], STANDARD)
+    assert len(requests) == 4
+    assert {request.task.image_filter for request in requests} == {
+        StraightenFilter(method='contour', sample_size=2, angle=requests[0].task.image_filter.angle)}
+    assert requests[0].task.image_filter.angle == pytest.approx(-2, abs=0.05)
+
+    # Filters fitted to unmodified images are not estimated again
+    import cartuli.definition
+    monkeypatch.setattr(cartuli.definition, '_decode_image', lambda image_file: pytest.fail("Image decoded"))
+    for definition in (definition, Definition(definition_dict, cache=cache)):
+        cached_requests = definition._card_image_requests(definition._values['decks']['cards']['front'], STANDARD)
+        assert [request.task for request in cached_requests] == [request.task for request in requests]
+
+
+def test_definition_files_filter(random_image_file, monkeypatch):
+    import cartuli.definition
+
+    random_image_dir = random_image_file("front").parent
+    for _ in range(0, 3):
+        random_image_file("front")
+    selected_file = sorted(random_image_dir.glob("*.png"))[1]
+
+    loaded_files = []
+
+    def load_image(image_file):
+        loaded_files.append(str(image_file))
+        return cartuli.definition.Image.open(image_file)
+
+    monkeypatch.setattr(cartuli.definition, '_load_image', load_image)
+
+    definition = Definition({}, files_filter=lambda x: x != str(selected_file))
+    images = definition._load_images({'images': str(random_image_dir / "*.png")})
+    assert len(images) == 1
+    assert loaded_files == [str(selected_file)]
+
+
+def test_definition_sheet_groups():
+    definition_dict = {
+        'decks': {
+            'cards': {
+                'size': 'STANDARD',
+                'front': {'images': "cards/*.png", 'filter': 'front'},
+            },
+            'tokens': {
+                'size': '(44*mm,75*mm)',
+                'front': {'images': "tokens/*.png"},
+            },
+            'more_cards': {
+                'size': 'STANDARD',
+                'front': {'images': "more_cards/*.png"},
+            }
+        },
+        'filters': {
+            'front': {'inpaint': {}}
+        },
+        'outputs': {
+            'sheet': {'size': 'A4'}
+        }
+    }
+    definition = Definition(definition_dict)
+    assert definition.sheet_groups == (('tokens', ), ('cards', 'more_cards'))
+    assert definition.sheet_values(('tokens', )) == {
+        'decks': {'tokens': definition_dict['decks']['tokens']},
+        'outputs': definition_dict['outputs']
+    }
+    assert definition.sheet_values(('cards', 'more_cards'))['filters'] == definition_dict['filters']
+
+    definition_dict['outputs']['sheet']['share'] = False
+    definition = Definition(definition_dict)
+    assert definition.sheet_groups == (('cards', ), ('more_cards', ), ('tokens', ))
+
+
+def test_definition_update_and_invalidate(random_image_file):
+    front_image_file = random_image_file("front")
+    token_image_file = random_image_file("tokens")
+
+    definition_dict = {
+        'decks': {
+            'cards': {
+                'size': 'STANDARD',
+                'front': {'images': str(front_image_file.parent / "*.png")},
+            },
+            'tokens': {
+                'size': '(44*mm,75*mm)',
+                'front': {'images': str(token_image_file.parent / "*.png")},
+            }
+        },
+        'outputs': {
+            'sheet': {'size': 'A4'}
+        }
+    }
+    definition = Definition(deepcopy(definition_dict))
+    cards_deck = definition.deck('cards')
+    tokens_deck = definition.deck('tokens')
+    cards_front = cards_deck.cards[0].front
+
+    definition.invalidate([token_image_file])
+    assert definition.deck('cards') is cards_deck
+    assert definition.deck('tokens') is not tokens_deck
+
+    # New files matching the deck globs also invalidate the deck
+    random_image_file("front")
+    definition.invalidate(definition.deck_files('cards'))
+    assert definition.deck('cards') is not cards_deck
+    assert len(definition.deck('cards')) == 2
+    assert cards_front in [card.front for card in definition.deck('cards').cards]
+
+    cards_deck = definition.deck('cards')
+    tokens_deck = definition.deck('tokens')
+    definition_dict['decks']['tokens']['copies'] = 2
+    definition.update(definition_dict)
+    assert definition.deck('cards') is cards_deck
+    assert len(definition.deck('tokens')) == 2
+
+
+def test_definition_release(random_image_file):
+    front_image_file = random_image_file("front")
+    definition = Definition({
+        'decks': {
+            'cards': {
+                'size': 'STANDARD',
+                'front': {'images': str(front_image_file.parent / "*.png")},
+            }
+        },
+        'outputs': {
+            'sheet': {'size': 'A4'}
+        }
+    })
+
+    sheet = definition.sheet(('cards', ))
+    deck = definition.deck('cards')
+    assert definition.sheet(('cards', )) is sheet
+
+    definition.release(('cards', ))
+    assert definition.sheet(('cards', )) is not sheet
+    assert definition.deck('cards') is not deck
+    assert definition.deck('cards').cards[0].front is not deck.cards[0].front
+
+
+def test_definition_shared_card_images(random_image_file):
+    front_image_file = random_image_file("front")
+    back_image_file = random_image_file("back")
+    definition = Definition({
+        'decks': {
+            'cards': {
+                'size': 'STANDARD',
+                'front': {'images': str(front_image_file.parent / "*.png")},
+                'default_back': {'image': str(back_image_file)}
+            },
+            'more_cards': {
+                'size': 'STANDARD',
+                'front': {'images': str(front_image_file.parent / "*.png")},
+                'back': {'images': str(back_image_file.parent / "*.png")},
+                'default_back': {'image': str(back_image_file)}
+            }
+        },
+        'outputs': {
+            'sheet': {'size': 'A4', 'share': False}
+        }
+    })
+
+    deck = definition.deck('cards')
+    assert deck.default_back is definition.deck('more_cards').default_back
+    assert deck.default_back is definition.deck('more_cards').cards[0].back
+
+    definition.release(('cards', ))
+    assert definition.deck('more_cards').cards[0].front is deck.cards[0].front
+
+    definition.release(('more_cards', ))
+    assert definition.deck('cards').cards[0].front is not deck.cards[0].front
+
+
+def test_definition_selection():
+    definition_dict = {
+        'decks': {
+            'cards': {
+                'size': 'STANDARD',
+                'front': {'images': "cards/*.png"},
+            },
+            'tokens': {
+                'size': '(44*mm,75*mm)',
+                'front': {'images': "tokens/*.png"},
+            },
+            'more_cards': {
+                'size': 'STANDARD',
+                'front': {'images': "more_cards/*.png"},
+            }
+        },
+        'outputs': {
+            'sheet': {'size': 'A4'}
+        }
+    }
+    definition = Definition(definition_dict)
+    assert definition.sheet_group('cards_more_cards') == ('cards', 'more_cards')
+    with pytest.raises(DefinitionError):
+        definition.sheet_group('cards')
+
+    definition = Definition(definition_dict, decks=['more_cards', 'tokens'])
+    assert definition.deck_names == ('tokens', 'more_cards')
+    assert definition.sheet_groups == (('tokens', ), ('more_cards', ))
+
+    definition = Definition(definition_dict, decks=['others'])
+    with pytest.raises(DefinitionError):
+        definition.deck_names
+
+
+def test_create_card_image_closes_file(random_image_file):
+    image_file = random_image_file()
+    card_image = _create_card_image(_CardImageTask(image_file, NullFilter(), STANDARD))
+    assert getattr(card_image.image, 'fp', None) is None
+
+
+def test_definition_base_dir(random_image_file, tmp_path, monkeypatch):
+    front_image_file = random_image_file("front")
+    base_dir = front_image_file.parent.parent
+    definition_file = base_dir / "Cartulifile.yml"
+    definition_file.write_text(
+        "decks:\n"
+        "  cards:\n"
+        "    size: STANDARD\n"
+        "    front:\n"
+        "      images: front/*.png\n"
+    )
+
+    monkeypatch.chdir(tmp_path)
+    definition = Definition.from_file(definition_file, files_filter=lambda x: not x.startswith("front"))
+    assert definition.files == [front_image_file]
+    assert len(definition.deck('cards')) == 1
+
+
+def test_definition_sheet_cards(random_image_file):
+    front_image_files = [random_image_file("front") for _ in range(3)]
+    back_image_files = [random_image_file("back") for _ in range(3)]
+    definition = Definition({
+        'decks': {
+            'cards': {
+                'size': 'STANDARD',
+                'front': {'images': str(front_image_files[0].parent / "*.png")},
+                'back': {'images': str(back_image_files[0].parent / "*.png")},
+                'copies': 2
+            }
+        },
+        'outputs': {
+            'sheet': {'size': 'A4'}
+        }
+    })
+
+    cards = definition.sheet_cards(('cards', ))
+    card = next(cards)
+    assert card.front.name == sorted(front_image_files)[0].stem
+    assert card.back.name == sorted(back_image_files)[0].stem
+    assert definition.sheet_layout(('cards', )).num_cards_per_page == 4
+
+    cards = [card] + list(cards)
+    assert len(cards) == 6
+    assert cards[3] is card
+    assert definition.deck('cards').cards == tuple(cards)
+
+
+def test_definition_sheet_cards_decks(random_image_file, tmp_path):
+    front_image_file = random_image_file("front")
+    random_image_file("front")
+    back_image_file = random_image_file("back")
+    cache = Cache(tmp_path / "cache")
+    progress = Progress(1)
+    definition = Definition({
+        'decks': {
+            'cards': {
+                'size': 'STANDARD',
+                'front': {'images': str(front_image_file.parent / "*.png"), 'filter': {'crop': {'size': '1*mm'}}},
+                'default_back': {'image': str(back_image_file)}
+            },
+            'more_cards': {
+                'size': 'STANDARD',
+                'front': {'images': str(front_image_file.parent / "*.png")},
+                'default_back': {'image': str(back_image_file)}
+            }
+        }
+    }, cache=cache, progress=progress)
+
+    # All decks card images are sent before consuming the first card, the shared back only once
+    cards = definition.sheet_cards(('cards', 'more_cards'))
+    next(cards)
+    assert progress.tasks == 5
+    assert cache.misses == 2
+
+    cards = list(cards)
+    assert len(cards) == 3
+    assert definition.deck('cards').default_back is definition.deck('more_cards').default_back
+
+
+def test_definition_evicted_card_images(random_image_file, tmp_path, monkeypatch):
+    image_file = random_image_file("cards")
+    values = {
+        'decks': {
+            'cards': {
+                'size': 'STANDARD',
+                'front': {'image': str(image_file), 'filter': {'crop': {'size': '1*mm'}}}
+            }
+        }
+    }
+    cache = Cache(tmp_path / "cache")
+    Definition(values, cache=cache).deck('cards')
+
+    # Card images evicted after being found in the cache are created and cached again
+    put_keys = []
+    monkeypatch.setattr(cache, 'get_card_image', lambda key, **kwargs: None)
+    monkeypatch.setattr(cache, 'put_card_image', lambda key, card_image: put_keys.append(key))
+    assert len(Definition(values, cache=cache).deck('cards').cards) == 1
+    assert len(put_keys) == 1
+
+
+def test_definition_largest_images_first(random_image_file):
+    image_files = [random_image_file("cards", size=Size(width, width)) for width in (20, 30, 200, 20, 100)]
+    progress = Progress(2)
+    with Executor(2, backend='thread') as executor:
+        definition = Definition({
+            'decks': {
+                'cards': {
+                    'size': 'STANDARD',
+                    'front': {'images': str(image_files[0].parent / "*.png")}
+                }
+            }
+        }, executor=executor, progress=progress)
+
+        deck = definition.deck('cards')
+
+    assert [card.front.name for card in deck.cards] == sorted(image_file.stem for image_file in image_files)
+    assert progress.completed_tasks == progress.tasks == 5
+    assert progress.completed_megapixels == pytest.approx(0.0517)
+
+
+def test_definition_file_hashes(random_image_file, tmp_path, monkeypatch):
+    import cartuli.definition
+    hashed_files = []
+    monkeypatch.setattr(cartuli.definition, 'file_hash', lambda file: hashed_files.append(file) or str(file))
+    cartuli.definition._file_hash.cache_clear()
+
+    image_file = random_image_file("cards", size=Size(100, 150))
+    random_image_file("cards", size=Size(100, 150))
+    values = {
+        'decks': {
+            'cards': {
+                'size': 'STANDARD',
+                'front': {'images': str(image_file.parent / "*.png"), 'filter': {'crop': {'size': '1*mm'}}}
+            }
+        }
+    }
+    cache = Cache(tmp_path / "cache")
+    registry = CardImageRegistry()
+    Definition(values, cache=cache, registry=registry).deck('cards')
+    assert len(hashed_files) == 2
+
+    # Registered card images do not require to hash its files
+    cartuli.definition._file_hash.cache_clear()
+    Definition(values, cache=cache, registry=registry).deck('cards')
+    assert len(hashed_files) == 2
+    Definition(values, cache=cache, registry=CardImageRegistry()).deck('cards')
+    assert len(hashed_files) == 4
+
+    # Unmodified files are not hashed again
+    Definition(values, cache=cache, registry=CardImageRegistry()).deck('cards')
+    assert len(hashed_files) == 4
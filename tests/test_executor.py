@@ -0,0 +1,38 @@
+import pytest
+
+from cartuli.executor import Executor
+
+
+def square(x: int) -> int:
+    return x * x
+
+
+@pytest.mark.parametrize('backend', ['process', 'thread', 'serial'])
+def test_executor(backend):
+    with Executor(2, backend=backend) as executor:
+        assert executor.map(square, range(10)) == [x * x for x in range(10)]
+        assert list(executor.imap(square, range(10))) == [x * x for x in range(10)]
+        assert sorted(executor.imap_unordered(square, range(10))) == [x * x for x in range(10)]
+
+
+def test_executor_invalid():
+    with pytest.raises(ValueError):
+        Executor(0)
+    with pytest.raises(ValueError):
+        Executor(2, backend='cluster')
+    assert Executor(1, backend='process').serial
+
+
+@pytest.mark.parametrize('read_ahead', [0, 1, 4])
+def test_executor_read_ahead(read_ahead):
+    read_items = []
+
+    def read(x: int) -> int:
+        read_items.append(x)
+        return x * x
+
+    with Executor(1, read_ahead=read_ahead) as executor:
+        results = executor.read_ahead(read, range(10))
+        assert next(results) == 0
+        assert len(read_items) <= read_ahead + 1
+        assert list(results) == [x * x for x in range(1, 10)]
@@ -0,0 +1,132 @@
+import pytest
+import threading
+import time
+
+from multiprocessing import Process
+
+from cartuli.executor import Executor
+from cartuli.farm import DirectoryQueue, work
+
+
+def square(x: int) -> int:
+    return x * x
+
+
+def fail(x: int) -> int:
+    raise ValueError(f"Invalid {x}")
+
+
+def test_directory_queue(tmp_path):
+    queue = DirectoryQueue(tmp_path, poll_interval=0.01)
+    keys = [queue.submit(square, x) for x in (2, 3, 2)]
+    assert keys[0] == keys[2]
+    assert len(list(queue.tasks_dir.glob('*.task'))) == 2
+
+    assert queue.work(idle_timeout=0) == 0
+    queue.run(queue.claim())
+    assert queue.work(idle_timeout=0.05) == 1
+    assert queue.claim() is None
+    assert queue.result(keys[1]) == 9
+    assert queue.result(keys[0]) == 4
+    assert queue.result(keys[2]) == 4
+    assert not any(queue.results_dir.iterdir())
+    assert not any(queue.running_dir.iterdir())
+
+
+def test_directory_queue_error(tmp_path):
+    queue = DirectoryQueue(tmp_path, poll_interval=0.01)
+    key = queue.submit(fail, 1)
+    queue.work(idle_timeout=0.05)
+    with pytest.raises(ValueError, match="Invalid 1"):
+        queue.result(key)
+
+
+def test_directory_queue_timeout(tmp_path, caplog):
+    with pytest.raises(ValueError):
+        DirectoryQueue(tmp_path, timeout=0)
+
+    queue = DirectoryQueue(tmp_path, poll_interval=0.01, timeout=0.1, wait_warning=0.02)
+    key = queue.submit(square, 2)
+    with pytest.raises(TimeoutError):
+        queue.result(key)
+    assert "Waiting for workers" in caplog.text
+    assert not any(queue.tasks_dir.iterdir())
+
+
+def slow_square(x: int) -> int:
+    time.sleep(0.3)
+    return x * x
+
+
+def test_directory_queue_lease(tmp_path):
+    queue = DirectoryQueue(tmp_path, poll_interval=0.01, lease=0.1)
+    key = queue.submit(square, 3)
+
+    # Tasks of dead workers are queued again once its lease expires
+    assert queue.claim() is not None
+    assert queue.requeue_expired() == 0
+    time.sleep(0.15)
+    assert queue.requeue_expired() == 1
+    assert queue.work(idle_timeout=0.05) == 1
+    assert queue.result(key) == 9
+
+    # Running tasks renew its lease
+    key = queue.submit(slow_square, 4)
+    worker = threading.Thread(target=queue.run, args=(queue.claim(), ))
+    worker.start()
+    time.sleep(0.2)
+    assert queue.requeue_expired() == 0
+    worker.join()
+    assert queue.result(key) == 16
+    assert not any(queue.tasks_dir.iterdir())
+
+
+def test_directory_queue_close(tmp_path):
+    queue = DirectoryQueue(tmp_path, poll_interval=0.01)
+    queue.submit(square, 1)
+    queue.close()
+    assert not any(queue.tasks_dir.iterdir())
+
+
+def test_directory_queue_executor(tmp_path):
+    # Several local worker processes share the queue as remote workers would do
+    workers = [Process(target=work, args=(tmp_path, n), kwargs={'poll_interval': 0.01, 'idle_timeout': 2})
+               for n in range(2)]
+    for worker in workers:
+        worker.start()
+
+    with Executor(2, backend='queue', queue_dir=tmp_path) as executor:
+        assert not executor.serial
+        assert executor.map(square, range(10)) == [x * x for x in range(10)]
+        assert sorted(executor.imap_unordered(square, range(10))) == [x * x for x in range(10)]
+
+        results = executor.imap(square, range(5))
+        assert next(results) == 0
+        results.close()
+
+    for worker in workers:
+        worker.join()
+    assert not any((tmp_path / 'tasks').iterdir())
+
+
+def test_directory_queue_threads(tmp_path):
+    queue = DirectoryQueue(tmp_path, poll_interval=0.01)
+    worker = threading.Thread(target=queue.work, kwargs={'idle_timeout': 0.5})
+    worker.start()
+    assert sorted(queue.imap_unordered(square, [1, 2, 2, 3])) == [1, 4, 4, 9]
+    worker.join()
+
+
+def test_executor_queue_invalid(tmp_path):
+    with pytest.raises(ValueError):
+        Executor(2, backend='queue')
+    with pytest.raises(ValueError):
+        DirectoryQueue(tmp_path, lease=0)
+
+
+def test_directory_queue_submit(tmp_path):
+    queue = DirectoryQueue(tmp_path, poll_interval=0.01)
+    results = queue.imap_unordered(square, range(3))
+    assert len(list(queue.tasks_dir.glob('*.task'))) == 3
+    queue.work(idle_timeout=0.05)
+    assert sorted(results) == [0, 1, 4]
@@ -1,5 +1,12 @@
-from cartuli.filters import Filter, InpaintFilter, NullFilter, MultipleFilter, StraightenFilter, snake_to_class
-from cartuli.measure import mm
+import pytest
+
+from PIL import Image, ImageOps
+
+from cartuli.card import CardImage
+from cartuli.filters import Filter, BleedFilter, InpaintFilter, NullFilter, MultipleFilter, StraightenFilter, \
+    snake_to_class
+from cartuli.measure import mm, STANDARD
+from cartuli.processing import skew_angle
 
 
 def test_filter_from_dict():
@@ -30,6 +37,72 @@ def test_filter_from_dict():
     )
 
 
+def test_inpaint_filter_scale():
+    assert Filter.from_dict({'inpaint': {'scale': "0.5"}}) == InpaintFilter(scale=0.5)
+    with pytest.raises(ValueError):
+        InpaintFilter(scale=2)
+
+
+def test_straighten_filter():
+    assert Filter.from_dict({
+        'straighten': {
+            'min_line_length': "30*mm",
+            'border_band': "15*mm",
+            'scale': 0.5
+        }
+    }) == StraightenFilter(min_line_length=30*mm, border_band=15*mm, scale=0.5)
+    assert Filter.from_dict({'straighten': {'method': 'contour'}}) == StraightenFilter(method='contour')
+    with pytest.raises(ValueError):
+        StraightenFilter(scale=0)
+    with pytest.raises(ValueError):
+        StraightenFilter(method='unknown')
+
+
+def test_straighten_filter_batch(fixture_file):
+    image = ImageOps.expand(Image.open(fixture_file('card.png')).convert('RGB'), border=60, fill='white')
+    card_images = [CardImage(image.rotate(angle, fillcolor='white'), size=STANDARD, bleed=5*mm)
+                   for angle in (2, 2.1, 1.9, -3)]
+
+    straighten_filter = StraightenFilter(method='contour', sample_size=3)
+    fitted_filter = straighten_filter.fit(iter(card_images))
+    assert fitted_filter.angle == pytest.approx(-2, abs=0.05)
+    assert fitted_filter.fit(card_images) is fitted_filter
+    assert StraightenFilter().fit(card_images) == StraightenFilter()
+    assert MultipleFilter(NullFilter(), straighten_filter).fit(card_images) == MultipleFilter(NullFilter(),
+                                                                                              fitted_filter)
+    assert not straighten_filter.fitted and not MultipleFilter(NullFilter(), straighten_filter).fitted
+    assert fitted_filter.fitted and StraightenFilter().fitted and NullFilter().fitted
+
+    # Cards far from the shared skew are estimated alone
+    for card_image in (card_images[1], card_images[3]):
+        straightened_image = fitted_filter.apply(card_image).image
+        assert skew_angle(straightened_image, method='contour') == pytest.approx(0, abs=0.15)
+
+    # Cards without detected skew are not rotated by the shared skew
+    blank_image = Image.new('RGB', image.size, 'white')
+    assert fitted_filter.apply(CardImage(blank_image, size=STANDARD, bleed=5*mm)).image == blank_image
+    assert StraightenFilter(method='contour', sample_size=3).fit([CardImage(blank_image, size=STANDARD)] * 3) == \
+        StraightenFilter(method='contour', sample_size=3)
+
+
+def test_bleed_filter(random_image):
+    assert Filter.from_dict({
+        'bleed': {
+            'inpaint_size': "2*mm",
+            'mode': 'stretch'
+        }
+    }) == BleedFilter(inpaint_size=2*mm, mode='stretch')
+    assert Filter.measure_arguments('bleed') == ('inpaint_size', 'image_crop', 'corner_radius')
+    with pytest.raises(ValueError):
+        BleedFilter(mode='unknown')
+
+    card_image = CardImage(random_image(STANDARD * 10), size=STANDARD, bleed=1*mm)
+    bleed_card_image = BleedFilter(inpaint_size=2*mm).apply(card_image)
+    assert bleed_card_image.bleed == 3*mm
+    assert bleed_card_image.image.size == (card_image.image.width + 2 * round(2*mm * card_image.resolution.width),
+                                           card_image.image.height + 2 * round(2*mm * card_image.resolution.height))
+
+
 def test_snake_to_class():
     assert snake_to_class('filter') == 'Filter'
     assert snake_to_class('inpaint_filter') == 'InpaintFilter'
@@ -0,0 +1,41 @@
+import os
+
+from glob import glob
+
+from cartuli.index import FileIndex
+
+
+def test_file_index_glob(random_image_file):
+    image_files = [random_image_file("cards/front") for _ in range(3)]
+    random_image_file("cards/back")
+    base_dir = image_files[0].parent.parent.parent
+    (base_dir / "cards" / "front" / ".hidden.png").touch()
+
+    file_index = FileIndex()
+    for pattern in ("cards/front/*.png", "cards/*/*.png", "cards/*", "cards/front/.*", "cards/front",
+                    "cards/*/", "cards/missing/*.png", "*/front/*.png", image_files[0].name):
+        pattern = str(base_dir / pattern)
+        assert file_index.glob(pattern) == sorted(glob(pattern))
+
+    assert file_index.exists(image_files[0])
+    assert file_index.is_dir(base_dir / "cards")
+    assert not file_index.is_dir(image_files[0])
+
+
+def test_file_index_scans(random_image_file):
+    image_file = random_image_file("cards")
+    pattern = str(image_file.parent / "*.png")
+
+    file_index = FileIndex()
+    assert file_index.glob(pattern) == [str(image_file)]
+    scans = file_index.scans
+    assert file_index.glob(pattern) == [str(image_file)]
+    assert file_index.scans == scans
+    assert file_index.refresh() == set()
+
+    new_image_file = random_image_file("cards")
+    os.utime(image_file.parent, ns=(0, 0))
+    assert file_index.glob(pattern) == [str(image_file)]
+    assert file_index.refresh() == {image_file.parent}
+    assert file_index.glob(pattern) == sorted([str(image_file), str(new_image_file)])
+    assert file_index.scans == scans + 1
@@ -2,11 +2,46 @@ import pytest
 
 from pathlib import Path
 
-from cartuli.__main__ import parse_args
+from cartuli.__main__ import find_definition_files, parse_args
 
 
 def test_args():
-    assert parse_args([]).definition_file == Path("Cartulifile.yml")
-    assert parse_args(['Cf.yml']).definition_file == Path("Cf.yml")
+    assert parse_args([]).definition_files == [Path("Cartulifile.yml")]
+    assert parse_args(['Cf.yml']).definition_files == [Path("Cf.yml")]
+    assert parse_args(['Cf1.yml', 'Cf2.yml']).definition_files == [Path("Cf1.yml"), Path("Cf2.yml")]
+    assert parse_args(['-b', '4']).builds == 4
+
+
+def test_args_jobs():
+    assert parse_args(['-j', '4']).jobs == 4
+    assert parse_args(['--backend', 'thread']).backend == 'thread'
+    with pytest.raises(SystemExit):
+        parse_args(['--backend', 'cluster'])
     with pytest.raises(SystemExit):
-        parse_args(['Cf1.yml', 'Cf2.yml'])
+        parse_args(['-j', '0'])
+    with pytest.raises(SystemExit):
+        parse_args(['--read-ahead', '-1'])
+    assert parse_args(['--read-ahead', '0']).read_ahead == 0
+
+
+def test_args_selection():
+    assert parse_args([]).decks is None
+    assert parse_args(['-d', 'cards', '--deck', 'tokens']).decks == ['cards', 'tokens']
+    assert parse_args(['-o', 'cards_tokens']).outputs == ['cards_tokens']
+
+
+def test_find_definition_files(tmp_path):
+    for game in ("game1", "game2", "games/game3"):
+        (tmp_path / game).mkdir(parents=True)
+        (tmp_path / game / "Cartulifile.yml").touch()
+    (tmp_path / "other.yml").touch()
+    (tmp_path / "empty").mkdir()
+
+    assert find_definition_files([tmp_path / "games", tmp_path / "other.yml", tmp_path]) == [
+        tmp_path / "games/game3/Cartulifile.yml",
+        tmp_path / "other.yml",
+        tmp_path / "game1/Cartulifile.yml",
+        tmp_path / "game2/Cartulifile.yml"
+    ]
+    with pytest.raises(FileNotFoundError):
+        find_definition_files([tmp_path / "empty"])
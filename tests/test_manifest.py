@@ -0,0 +1,23 @@
+from cartuli.manifest import Manifest
+
+
+def test_manifest(tmp_path, random_image_file):
+    image_file = random_image_file()
+    output_file = tmp_path / 'cards.pdf'
+    values = {'decks': {'cards': {'size': 'STANDARD', 'front': {'image': str(image_file)}}}}
+
+    manifest = Manifest(tmp_path / Manifest.FILE_NAME)
+    fingerprint = manifest.fingerprint(values, [image_file], cards=())
+    assert not manifest.is_up_to_date(output_file, fingerprint)
+
+    output_file.write_text('')
+    assert not manifest.is_up_to_date(output_file, fingerprint)
+    manifest.update(output_file, fingerprint)
+
+    manifest = Manifest(tmp_path / Manifest.FILE_NAME)
+    assert manifest.is_up_to_date(output_file, manifest.fingerprint(values, [image_file], cards=()))
+    assert not manifest.is_up_to_date(output_file, manifest.fingerprint(values, [image_file], cards=('other', )))
+    assert not manifest.is_up_to_date(output_file, manifest.fingerprint({}, [image_file], cards=()))
+
+    image_file.write_bytes(image_file.read_bytes() + b'\0')
+    assert not manifest.is_up_to_date(output_file, manifest.fingerprint(values, [image_file], cards=()))
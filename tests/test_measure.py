@@ -1,7 +1,7 @@
 import pytest
 from math import pi, sqrt
 
-from cartuli.measure import Line, Point, Size, mm, A4, MINI_USA
+from cartuli.measure import Line, Point, Size, mm, A4, MINI_USA, from_str
 
 
 def test_size():
@@ -14,6 +14,21 @@ def test_size():
         Size.from_str("[3*mm, 4*mm]") == Size(3*mm, 4*mm)
     with pytest.raises(ValueError):
         Size.from_str("Size")
+    with pytest.raises(ValueError):
+        Size.from_str("__import__('os').getcwd()")
+
+
+def test_from_str():
+    assert from_str("3*mm") == 3*mm
+    assert from_str("-(1 + 2*mm) / 2") == -(1 + 2*mm) / 2
+    assert from_str(2) == 2
+    assert from_str("2**10 * mm") == 2**10 * mm
+
+    for expression in ("mm.__class__", "open('file')", "isclose", "[mm]", "9**9**9", "1/0", "1e300**100",
+                       "-" * 3000 + "1", "-" * 100000 + "1", "(" * 10000 + "1" + ")" * 10000,
+                       "(((9**99)**99)**99)**9", "((9**99)**99)**99.5"):
+        with pytest.raises(ValueError):
+            from_str(expression)
 
 
 def test_line():
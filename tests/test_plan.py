@@ -0,0 +1,62 @@
+import pytest
+
+from cartuli.cache import Cache
+from cartuli.measure import Size, STANDARD, mm
+from cartuli.plan import DefinitionPlan
+
+
+def test_plan_compile():
+    plan = DefinitionPlan.compile({
+        'decks': {
+            'cards': {
+                'size': 'STANDARD',
+                'front': {'images': "cards/*.png", 'bleed': '2*mm', 'filter': 'front'},
+            },
+            'tokens': {
+                'size': '(44*mm,75*mm)',
+                'front': {'images': "tokens/*.png", 'filter': {'crop': {'size': '1*mm'}}},
+                'back': {'image': "back.png", 'filter': {'bleed': {'mode': 'reflect'}}},
+            }
+        },
+        'filters': {
+            'front': {'inpaint': {'inpaint_size': '2*mm'}}
+        },
+        'outputs': {
+            'sheet': {'size': 'A4', 'print_margin': 3}
+        }
+    })
+    assert plan.sizes == {'STANDARD': STANDARD, '(44*mm,75*mm)': Size(44*mm, 75*mm), 'A4': Size.from_str('A4')}
+    assert plan.measures == {'2*mm': 2*mm, '1*mm': 1*mm}
+    assert plan.size('STANDARD') == STANDARD
+    assert plan.measure('2*mm') == 2*mm
+    assert plan.measure(3) == 3
+
+
+@pytest.mark.parametrize('values', [
+    None,
+    {'decks': {'cards': {'front': {'image': "card.png"}}}},
+    {'decks': {'cards': {'size': 'open("file")', 'front': {'image': "card.png"}}}},
+    {'decks': {'cards': {'size': 'STANDARD'}}},
+    {'decks': {'cards': {'size': 'STANDARD', 'front': {}}}},
+    {'decks': {'cards': {'size': 'STANDARD', 'front': {'image': "card.png", 'bleed': 'A4'}}}},
+    {'decks': {'cards': {'size': 'STANDARD', 'front': {'image': "card.png", 'filter': 'unknown'}}}},
+    {'decks': {'cards': {'size': 'STANDARD', 'front': {'template': {'file': "template.svg", 'parameters': 'x'}}}}},
+    {'filters': {'front': {'unknown': {}}}},
+    {'filters': {'front': {'inpaint': {'unknown': 1}}}},
+    {'filters': {'front': {'bleed': {'mode': 'unknown'}}}},
+    {'outputs': {'sheet': {'padding': 'mm.real'}}},
+])
+def test_plan_compile_invalid(values):
+    with pytest.raises(ValueError):
+        DefinitionPlan.compile(values)
+
+
+def test_plan_from_file(tmp_path, fixture_file):
+    cache = Cache(tmp_path)
+    plan = DefinitionPlan.from_file(fixture_file("simple-cartulifile.yml"), cache=cache)
+    assert cache.misses == 1
+
+    cached_plan = DefinitionPlan.from_file(fixture_file("simple-cartulifile.yml"), cache=cache)
+    assert cache.hits == 1
+    assert cached_plan == plan
+    assert DefinitionPlan.loads(plan.dumps()) == plan
@@ -0,0 +1,55 @@
+import pytest
+
+from cartuli.definition import Definition
+from cartuli.filters import NullFilter
+from cartuli.measure import STANDARD, inch
+from cartuli.planner import ImageHeader, plan_sheets
+
+
+def test_image_header(fixture_file):
+    header = ImageHeader.from_file(fixture_file("card.png"))
+    assert header.size == (1200, 1700)
+    assert header.memory == 1200 * 1700 * 3
+
+    svg_header = ImageHeader.from_file(fixture_file("template.svg"))
+    assert svg_header.size == (round(37 / 25.4 * 300), round(40 / 25.4 * 300))
+    assert svg_header.mode == 'RGBA'
+
+
+def test_plan_sheets(random_image_file, monkeypatch):
+    import cartuli.definition
+
+    image_size = STANDARD * (600 / inch)
+    front_dir = random_image_file("front", size=image_size).parent
+    for _ in range(9):
+        random_image_file("front", size=image_size)
+    back_file = random_image_file("back", size=STANDARD * (100 / inch))
+
+    monkeypatch.setattr(cartuli.definition, '_decode_image', None)
+    definition = Definition({
+        'decks': {
+            'cards': {
+                'size': 'STANDARD',
+                'front': {'images': str(front_dir / "*.png")},
+                'default_back': {'image': str(back_file)},
+                'copies': 2
+            }
+        },
+        'outputs': {
+            'sheet': {'size': 'A4', 'print_margin': '2*mm'}
+        }
+    })
+
+    sheet_plan, = plan_sheets(definition)
+    assert sheet_plan.name == 'cards'
+    assert sheet_plan.cards == 20
+    assert sheet_plan.cards_per_page.width == 3
+    assert sheet_plan.pages == 3
+    assert sheet_plan.two_sided
+    deck_plan, = sheet_plan.decks
+    assert round(deck_plan.dpi) == 100
+    assert deck_plan.memory == 10 * int(image_size.width) * int(image_size.height) * 3 + \
+        int(STANDARD.width * 100 / inch) * int(STANDARD.height * 100 / inch) * 3
+    assert len(sheet_plan.issues) == 1
+    assert 'cards' in str(sheet_plan)
+    assert sheet_plan.megapixels == {repr(NullFilter()): pytest.approx(deck_plan.memory / 3 / 1_000_000)}
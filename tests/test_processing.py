@@ -1,4 +1,11 @@
-from cartuli.processing import _get_rotation_angle, _discard_outliers
+import cv2 as cv
+import numpy as np
+import pytest
+
+from PIL import Image, ImageOps
+
+from cartuli.processing import _get_rotation_angle, _get_rotation_angles, _discard_outliers, _bleed_indices, \
+    _inpaint_mask, bleed, inpaint, skew_angle, straighten, BLEED_MODES
 
 
 def test_rotation_angle():
@@ -15,3 +22,126 @@ def test_rotation_angle():
 def test_discard_outliers():
     assert _discard_outliers([0, 0, 0, 0, 10]) == [0, 0, 0, 0]
     assert _discard_outliers([0, 0, 0, 0]) == [0, 0, 0, 0]
+
+
+def test_inpaint_border(fixture_file):
+    image = Image.open(fixture_file('card.png')).convert('RGB')
+    inpainted_image = inpaint(image, inpaint_size=20, image_crop=4, corner_radius=20, inpaint_radius=3)
+    assert inpainted_image.size == (image.width + 40, image.height + 40)
+    assert np.array_equal(np.asarray(inpainted_image)[24:-24, 24:-24], np.asarray(image)[4:-4, 4:-4])
+
+    # Inpainting only the border strips is the same as inpainting the whole image
+    expanded_image = np.full((image.height + 40, image.width + 40, 3), 255, dtype=np.uint8)
+    expanded_image[20:-20, 20:-20] = np.asarray(image)
+    mask = _inpaint_mask((image.width + 40, image.height + 40), (20, 20), (4, 4), 20)
+    assert np.array_equal(np.asarray(inpainted_image), cv.inpaint(expanded_image, mask, 3, cv.INPAINT_NS))
+
+    inpaint(image, inpaint_size=20, image_crop=4, corner_radius=20, inpaint_radius=3)
+    assert _inpaint_mask.cache_info().hits >= 2
+    assert not mask.flags.writeable
+
+
+def test_bleed_indices():
+    assert list(_bleed_indices(5, 2, 'replicate')) == [0, 0, 0, 1, 2, 3, 4, 4, 4]
+    assert list(_bleed_indices(5, 2, 'reflect')) == [2, 1, 0, 1, 2, 3, 4, 3, 2]
+    assert list(_bleed_indices(5, 2, 'stretch')) == [0, 0, 1, 1, 2, 3, 3, 4, 4]
+    assert list(_bleed_indices(5, 0, 'stretch')) == [0, 1, 2, 3, 4]
+    with pytest.raises(ValueError):
+        _bleed_indices(5, 2, 'unknown')
+
+
+@pytest.mark.parametrize('mode', ['P', 'PA', 'RGBA', 'CMYK', 'LA'])
+def test_bleed_modes(mode):
+    image = Image.new('RGBA', (60, 40), (255, 0, 0, 255)).convert(mode)
+    bleed_image = bleed(image, bleed_size=5, image_crop=1, corner_radius=4)
+    assert bleed_image.size == (70, 50)
+    assert bleed_image.convert('RGBA').getpixel((0, 0)) == image.convert('RGBA').getpixel((0, 0))
+    assert bleed_image.convert('RGBA').getpixel((35, 25)) == image.convert('RGBA').getpixel((30, 20))
+
+
+def test_bleed(fixture_file):
+    image = Image.open(fixture_file('card.png')).convert('RGB')
+    pixels = np.asarray(image)
+    for mode in BLEED_MODES:
+        bleed_image = bleed(image, bleed_size=(20), image_crop=4, corner_radius=20, mode=mode)
+        bleed_pixels = np.asarray(bleed_image)
+        assert bleed_image.size == (image.width + 40, image.height + 40)
+        assert np.array_equal(bleed_pixels[68:-68, 68:-68], pixels[48:-48, 48:-48])
+
+    bleed_pixels = np.asarray(bleed(image, bleed_size=20, image_crop=4, mode='replicate'))
+    assert np.array_equal(bleed_pixels[:24, 100], np.repeat(pixels[4:5, 76], 24, axis=0))
+    # Corners outside the rounded corner are taken from the corner arc
+    bleed_pixels = np.asarray(bleed(image, bleed_size=20, image_crop=4, corner_radius=20, mode='replicate'))
+    assert np.array_equal(bleed_pixels[0, 0], pixels[4 + 6, 4 + 6])
+
+
+@pytest.mark.parametrize('scale', [1, 0.5])
+def test_inpaint_modes(fixture_file, scale):
+    image = Image.open(fixture_file('card.png')).convert('RGB').resize((300, 425))
+    rgba_image = image.convert('RGBA')
+    rgba_image.putpixel((150, 200), (0, 0, 0, 0))
+    image = rgba_image.convert('RGB')
+    inpainted_image = inpaint(rgba_image, inpaint_size=10, image_crop=2, corner_radius=10, inpaint_radius=3,
+                              scale=scale)
+    assert inpainted_image.mode == 'RGBA'
+    assert inpainted_image.getpixel((160, 210)) == (0, 0, 0, 0)
+    assert inpainted_image.getpixel((0, 0))[3] == 255
+    assert np.array_equal(np.asarray(inpainted_image)[..., :3],
+                          np.asarray(inpaint(image, inpaint_size=10, image_crop=2, corner_radius=10,
+                                             inpaint_radius=3, scale=scale)))
+
+    palette_image = Image.new('RGB', (100, 80), (255, 0, 0)).convert('P')
+    inpainted_image = inpaint(palette_image, inpaint_size=5, image_crop=1, inpaint_radius=3, scale=scale)
+    assert inpainted_image.mode == 'RGB'
+    assert inpainted_image.getpixel((0, 0)) == (255, 0, 0)
+
+
+def test_inpaint_scale():
+    rows, columns = np.mgrid[0:400, 0:300]
+    image = Image.fromarray(np.stack([columns * 255 // 300, rows * 255 // 400, (rows + columns) * 255 // 700],
+                                     axis=-1).astype(np.uint8))
+    inpainted_pixels = np.asarray(inpaint(image, inpaint_size=12, image_crop=3, corner_radius=12,
+                                          inpaint_radius=4)).astype(int)
+    mask = _inpaint_mask((image.width + 24, image.height + 24), (12, 12), (3, 3), 12) > 0
+    for scale in (0.5, 0.25):
+        scaled_pixels = np.asarray(inpaint(image, inpaint_size=12, image_crop=3, corner_radius=12, inpaint_radius=4,
+                                           scale=scale)).astype(int)
+        # Only masked pixels are taken from the scaled inpainted image
+        assert np.array_equal(scaled_pixels[~mask], inpainted_pixels[~mask])
+        assert np.abs(scaled_pixels - inpainted_pixels)[mask].mean() < 2
+
+    with pytest.raises(ValueError):
+        inpaint(image, inpaint_size=12, scale=0)
+
+
+def test_get_rotation_angles():
+    assert list(_get_rotation_angles([[0, 0, 100, -2], [0, 0, 2, 100], [0, 0, 100, 100]])) == \
+        pytest.approx([-1.1458, -1.1458, 45.0], abs=1e-4)
+
+
+@pytest.mark.parametrize('angle', [3, -2])
+def test_skew_angle(fixture_file, angle):
+    image = Image.open(fixture_file('card.png')).convert('RGB').rotate(angle, fillcolor='white')
+    assert skew_angle(image) == pytest.approx(-angle, abs=0.1)
+    # Downscaled images and its border band give the same estimation
+    assert skew_angle(image, min_line_length=400, border_band=200, scale=0.5) == pytest.approx(-angle, abs=0.1)
+    assert skew_angle(straighten(image, scale=0.5)) == pytest.approx(0, abs=0.1)
+
+
+@pytest.mark.parametrize('angle', [3, -2, 0.5])
+def test_skew_angle_contour(fixture_file, angle):
+    # Cards are scanned over a lighter background
+    image = ImageOps.expand(Image.open(fixture_file('card.png')).convert('RGB'), border=60, fill='white')
+    image = image.rotate(angle, fillcolor='white')
+    assert skew_angle(image, method='contour') == pytest.approx(-angle, abs=0.05)
+    assert skew_angle(image, method='contour', scale=0.25) == pytest.approx(-angle, abs=0.05)
+    assert skew_angle(image, method='contour') == pytest.approx(skew_angle(image), abs=0.5)
+
+
+def test_skew_angle_not_detected(random_image):
+    image = random_image()
+    assert skew_angle(image) is None
+    assert skew_angle(image, method='contour') is None
+    assert straighten(image) is image
+    with pytest.raises(ValueError):
+        skew_angle(image, method='unknown')
@@ -0,0 +1,62 @@
+import pytest
+
+from cartuli.progress import Progress
+
+
+def test_progress():
+    progress = Progress(2)
+    assert progress.eta is None
+    assert str(progress) == "0 of 0 card images created, 100% of 0.0 megapixels, ETA unknown"
+
+    for _ in range(3):
+        progress.add(2, kind='inpaint')
+    progress.add(10, kind='crop')
+    assert progress.tasks == 4
+    assert progress.megapixels == 16
+
+    progress.done(2, 4, kind='inpaint')
+    assert progress.seconds_per_megapixel('inpaint') == 2
+    assert progress.seconds_per_megapixel('crop') == 2
+    assert progress.eta == pytest.approx((4 * 2 + 10 * 2) / 2)
+
+    progress.done(10, 1, kind='crop')
+    assert progress.seconds_per_megapixel('crop') == pytest.approx(0.1)
+    assert progress.eta == pytest.approx(4 * 2 / 2)
+    assert str(progress) == "2 of 4 card images created, 75% of 16.0 megapixels, ETA 4s"
+
+    # Costs are learned smoothing the measured ones
+    progress.done(2, 8, kind='inpaint')
+    assert progress.seconds_per_megapixel('inpaint') == pytest.approx(0.3 * 4 + 0.7 * 2)
+
+
+def test_progress_expected():
+    progress = Progress(1)
+    progress.expect('sheet', {'inpaint': 10, 'crop': 5})
+    progress.expect('other_sheet', {'inpaint': 5})
+    assert progress.expected_megapixels == 20
+
+    progress.add(2, kind='inpaint')
+    progress.done(2, 2, kind='inpaint')
+    assert progress.eta == pytest.approx(15 * 1 + 5 * 1)
+    assert str(progress).startswith("1 of 1 card images created, 9% of 22.0 megapixels")
+
+    progress.settle('sheet')
+    progress.settle('sheet')
+    assert progress.eta == pytest.approx(5)
+
+
+def test_progress_invalid():
+    with pytest.raises(ValueError):
+        Progress(0)
+    with pytest.raises(ValueError):
+        Progress(1, smoothing=0)
+
+
+def test_progress_report(caplog):
+    progress = Progress(1, interval=3600)
+    progress.add(1)
+    with caplog.at_level('INFO', logger='cartuli.progress'):
+        progress.done(1, 1)
+        assert not caplog.records
+        progress.report(force=True)
+    assert caplog.records[0].getMessage() == "1 of 1 card images created, 100% of 1.0 megapixels, ETA 0s"
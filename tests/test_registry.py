@@ -0,0 +1,64 @@
+import threading
+
+from cartuli.card import CardImage
+from cartuli.filters import NullFilter
+from cartuli.measure import STANDARD
+from cartuli.registry import CardImageRegistry
+
+
+def test_card_image_registry(random_image_file, random_card_image):
+    image_file = random_image_file("images")
+    card_image = random_card_image()
+    registry = CardImageRegistry()
+
+    key = CardImageRegistry.key(image_file, NullFilter(), CardImage.DEFAULT_BLEED, STANDARD)
+    stamp = CardImageRegistry.stamp(image_file)
+    assert registry.get(key, stamp, user='cards') is None
+
+    registry.put(key, stamp, card_image, user='cards')
+    assert key in registry
+    assert registry.get(key, stamp, user='tokens') is card_image
+    assert registry.get(key, (0, 0)) is None
+
+    registry.release('cards')
+    assert key in registry
+    registry.release('tokens', keep=lambda file: file == image_file.resolve())
+    assert key in registry
+    registry.release('tokens')
+    assert key not in registry
+    assert len(registry) == 0
+
+
+def test_card_image_registry_users(random_image_file, random_card_image):
+    image_file = random_image_file("images")
+    registry = CardImageRegistry()
+    key = CardImageRegistry.key(image_file, NullFilter(), CardImage.DEFAULT_BLEED, STANDARD)
+    stamp = CardImageRegistry.stamp(image_file)
+
+    # Users of a card image registered again keep it
+    registry.put(key, stamp, random_card_image(), user='cards')
+    card_image = random_card_image()
+    registry.put(key, stamp, card_image, user='tokens')
+    registry.release('tokens')
+    assert registry.get(key, stamp) is card_image
+
+
+def test_card_image_registry_claim(random_image_file, random_card_image):
+    image_file = random_image_file("images")
+    card_image = random_card_image()
+    registry = CardImageRegistry()
+    key = CardImageRegistry.key(image_file, NullFilter(), CardImage.DEFAULT_BLEED, STANDARD)
+    stamp = CardImageRegistry.stamp(image_file)
+
+    assert registry.claim(key, stamp)
+    assert not registry.claim(key, stamp)
+    assert registry.wait(key, stamp, timeout=0.01) is None
+    registry.abandon(key, stamp)
+    assert registry.wait(key, stamp) is None
+
+    assert registry.claim(key, stamp)
+    thread = threading.Timer(0.05, registry.put, (key, stamp, card_image))
+    thread.start()
+    assert registry.wait(key, stamp, user='cards') is card_image
+    thread.join()
+    assert not registry.claim(key, stamp)
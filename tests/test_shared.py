@@ -0,0 +1,50 @@
+from pathlib import Path
+from PIL import Image, ImageChops
+
+from cartuli.card import CardImage
+from cartuli.measure import STANDARD, mm
+from cartuli.shared import SharedImage, SharedCardImage
+
+
+def test_shared_image(random_image):
+    for mode in ('RGB', 'RGBA', 'L'):
+        image = random_image().convert(mode)
+        shared_image = SharedImage.from_image(image)
+        assert Path(shared_image.path).exists()
+
+        shared_image_copy = shared_image.to_image()
+        assert not Path(shared_image.path).exists()
+        assert shared_image_copy.mode == mode
+        assert not ImageChops.difference(image, shared_image_copy).getbbox()
+
+
+def test_shared_image_palette_and_info():
+    image = Image.new('RGB', (40, 30), (255, 0, 0)).convert('P')
+    image.info['dpi'] = (300, 300)
+    shared_image_copy = SharedImage.from_image(image).to_image()
+    assert shared_image_copy.mode == 'P'
+    assert shared_image_copy.convert('RGB').getpixel((0, 0)) == (255, 0, 0)
+    assert shared_image_copy.info['dpi'] == (300, 300)
+
+    image = Image.new('RGBA', (40, 30), (0, 0, 255, 128)).convert('PA')
+    assert SharedImage.from_image(image).to_image().convert('RGBA').getpixel((0, 0)) == \
+        image.convert('RGBA').getpixel((0, 0))
+
+
+def test_shared_card_image(random_image_file):
+    image_file = random_image_file()
+    card_image = CardImage(image_file, size=STANDARD, bleed=2*mm, name='card')
+
+    shared_card_image = SharedCardImage.from_card_image(card_image).to_card_image()
+    assert shared_card_image.name == 'card'
+    assert shared_card_image.bleed == 2*mm
+    assert shared_card_image.size == STANDARD
+    assert shared_card_image.image_path == image_file
+
+
+def test_shared_image_release(random_image):
+    shared_image = SharedImage.from_image(random_image())
+    assert Path(shared_image.path).exists()
+    shared_image.release()
+    assert not Path(shared_image.path).exists()
+    shared_image.release()
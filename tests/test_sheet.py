@@ -334,3 +334,10 @@ def test_sheet_two_sides(random_card_image):
         size=A4
     )
     assert sheet.two_sided
+
+
+def test_sheet_card_size():
+    sheet = Sheet(size=A4, print_margin=2*mm, padding=4*mm, card_size=STANDARD)
+    assert sheet.card_size == STANDARD
+    assert sheet.num_cards_per_page == 9
+    assert sheet.pages == 0
@@ -0,0 +1,28 @@
+from cartuli.watch import Watcher
+
+
+def test_watcher(random_image_file):
+    image_file = random_image_file("images")
+    files = [image_file]
+
+    watcher = Watcher(lambda: files)
+    assert watcher.changes() == set()
+
+    image_file.write_bytes(image_file.read_bytes() + b'\0')
+    assert watcher.changes() == {image_file.resolve()}
+    assert watcher.changes() == set()
+
+    new_image_file = random_image_file("images")
+    files.append(new_image_file)
+    assert watcher.wait() == {new_image_file.resolve()}
+
+    image_file.unlink()
+    assert watcher.changes() == {image_file.resolve()}
+
+
+def test_watcher_files_error():
+    def files():
+        raise ValueError("Invalid definition")
+
+    watcher = Watcher(files)
+    assert watcher.changes() == set()